@@ -40,11 +40,20 @@ def create_app():
     # Registra os blueprints
     from app.controllers.webhook import webhook_bp
     from app.controllers.context import context_bp
+    from app.controllers.historico import historico_bp
+    from app.controllers.stats import stats_bp
+    from app.controllers.health import health_bp
     
     app.register_blueprint(webhook_bp)
     app.register_blueprint(context_bp)
+    app.register_blueprint(historico_bp)
+    app.register_blueprint(stats_bp)
+    app.register_blueprint(health_bp)
+    
+    # Aquecimento em segundo plano em qualquer servidor (run.py, flask run, gunicorn);
+    # /readyz fica pronto ao final
+    if Config.AQUECIMENTO_AUTOMATICO:
+        from app.services.warmup_service import iniciar_aquecimento
+        iniciar_aquecimento()
     
     return app
-
-# Cria a instância da aplicação
-app = create_app()
@@ -1,12 +1,11 @@
 from flask import Blueprint, request, jsonify
+import io
 import logging
-import sys
-import os
 
-# Adiciona o diretório raiz ao path para importar db_manager.py
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
-
-from db_manager import db
+from db_manager import db, TENANT_PADRAO
+from app.services.knowledge_service import obter_base, obter_documentacao_atual
+from app.services.tenant_service import registro_tenants
+from app.utils.auth_utils import exigir_token_admin
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +14,22 @@ logger = logging.getLogger(__name__)
 # Cria o blueprint
 context_bp = Blueprint('context', __name__)
 
+def obter_tenant_da_requisicao(data=None):
+    """
+    Lê o tenant do parâmetro 'tenant' (query string ou body JSON)
+    
+    Returns:
+        tuple: (tenant_id, resposta de erro ou None se o tenant não existir)
+    """
+    tenant_id = (data or {}).get('tenant') or request.args.get('tenant') or TENANT_PADRAO
+    if registro_tenants.obter(tenant_id) is None:
+        logger.warning(f"Tenant desconhecido: {tenant_id}")
+        return tenant_id, (jsonify({
+            "status": "error",
+            "message": f"Tenant '{tenant_id}' não encontrado"
+        }), 404)
+    return tenant_id, None
+
 @context_bp.route('/atualizar-contexto', methods=['POST'])
 def atualizar_contexto():
     """
@@ -44,6 +59,10 @@ def atualizar_contexto():
         
         documentacao = data['documentacao']
         
+        tenant_id, erro = obter_tenant_da_requisicao(data)
+        if erro:
+            return erro
+        
         # Valida se a documentação não está vazia
         if not documentacao or not documentacao.strip():
             logger.warning("Documentação fornecida está vazia")
@@ -52,14 +71,15 @@ def atualizar_contexto():
                 "message": "Documentação não pode estar vazia"
             }), 400
         
-        # Limpa a tabela contexto existente
-        db.limpar_contexto()
+        # Limpa o contexto existente do tenant
+        db.limpar_contexto(tenant_id)
         logger.info("Tabela contexto limpa com sucesso")
         
         # Insere a nova documentação
-        resultado = db.inserir_contexto(documentacao)
+        resultado = db.inserir_contexto(documentacao, tenant_id)
         
         if resultado:
+            obter_base(tenant_id).ingerir_texto(documentacao)
             logger.info("Documentação atualizada com sucesso")
             return jsonify({
                 "status": "success",
@@ -80,20 +100,87 @@ def atualizar_contexto():
             "message": f"Erro interno: {str(e)}"
         }), 500
 
+EXTENSOES_PERMITIDAS = ('.md', '.markdown', '.txt')
+
+@context_bp.route('/contexto/upload', methods=['POST'])
+@exigir_token_admin('à base de conhecimento')
+def upload_contexto():
+    """
+    Endpoint para ingerir a base de conhecimento a partir de arquivos markdown/texto
+    
+    Os arquivos (campo multipart 'arquivos') substituem a base atual; apenas as
+    seções alteradas são reprocessadas e a nova versão é publicada ao final.
+    Exige o token administrativo: a base vai para o prompt de todas as respostas.
+    """
+    try:
+        arquivos = request.files.getlist('arquivos')
+        
+        if not arquivos:
+            logger.warning("Upload sem arquivos")
+            return jsonify({
+                "status": "error",
+                "message": "Envie ao menos um arquivo no campo 'arquivos'"
+            }), 400
+        
+        invalidos = [arquivo.filename for arquivo in arquivos if not (arquivo.filename or '').lower().endswith(EXTENSOES_PERMITIDAS)]
+        if invalidos:
+            logger.warning(f"Arquivos com extensão não suportada: {invalidos}")
+            return jsonify({
+                "status": "error",
+                "message": f"Extensões suportadas: {', '.join(EXTENSOES_PERMITIDAS)}",
+                "arquivos_invalidos": invalidos
+            }), 400
+        
+        tenant_id, erro = obter_tenant_da_requisicao()
+        if erro:
+            return erro
+        
+        logger.info(f"📚 Upload da base de conhecimento com {len(arquivos)} arquivo(s) (tenant {tenant_id})")
+        
+        # Cada arquivo é lido linha a linha direto do stream do upload
+        resumo = obter_base(tenant_id).ingerir(
+            (arquivo.filename, io.TextIOWrapper(arquivo.stream, encoding='utf-8', errors='replace'))
+            for arquivo in arquivos
+        )
+        
+        if resumo:
+            return jsonify({
+                "status": "success",
+                "message": "Base de conhecimento atualizada com sucesso",
+                **resumo
+            }), 200
+        else:
+            return jsonify({
+                "status": "error",
+                "message": "Erro ao publicar a base de conhecimento"
+            }), 500
+        
+    except Exception as e:
+        logger.error(f"Erro no upload da base de conhecimento: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Erro interno: {str(e)}"
+        }), 500
+
 @context_bp.route('/contexto', methods=['GET'])
 def obter_contexto():
     """
     Endpoint para obter a documentação atual
     """
     try:
-        # Obtém a documentação do banco
-        documentacoes = db.obter_contexto()
+        tenant_id, erro = obter_tenant_da_requisicao()
+        if erro:
+            return erro
+        
+        # Documentação em vigor: a base publicada (inclusive por upload) ou a tabela contexto
+        documentacao = obter_documentacao_atual(tenant_id)
         
-        if documentacoes:
+        if documentacao:
             return jsonify({
                 "status": "success",
-                "documentacao": documentacoes[0] if documentacoes else "",
-                "total_registros": len(documentacoes)
+                "documentacao": documentacao,
+                "total_registros": len(db.obter_contexto(tenant_id)),
+                "base_conhecimento": obter_base(tenant_id).obter_estatisticas()
             }), 200
         else:
             return jsonify({
@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify
+import logging
+
+from app.services.health_service import verificar_prontidao
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cria o blueprint
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness: responde sem acessar banco ou Groq
+    """
+    return jsonify({"status": "ok"}), 200
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness: estado das dependências (em cache); 503 tira a instância de rotação
+    """
+    try:
+        resultado = verificar_prontidao()
+        status_code = 200 if resultado["pronto"] else 503
+        return jsonify({"status": "ready" if resultado["pronto"] else "not_ready", **resultado}), status_code
+    except Exception as e:
+        logger.error(f"Erro ao verificar prontidão: {str(e)}")
+        return jsonify({"status": "not_ready", "message": f"Erro interno: {str(e)}"}), 503
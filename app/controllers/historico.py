@@ -0,0 +1,118 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import csv
+import io
+import json
+import logging
+
+from db_manager import db, TENANT_PADRAO
+from app.utils.auth_utils import verificar_token_admin
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cria o blueprint
+historico_bp = Blueprint('historico', __name__)
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+COLUNAS_EXPORTACAO = ['id', 'tenant_id', 'numero', 'mensagem', 'user', 'horario_data']
+
+@historico_bp.before_request
+def exigir_token_admin():
+    """
+    Exige o token administrativo (header X-Admin-Token) em todos os endpoints do histórico
+    
+    O histórico tem os números e as mensagens de todos os alunos. Sem
+    ADMIN_TOKEN configurado os endpoints ficam desativados.
+    """
+    return verificar_token_admin('ao histórico')
+
+def gerar_ndjson(linhas):
+    """Gera uma linha JSON por mensagem do histórico"""
+    for linha in linhas:
+        yield json.dumps(dict(zip(COLUNAS_EXPORTACAO, linha)), ensure_ascii=False) + '\n'
+
+def gerar_csv(linhas):
+    """Gera o CSV do histórico linha a linha, reaproveitando o mesmo buffer"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUNAS_EXPORTACAO)
+    for linha in linhas:
+        escritor.writerow(linha)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Cabeçalho de tabela vazia
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+@historico_bp.route('/historico/export', methods=['GET'])
+def exportar_historico():
+    """
+    Endpoint para exportar todo o histórico em streaming (NDJSON ou CSV)
+    """
+    formato = request.args.get('formato', 'ndjson').lower()
+    
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({
+            "status": "error",
+            "message": "Formato inválido. Use 'ndjson' ou 'csv'"
+        }), 400
+    
+    logger.info(f"📦 Exportação do histórico solicitada ({formato})")
+    
+    linhas = db.iterar_historico()
+    if formato == 'csv':
+        corpo, mimetype = gerar_csv(linhas), 'text/csv'
+    else:
+        corpo, mimetype = gerar_ndjson(linhas), 'application/x-ndjson'
+    
+    return Response(
+        stream_with_context(corpo),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=historico.{formato}"}
+    )
+
+@historico_bp.route('/historico/<numero>', methods=['GET'])
+def obter_historico(numero):
+    """
+    Endpoint para consultar o histórico de um número com paginação por cursor
+    """
+    try:
+        try:
+            apos_id = int(request.args.get('apos_id', 0))
+            limite = min(int(request.args.get('limite', LIMITE_PADRAO)), LIMITE_MAXIMO)
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Parâmetros 'apos_id' e 'limite' devem ser inteiros"
+            }), 400
+        
+        if limite <= 0:
+            return jsonify({
+                "status": "error",
+                "message": "Parâmetro 'limite' deve ser positivo"
+            }), 400
+        
+        tenant_id = request.args.get('tenant', TENANT_PADRAO)
+        linhas = db.obter_pagina_historico(numero, apos_id=apos_id, limite=limite, tenant_id=tenant_id)
+        mensagens = [
+            {"id": id_linha, "mensagem": mensagem, "user": user, "horario_data": horario}
+            for id_linha, mensagem, user, horario in linhas
+        ]
+        
+        return jsonify({
+            "status": "success",
+            "numero": numero,
+            "tenant": tenant_id,
+            "mensagens": mensagens,
+            "proximo_cursor": mensagens[-1]["id"] if len(mensagens) == limite else None
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter histórico: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Erro interno: {str(e)}"
+        }), 500
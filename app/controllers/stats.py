@@ -0,0 +1,109 @@
+from flask import Blueprint, request, jsonify
+import logging
+
+from db_manager import db, agora_ms
+from app.services.model_router import obter_estatisticas_roteador
+from app.services.intent_service import obter_estatisticas_intencoes
+from app.services.knowledge_service import obter_estatisticas_bases
+from app.services.tenant_service import registro_tenants
+from app.services.admission_service import obter_estatisticas_admissao
+from app.services.scheduler_service import obter_estatisticas_agendador
+from app.services.response_policy_service import obter_estatisticas_politica
+from app.utils.auth_utils import verificar_token_admin
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cria o blueprint
+stats_bp = Blueprint('stats', __name__)
+
+@stats_bp.before_request
+def exigir_token_admin():
+    """Exige o token administrativo: as conversas mais caras trazem os números dos alunos"""
+    return verificar_token_admin('às estatísticas')
+
+@stats_bp.route('/stats', methods=['GET'])
+def obter_stats():
+    """
+    Endpoint com o uso do Groq (a partir das consolidações) e métricas dos componentes
+    """
+    try:
+        try:
+            horas = float(request.args.get('horas', 24))
+            dias = int(request.args.get('dias', 7))
+            top = min(int(request.args.get('top', 10)), 100)
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Parâmetros 'horas', 'dias' e 'top' devem ser numéricos"
+            }), 400
+        
+        agora = agora_ms()
+        
+        uso_por_modelo = [
+            {
+                "modelo": modelo,
+                "requisicoes": requisicoes,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "latencia_media_ms": round(latencia_total / requisicoes, 1) if requisicoes else None,
+                "fila_media_ms": round(fila_total / requisicoes, 1) if requisicoes else None
+            }
+            for modelo, requisicoes, prompt_tokens, completion_tokens, latencia_total, fila_total
+            in db.obter_uso_por_modelo(agora - int(horas * 3600 * 1000))
+        ]
+        
+        uso_por_tipo_resposta = [
+            {
+                "tipo": tipo or "sem_politica",
+                "requisicoes": requisicoes,
+                "max_tokens_solicitados": max_tokens,
+                "completion_tokens": completion_tokens,
+                "uso_do_orcamento": round(completion_tokens / max_tokens, 3) if max_tokens else None,
+                "truncadas": truncadas
+            }
+            for tipo, requisicoes, max_tokens, completion_tokens, truncadas
+            in db.obter_uso_por_tipo_resposta(agora - int(horas * 3600 * 1000))
+        ]
+        
+        inicio_dias = (agora // 86400000 - (dias - 1)) * 86400000
+        conversas_mais_caras = [
+            {
+                "numero": numero,
+                "requisicoes": requisicoes,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens
+            }
+            for numero, requisicoes, prompt_tokens, completion_tokens
+            in db.obter_conversas_mais_caras(inicio_dias, top)
+        ]
+        
+        return jsonify({
+            "status": "success",
+            "uso_groq": {
+                "horas": horas,
+                "por_modelo": uso_por_modelo,
+                "por_tipo_resposta": uso_por_tipo_resposta
+            },
+            "conversas_mais_caras": {
+                "dias": dias,
+                "conversas": conversas_mais_caras
+            },
+            "roteador": obter_estatisticas_roteador(),
+            "respostas_locais": obter_estatisticas_intencoes(),
+            "politica_resposta": obter_estatisticas_politica(),
+            "admissao": obter_estatisticas_admissao(),
+            "agendador": obter_estatisticas_agendador(),
+            "cache_conversas": db.obter_estatisticas_cache(),
+            "base_conhecimento": obter_estatisticas_bases(),
+            "tenants": registro_tenants.obter_estatisticas(),
+            "banco": db.obter_metricas_banco()
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Erro ao obter estatísticas: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": f"Erro interno: {str(e)}"
+        }), 500
@@ -2,14 +2,16 @@ from flask import Blueprint, request, jsonify
 import json
 import logging
 from datetime import datetime
-import sys
-import os
-
-# Adiciona o diretório raiz ao path para importar db_manager.py
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 from db_manager import db
 from app.services.groq_service import enviar_para_groq
+from app.services.intent_service import responder_intencao_local
+from app.services.knowledge_service import obter_base, obter_documentacao_atual, obter_documentacao_para_prompt
+from app.services.tenant_service import resolver_tenant
+from app.services.admission_service import controle_admissao, ADMITIR, ADIAR, MENSAGEM_ADIADA, MENSAGEM_DESCARTADA
+from app.services.scheduler_service import agendador, estimar_custo, PRIORIDADE_ALTA, PRIORIDADE_NORMAL, PRIORIDADE_ADIADA
+from concurrent.futures import TimeoutError as FuturoTimeoutError
+from config import Config
 from app.utils.whatsapp_utils import extrair_dados_whatsapp, formatar_historico_mensagens, validar_numero_whatsapp
 
 # Configuração de logging
@@ -44,6 +46,209 @@ def enviar_resposta_whatsapp(numero, mensagem):
         logger.error(f"Erro ao enviar resposta WhatsApp: {str(e)}")
         return False
 
+def responder_com_groq(numero, mensagem_atual, historico_mensagens, tenant):
+    """
+    Gera a resposta com o Groq, salva no histórico e envia ao aluno
+    
+    Args:
+        numero: Número do telefone
+        mensagem_atual: Mensagem que a IA deve responder
+        historico_mensagens: Histórico do número (já com a mensagem atual)
+        tenant: Tenant que recebeu a mensagem
+        
+    Returns:
+        tuple: (dicionário de resposta do webhook, status HTTP)
+    """
+    # Formata o histórico para envio ao Groq usando utilitário
+    historico_formatado = formatar_historico_mensagens(historico_mensagens)
+    
+    # Obtém a documentação (completa ou os trechos relevantes da base de conhecimento)
+    documentacao, score_recuperacao = obter_documentacao_para_prompt(mensagem_atual, tenant.id)
+    
+    logger.info(f"🤖 Enviando para Groq")
+    
+    # Chama a API do Groq
+    resposta_groq = enviar_para_groq(
+        historico_mensagens=historico_formatado,
+        documentacao=documentacao,
+        mensagem_atual=mensagem_atual,
+        score_recuperacao=score_recuperacao,
+        numero=numero,
+        tenant=tenant
+    )
+    
+    logger.info(f"🤖 Resposta do Groq: {resposta_groq[:100]}...")
+    
+    # Verifica se a requisição para o Groq foi bem-sucedida
+    if resposta_groq.startswith("Erro:") or resposta_groq.startswith("Erro na API:") or resposta_groq.startswith("Erro de conexão:") or resposta_groq.startswith("Erro interno:"):
+        logger.error(f"❌ Erro na API do Groq: {resposta_groq}")
+        
+        # Mensagem de erro para o usuário
+        mensagem_erro_usuario = tenant.mensagem_indisponivel
+        
+        # Salva a mensagem de erro no histórico (user = 'Bot UNIALFA')
+        db.inserir_historico(numero, mensagem_erro_usuario, user='Bot UNIALFA', tenant_id=tenant.id)
+        logger.info(f"💾 Mensagem de erro salva no histórico para {numero}")
+        
+        # Envia mensagem de erro para o usuário
+        sucesso_envio = enviar_resposta_whatsapp(numero, mensagem_erro_usuario)
+        
+        if sucesso_envio:
+            logger.info(f"✅ Mensagem de erro enviada com sucesso para {numero}")
+        else:
+            logger.error(f"❌ Erro ao enviar mensagem de erro para {numero}")
+        
+        # Envia alerta para os números administrativos do tenant
+        mensagem_alerta_admin = "Chatbot fora de serviço, verificar limites na Groq"
+        
+        for numero_admin in tenant.admins:
+            sucesso_alerta_admin = enviar_resposta_whatsapp(numero_admin, mensagem_alerta_admin)
+            
+            if sucesso_alerta_admin:
+                logger.info(f"✅ Alerta administrativo enviado com sucesso para {numero_admin}")
+            else:
+                logger.error(f"❌ Erro ao enviar alerta administrativo para {numero_admin}")
+        
+        return {"status": "error", "message": mensagem_erro_usuario, "numero": numero}, 200
+    
+    # Fluxo normal - requisição foi bem-sucedida
+    # Salva a resposta do bot no histórico (user = 'Bot UNIALFA')
+    db.inserir_historico(numero, resposta_groq, user='Bot UNIALFA', tenant_id=tenant.id)
+    logger.info(f"💾 Resposta do bot salva no histórico para {numero}")
+    
+    # Envia resposta para o WhatsApp
+    sucesso_envio = enviar_resposta_whatsapp(numero, resposta_groq)
+    
+    if sucesso_envio:
+        logger.info(f"✅ Resposta enviada com sucesso para {numero}")
+    else:
+        logger.error(f"❌ Erro ao enviar resposta para {numero}")
+    
+    # Resposta de sucesso para o WhatsApp
+    return {"status": "success", "message": resposta_groq, "numero": numero}, 200
+
+def processar_comando_admin(numero, mensagem_atual, tenant):
+    """
+    Tarefa do agendador: executa um comando administrativo no contexto do tenant
+    
+    Args:
+        numero: Número administrativo
+        mensagem_atual: Mensagem com o comando
+        tenant: Tenant que recebeu o comando
+        
+    Returns:
+        tuple: (dicionário de resposta do webhook, status HTTP)
+    """
+    # Comando: "admin - contexto atual"
+    if mensagem_atual.strip().lower() == "admin - contexto atual":
+        logger.info("📋 Comando para obter contexto atual")
+        
+        # Obtém a documentação em vigor (base publicada ou tabela contexto)
+        documentacao = obter_documentacao_atual(tenant.id) or "Documentação não disponível"
+        
+        # Envia o contexto atual
+        sucesso_envio = enviar_resposta_whatsapp(numero, documentacao)
+        
+        if sucesso_envio:
+            logger.info(f"✅ Contexto atual enviado com sucesso para {numero}")
+        else:
+            logger.error(f"❌ Erro ao enviar contexto atual para {numero}")
+        
+        return {"status": "success", "message": documentacao, "numero": numero}, 200
+    
+    # Comando: "admin - novo contexto contexto: [novo contexto]"
+    elif mensagem_atual.strip().lower().startswith("admin - novo contexto:"):
+        logger.info("🔄 Comando para atualizar contexto")
+        
+        # Extrai o novo contexto (tudo após os dois pontos)
+        partes = mensagem_atual.split(":", 1)
+        if len(partes) >= 2:
+            novo_contexto = partes[1].strip()
+            
+            if novo_contexto:
+                # Limpa a tabela contexto existente
+                db.limpar_contexto(tenant.id)
+                logger.info("🗑️ Tabela contexto limpa com sucesso")
+                
+                # Insere o novo contexto
+                resultado = db.inserir_contexto(novo_contexto, tenant.id)
+                
+                if resultado:
+                    obter_base(tenant.id).ingerir_texto(novo_contexto)
+                    logger.info("✅ Contexto atualizado com sucesso")
+                    
+                    # Envia confirmação
+                    mensagem_sucesso = "✅ Contexto atualizado com sucesso!"
+                    sucesso_envio = enviar_resposta_whatsapp(numero, mensagem_sucesso)
+                    
+                    if sucesso_envio:
+                        logger.info(f"✅ Confirmação de atualização enviada para {numero}")
+                    else:
+                        logger.error(f"❌ Erro ao enviar confirmação para {numero}")
+                    
+                    return {"status": "success", "message": "Contexto atualizado", "numero": numero}, 200
+                else:
+                    logger.error("❌ Erro ao inserir novo contexto")
+                    mensagem_erro = "❌ Erro ao atualizar contexto no banco de dados"
+                    enviar_resposta_whatsapp(numero, mensagem_erro)
+                    return {"status": "error", "message": "Erro ao atualizar contexto"}, 500
+            else:
+                logger.warning("Novo contexto está vazio")
+                mensagem_erro = "❌ O novo contexto não pode estar vazio"
+                enviar_resposta_whatsapp(numero, mensagem_erro)
+                return {"status": "error", "message": "Contexto vazio"}, 400
+        else:
+            logger.warning("Formato de comando inválido para atualizar contexto")
+            mensagem_erro = "❌ Formato inválido. Use: admin - novo contexto contexto: [seu novo contexto]"
+            enviar_resposta_whatsapp(numero, mensagem_erro)
+            return {"status": "error", "message": "Formato inválido"}, 400
+
+def processar_mensagem(numero, mensagem_atual, tenant):
+    """
+    Tarefa do agendador: responde a mensagem do aluno com o Groq
+    
+    O histórico é lido na execução, então mensagens que esperaram na fila
+    enxergam as respostas dadas enquanto aguardavam.
+    """
+    return responder_com_groq(numero, mensagem_atual, db.obter_mensagens_por_numero(numero, tenant.id), tenant)
+
+def submeter_retida(numero, mensagem_atual, tenant, prioridade):
+    """
+    Envia ao agendador a mensagem que esperou pela ficha do orçamento do tenant
+    
+    A resposta vai direto ao aluno quando a tarefa executar.
+    """
+    futuro = agendador.submeter(
+        numero, processar_mensagem, numero, mensagem_atual, tenant, prioridade=prioridade, tenant_id=tenant.id
+    )
+    if futuro is None:
+        logger.warning(f"⚠️ Fila do número {numero} cheia; a mensagem retida fica no histórico para a próxima resposta")
+        return
+    controle_admissao.acompanhar(futuro)
+
+def aguardar_tarefa(futuro, numero):
+    """
+    Espera a tarefa agendada e devolve a resposta do webhook
+    
+    Se a espera passar de AGENDADOR_ESPERA_SEGUNDOS a tarefa continua na
+    fila e envia a resposta ao aluno quando executar.
+    """
+    try:
+        resposta, status_code = futuro.result(timeout=Config.AGENDADOR_ESPERA_SEGUNDOS)
+    except FuturoTimeoutError:
+        logger.warning(f"⏳ Tarefa de {numero} ainda na fila, a resposta será enviada ao executar")
+        return jsonify({"status": "queued", "message": "Mensagem na fila de processamento", "numero": numero}), 200
+    return jsonify(resposta), status_code
+
+def resposta_fila_cheia(numero):
+    """Resposta para número que já tem o máximo de tarefas na fila (a mensagem fica no histórico)"""
+    return jsonify({"status": "throttled", "message": "Mensagens anteriores ainda em processamento", "numero": numero}), 200
+
+@webhook_bp.record_once
+def iniciar_agendador(state):
+    """Inicia os workers do agendador quando o blueprint é registrado"""
+    agendador.iniciar()
+
 @webhook_bp.route('/webhook', methods=['POST'])
 def webhook():
     """
@@ -80,149 +285,96 @@ def webhook():
             logger.warning(f"Número inválido: {numero}")
             return jsonify({"status": "error", "message": "Número inválido"}), 400
         
-        logger.info(f"📱 Mensagem de {numero}: {mensagem_atual}")
+        # Tenant pelo número do WhatsApp Business que recebeu a mensagem (sem acesso ao banco)
+        tenant = resolver_tenant(dados_whatsapp.get('phone_number_id'))
+        
+        logger.info(f"📱 Mensagem de {numero} ({tenant.id}): {mensagem_atual}")
         
-        # Verifica se é o número administrativo
-        if numero == "556293977594":
+        # Verifica se é um número administrativo do tenant
+        if tenant.eh_admin(numero):
             logger.info(f"🔧 Comando administrativo detectado de {numero}")
             
-            # Comando: "admin - contexto atual"
-            if mensagem_atual.strip().lower() == "admin - contexto atual":
-                logger.info("📋 Comando para obter contexto atual")
-                
-                # Obtém a documentação do contexto
-                documentacoes = db.obter_contexto()
-                documentacao = documentacoes[0] if documentacoes else "Documentação não disponível"
-                
-                # Envia o contexto atual
-                sucesso_envio = enviar_resposta_whatsapp(numero, documentacao)
-                
-                if sucesso_envio:
-                    logger.info(f"✅ Contexto atual enviado com sucesso para {numero}")
-                else:
-                    logger.error(f"❌ Erro ao enviar contexto atual para {numero}")
-                
-                return jsonify({"status": "success", "message": documentacao, "numero": numero}), 200
-            
-            # Comando: "admin - novo contexto contexto: [novo contexto]"
-            elif mensagem_atual.strip().lower().startswith("admin - novo contexto:"):
-                logger.info("🔄 Comando para atualizar contexto")
-                
-                # Extrai o novo contexto (tudo após os dois pontos)
-                partes = mensagem_atual.split(":", 1)
-                if len(partes) >= 2:
-                    novo_contexto = partes[1].strip()
-                    
-                    if novo_contexto:
-                        # Limpa a tabela contexto existente
-                        db.limpar_contexto()
-                        logger.info("🗑️ Tabela contexto limpa com sucesso")
-                        
-                        # Insere o novo contexto
-                        resultado = db.inserir_contexto(novo_contexto)
-                        
-                        if resultado:
-                            logger.info("✅ Contexto atualizado com sucesso")
-                            
-                            # Envia confirmação
-                            mensagem_sucesso = "✅ Contexto atualizado com sucesso!"
-                            sucesso_envio = enviar_resposta_whatsapp(numero, mensagem_sucesso)
-                            
-                            if sucesso_envio:
-                                logger.info(f"✅ Confirmação de atualização enviada para {numero}")
-                            else:
-                                logger.error(f"❌ Erro ao enviar confirmação para {numero}")
-                            
-                            return jsonify({"status": "success", "message": "Contexto atualizado", "numero": numero}), 200
-                        else:
-                            logger.error("❌ Erro ao inserir novo contexto")
-                            mensagem_erro = "❌ Erro ao atualizar contexto no banco de dados"
-                            enviar_resposta_whatsapp(numero, mensagem_erro)
-                            return jsonify({"status": "error", "message": "Erro ao atualizar contexto"}), 500
-                    else:
-                        logger.warning("Novo contexto está vazio")
-                        mensagem_erro = "❌ O novo contexto não pode estar vazio"
-                        enviar_resposta_whatsapp(numero, mensagem_erro)
-                        return jsonify({"status": "error", "message": "Contexto vazio"}), 400
-                else:
-                    logger.warning("Formato de comando inválido para atualizar contexto")
-                    mensagem_erro = "❌ Formato inválido. Use: admin - novo contexto contexto: [seu novo contexto]"
-                    enviar_resposta_whatsapp(numero, mensagem_erro)
-                    return jsonify({"status": "error", "message": "Formato inválido"}), 400
+            comando = mensagem_atual.strip().lower()
+            if comando == "admin - contexto atual" or comando.startswith("admin - novo contexto:"):
+                # Comandos vão na faixa alta; o custo cresce com o tamanho do contexto enviado
+                futuro = agendador.submeter(
+                    numero, processar_comando_admin, numero, mensagem_atual, tenant,
+                    prioridade=PRIORIDADE_ALTA, custo=estimar_custo(mensagem_atual), tenant_id=tenant.id
+                )
+                if futuro is None:
+                    return resposta_fila_cheia(numero)
+                return aguardar_tarefa(futuro, numero)
         
         # Processamento normal para outros números
         # Salva a mensagem atual no histórico (user = 'aluno')
-        db.inserir_historico(numero, mensagem_atual, user='aluno')
+        db.inserir_historico(numero, mensagem_atual, user='aluno', tenant_id=tenant.id)
         logger.info(f"💾 Mensagem do aluno salva no histórico para {numero}")
         
         # Obtém histórico de mensagens do usuário
-        historico_mensagens = db.obter_mensagens_por_numero(numero)
+        historico_mensagens = db.obter_mensagens_por_numero(numero, tenant.id)
         
-        # Formata o histórico para envio ao Groq usando utilitário
-        historico_formatado = formatar_historico_mensagens(historico_mensagens)
+        # Responde localmente saudações, agradecimentos e mídia sem chamar o Groq
+        primeira_interacao = not any(user == 'Bot UNIALFA' for _, user, _ in historico_mensagens)
+        resposta_local = responder_intencao_local(mensagem_atual, primeira_interacao)
         
-        # Obtém a documentação do contexto
-        documentacoes = db.obter_contexto()
-        documentacao = documentacoes[0] if documentacoes else "Documentação não disponível"
-        
-        logger.info(f"🤖 Enviando para Groq")
-        
-        # Chama a API do Groq
-        resposta_groq = enviar_para_groq(
-            historico_mensagens=historico_formatado,
-            documentacao=documentacao,
-            mensagem_atual=mensagem_atual
-        )
-        
-        logger.info(f"🤖 Resposta do Groq: {resposta_groq[:100]}...")
-        
-        # Verifica se a requisição para o Groq foi bem-sucedida
-        if resposta_groq.startswith("Erro:") or resposta_groq.startswith("Erro na API:") or resposta_groq.startswith("Erro de conexão:") or resposta_groq.startswith("Erro interno:"):
-            logger.error(f"❌ Erro na API do Groq: {resposta_groq}")
-            
-            # Mensagem de erro para o usuário
-            mensagem_erro_usuario = "Serviços indisponíveis no momento, entre em contato com esse número: (62) 993977594"
+        if resposta_local:
+            db.inserir_historico(numero, resposta_local, user='Bot UNIALFA', tenant_id=tenant.id)
+            logger.info(f"💾 Resposta local salva no histórico para {numero}")
             
-            # Salva a mensagem de erro no histórico (user = 'Bot UNIALFA')
-            db.inserir_historico(numero, mensagem_erro_usuario, user='Bot UNIALFA')
-            logger.info(f"💾 Mensagem de erro salva no histórico para {numero}")
-            
-            # Envia mensagem de erro para o usuário
-            sucesso_envio = enviar_resposta_whatsapp(numero, mensagem_erro_usuario)
+            sucesso_envio = enviar_resposta_whatsapp(numero, resposta_local)
             
             if sucesso_envio:
-                logger.info(f"✅ Mensagem de erro enviada com sucesso para {numero}")
+                logger.info(f"✅ Resposta local enviada com sucesso para {numero}")
             else:
-                logger.error(f"❌ Erro ao enviar mensagem de erro para {numero}")
+                logger.error(f"❌ Erro ao enviar resposta local para {numero}")
             
-            # Envia alerta para o número administrativo
-            numero_admin = "556293977594"
-            mensagem_alerta_admin = "Chatbot fora de serviço, verificar limites na Groq"
+            return jsonify({"status": "success", "message": resposta_local, "numero": numero}), 200
+        
+        # Controle de admissão: sob sobrecarga adia ou descarta antes de chamar o Groq
+        decisao = controle_admissao.avaliar()
+        
+        # Orçamento do tenant: a mensagem espera a próxima ficha (se couber entre as
+        # adiadas) ou é recusada com o aviso do limite do tenant, não o de alta demanda
+        prioridade = PRIORIDADE_ALTA if primeira_interacao else PRIORIDADE_NORMAL
+        if decisao in (ADMITIR, ADIAR):
+            pode_esperar = decisao == ADMITIR and controle_admissao.pode_reter()
+            espera = tenant.reservar_orcamento(Config.TENANT_ESPERA_ORCAMENTO_SEGUNDOS if pode_esperar else 0)
             
-            sucesso_alerta_admin = enviar_resposta_whatsapp(numero_admin, mensagem_alerta_admin)
+            if espera is None:
+                logger.warning(f"⚠️ Tenant {tenant.id} acima do orçamento de requisições, mensagem de {numero} recusada")
+                enviar_resposta_whatsapp(numero, tenant.mensagem_limite)
+                return jsonify({"status": "rate_limited", "message": tenant.mensagem_limite, "numero": numero}), 200
             
-            if sucesso_alerta_admin:
-                logger.info(f"✅ Alerta administrativo enviado com sucesso para {numero_admin}")
+            if espera > 0:
+                logger.info(f"⏳ Tenant {tenant.id} sem orçamento agora, mensagem de {numero} retida por {espera:.1f}s")
+                controle_admissao.reter(espera, submeter_retida, numero, mensagem_atual, tenant, prioridade)
+                return jsonify({"status": "held", "message": "Mensagem aguardando o orçamento do tenant", "numero": numero}), 200
+        
+        if decisao != ADMITIR:
+            if decisao == ADIAR:
+                # Faixa de menor prioridade: só executa quando as demais estão vazias
+                futuro = agendador.submeter(
+                    numero, processar_mensagem, numero, mensagem_atual, tenant, prioridade=PRIORIDADE_ADIADA, tenant_id=tenant.id
+                )
+                if futuro is None:
+                    return resposta_fila_cheia(numero)
+                status, aviso = "deferred", MENSAGEM_ADIADA
             else:
-                logger.error(f"❌ Erro ao enviar alerta administrativo para {numero_admin}")
+                status, aviso = "shed", MENSAGEM_DESCARTADA
             
-            return jsonify({"status": "error", "message": mensagem_erro_usuario, "numero": numero}), 200
-        
-        # Fluxo normal - requisição foi bem-sucedida
-        # Salva a resposta do bot no histórico (user = 'Bot UNIALFA')
-        db.inserir_historico(numero, resposta_groq, user='Bot UNIALFA')
-        logger.info(f"💾 Resposta do bot salva no histórico para {numero}")
-        
-        # Envia resposta para o WhatsApp
-        sucesso_envio = enviar_resposta_whatsapp(numero, resposta_groq)
+            # O aviso não entra no histórico para não alterar o contexto da conversa
+            enviar_resposta_whatsapp(numero, aviso)
+            return jsonify({"status": status, "message": aviso, "numero": numero}), 200
         
-        if sucesso_envio:
-            logger.info(f"✅ Resposta enviada com sucesso para {numero}")
-        else:
-            logger.error(f"❌ Erro ao enviar resposta para {numero}")
+        # Primeiro contato vai na faixa alta; continuações disputam a faixa normal em round robin
+        futuro = agendador.submeter(
+            numero, processar_mensagem, numero, mensagem_atual, tenant, prioridade=prioridade, tenant_id=tenant.id
+        )
+        if futuro is None:
+            return resposta_fila_cheia(numero)
         
-        # Resposta de sucesso para o WhatsApp
-        return jsonify({"status": "success", "message": resposta_groq, "numero": numero}), 200
+        controle_admissao.acompanhar(futuro)
+        return aguardar_tarefa(futuro, numero)
         
     except Exception as e:
         logger.error(f"❌ Erro ao processar webhook: {str(e)}")
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import deque
+from config import Config
+from app.services.model_router import roteador
+from app.services.scheduler_service import agendador, PRIORIDADE_ADIADA
+
+logger = logging.getLogger(__name__)
+
+MENSAGEM_ADIADA = "Estamos com alta demanda, responderemos em instantes."
+MENSAGEM_DESCARTADA = "Estamos com alta demanda no momento. Por favor, envie sua mensagem novamente em alguns minutos."
+
+# Decisões de admissão
+ADMITIR = 'admitir'
+ADIAR = 'adiar'
+DESCARTAR = 'descartar'
+
+class ControleAdmissao:
+    """
+    Controle de admissão na frente das chamadas ao Groq
+
+    Acompanha as requisições em andamento, a faixa de adiadas do agendador
+    e o p90 da latência do Groq na janela ADMISSAO_JANELA_SEGUNDOS (sem
+    respostas na janela, a latência não pesa). Acima do limite, a mensagem é primeiro
+    adiada (vai para a faixa de menor prioridade e é respondida depois, o
+    que custa pouco) e, com a faixa cheia, descartada com um aviso de alta
+    demanda. Respostas locais e comandos administrativos não passam pelo
+    controle. Mensagens retidas até o orçamento do tenant contam como
+    adiadas, no mesmo limite ADMISSAO_MAX_ADIADAS.
+    """
+
+    def __init__(self):
+        self.em_andamento = 0
+        self.retidas = 0
+        self.contagem = {ADMITIR: 0, ADIAR: 0, DESCARTAR: 0}
+        self._decisoes_recentes = deque()  # (time.monotonic(), decisao) da última janela
+        self._lock = threading.Lock()
+
+    def calcular_carga(self):
+        """
+        Retorna a pressão atual (1.0 = no limite configurado)
+
+        Returns:
+            float: Maior razão entre em andamento, fila e latência e seus limites
+        """
+        # Só medições recentes: uma resposta lenta antiga não deixa a instância sobrecarregada para sempre
+        latencia = roteador.latencia_recente_ms(Config.ADMISSAO_JANELA_SEGUNDOS)
+        return max(
+            self.em_andamento / Config.ADMISSAO_MAX_EM_ANDAMENTO,
+            self.adiadas() / Config.ADMISSAO_MAX_ADIADAS,
+            latencia / Config.ADMISSAO_LATENCIA_GROQ_MS
+        )
+
+    def avaliar(self):
+        """
+        Decide se a mensagem é processada agora, adiada ou descartada
+
+        Returns:
+            str: ADMITIR, ADIAR ou DESCARTAR
+        """
+        with self._lock:
+            if self.calcular_carga() < 1:
+                decisao = ADMITIR
+            elif self.adiadas() < Config.ADMISSAO_MAX_ADIADAS:
+                decisao = ADIAR
+            else:
+                decisao = DESCARTAR
+            self._registrar(decisao)
+        if decisao != ADMITIR:
+            logger.warning(f"⚠️ Sobrecarga: mensagem {decisao} (em andamento: {self.em_andamento}, adiadas: {self.adiadas()})")
+        return decisao
+
+    def adiadas(self):
+        """Mensagens esperando: faixa de adiadas do agendador e retidas pelo orçamento do tenant"""
+        return agendador.pendentes(PRIORIDADE_ADIADA) + self.retidas
+
+    def pode_reter(self):
+        """True se ainda cabe uma mensagem esperando (mesmo limite das adiadas)"""
+        return self.adiadas() < Config.ADMISSAO_MAX_ADIADAS
+
+    def reter(self, espera, funcao, *args):
+        """
+        Executa funcao(*args) daqui a espera segundos, contando a mensagem como adiada até lá
+
+        Args:
+            espera: Segundos até a ficha reservada no orçamento do tenant
+            funcao: Função que envia a mensagem ao agendador
+        """
+        with self._lock:
+            self.retidas += 1
+        temporizador = threading.Timer(espera, self._liberar_retida, (funcao, args))
+        temporizador.daemon = True
+        temporizador.start()
+
+    def _liberar_retida(self, funcao, args):
+        with self._lock:
+            self.retidas -= 1
+        try:
+            funcao(*args)
+        except Exception as e:
+            logger.error(f"❌ Erro ao liberar mensagem retida: {str(e)}")
+
+    def _registrar(self, decisao):
+        agora = time.monotonic()
+        self.contagem[decisao] += 1
+        self._decisoes_recentes.append((agora, decisao))
+        while self._decisoes_recentes and agora - self._decisoes_recentes[0][0] > Config.ADMISSAO_JANELA_SEGUNDOS:
+            self._decisoes_recentes.popleft()
+
+    def acompanhar(self, futuro):
+        """
+        Conta a requisição admitida como em andamento até o futuro concluir
+
+        Args:
+            futuro: Future devolvido pelo agendador
+        """
+        with self._lock:
+            self.em_andamento += 1
+        futuro.add_done_callback(self._concluir)
+
+    def _concluir(self, futuro):
+        with self._lock:
+            self.em_andamento -= 1
+
+    def obter_estatisticas(self):
+        """Retorna carga atual, contagens e taxa de descarte na janela recente"""
+        with self._lock:
+            recentes = [decisao for _, decisao in self._decisoes_recentes]
+            total = sum(self.contagem.values())
+            return {
+                "carga": round(self.calcular_carga(), 3),
+                "em_andamento": self.em_andamento,
+                "adiadas_na_fila": self.adiadas(),
+                "retidas_por_orcamento": self.retidas,
+                "contagem": dict(self.contagem),
+                "taxa_descarte": round(self.contagem[DESCARTAR] / total, 4) if total else 0.0,
+                "taxa_descarte_recente": round(recentes.count(DESCARTAR) / len(recentes), 4) if recentes else 0.0,
+                "taxa_adiamento_recente": round(recentes.count(ADIAR) / len(recentes), 4) if recentes else 0.0
+            }
+
+# Instância global do controle de admissão
+controle_admissao = ControleAdmissao()
+
+def obter_estatisticas_admissao():
+    """Função para obter as estatísticas do controle de admissão"""
+    return controle_admissao.obter_estatisticas()
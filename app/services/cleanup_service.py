@@ -1,6 +1,7 @@
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.cron import CronTrigger
 import atexit
 from config import Config
 from db_manager import db
@@ -25,6 +26,30 @@ class CleanupService:
             logger.error(f"❌ Erro na limpeza automática: {str(e)}")
             return 0
     
+    def consolidar_uso_groq(self):
+        """
+        Consolida o uso bruto do Groq nas tabelas por hora e por dia
+        """
+        try:
+            consolidadas = db.consolidar_uso_groq(Config.USO_GROQ_RETENCAO_HORAS)
+            logger.info(f"📊 Consolidação de uso concluída: {consolidadas} requisições")
+            return consolidadas
+        except Exception as e:
+            logger.error(f"❌ Erro na consolidação de uso: {str(e)}")
+            return 0
+    
+    def executar_manutencao(self):
+        """
+        Executa checkpoint do WAL, vacuum incremental e optimize do SQLite
+        """
+        try:
+            resultado = db.executar_manutencao()
+            logger.info(f"🔧 Manutenção do banco concluída: {db.obter_metricas_banco()}")
+            return resultado
+        except Exception as e:
+            logger.error(f"❌ Erro na manutenção do banco: {str(e)}")
+            return None
+    
     def iniciar_scheduler(self):
         """
         Inicia o scheduler para executar a limpeza automaticamente
@@ -42,11 +67,31 @@ class CleanupService:
                 replace_existing=True
             )
             
+            # Adiciona a tarefa de consolidação do uso do Groq
+            self.scheduler.add_job(
+                func=self.consolidar_uso_groq,
+                trigger=IntervalTrigger(minutes=Config.ROLLUP_INTERVALO_MINUTOS),
+                id='consolidacao_uso_groq',
+                name='Consolidação do uso do Groq',
+                replace_existing=True
+            )
+            
+            # Adiciona a tarefa de manutenção do banco (fora do horário de pico)
+            self.scheduler.add_job(
+                func=self.executar_manutencao,
+                trigger=CronTrigger(hour=Config.MANUTENCAO_HORA, minute=0),
+                id='manutencao_banco',
+                name='Manutenção do SQLite',
+                replace_existing=True
+            )
+            
             # Inicia o scheduler
             self.scheduler.start()
             
             logger.info("✅ Scheduler de limpeza iniciado com sucesso")
             logger.info(f"📅 Tarefa agendada: Limpeza de histórico a cada {Config.CLEANUP_INTERVAL_HOURS} horas")
+            logger.info(f"📅 Tarefa agendada: Consolidação do uso do Groq a cada {Config.ROLLUP_INTERVALO_MINUTOS} minutos")
+            logger.info(f"📅 Tarefa agendada: Manutenção do banco diariamente às {Config.MANUTENCAO_HORA}h")
             
             # Registra função de limpeza para quando a aplicação for encerrada
             atexit.register(self.parar_scheduler)
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+import requests
+from config import Config
+from db_manager import db
+from app.services.model_router import roteador
+from app.services.cleanup_service import cleanup_service
+from app.services.admission_service import controle_admissao
+from app.services.warmup_service import aquecimento
+
+logger = logging.getLogger(__name__)
+
+class HealthService:
+    """
+    Verificação de prontidão da instância com resultado em cache
+
+    As sondagens (latência do SQLite, scheduler, Groq e fila) rodam no máximo
+    uma vez a cada HEALTH_CACHE_SEGUNDOS, então um load balancer consultando
+    /readyz com frequência não adiciona carga ao banco nem ao Groq.
+    """
+
+    def __init__(self):
+        self._resultado = None
+        self._calculado_em = 0.0
+        self._lock = threading.Lock()
+        self._groq_sondado_em = 0.0
+        self._groq_alcancavel = None
+
+    def verificar_prontidao(self):
+        """
+        Retorna o último resultado de prontidão, recalculando se estiver vencido
+
+        Returns:
+            dict: Resultado com 'pronto' e o detalhe de cada dependência
+        """
+        # Até o aquecimento concluir a instância não recebe tráfego (fora do cache,
+        # para ficar pronta assim que ele terminar)
+        estado_aquecimento = aquecimento.obter_estado()
+        if not estado_aquecimento["concluido"]:
+            problema = "aquecimento em andamento" if estado_aquecimento["iniciado"] else "aquecimento não iniciado"
+            return {"pronto": False, "problemas": [problema], "aquecimento": estado_aquecimento}
+
+        agora = time.monotonic()
+        if self._resultado is None or agora - self._calculado_em >= Config.HEALTH_CACHE_SEGUNDOS:
+            # Só uma thread recalcula; as demais usam o resultado anterior, se houver
+            if self._lock.acquire(blocking=self._resultado is None):
+                try:
+                    if self._resultado is None or time.monotonic() - self._calculado_em >= Config.HEALTH_CACHE_SEGUNDOS:
+                        self._resultado = self._calcular()
+                        self._calculado_em = time.monotonic()
+                finally:
+                    self._lock.release()
+        return self._resultado
+
+    def _calcular(self):
+        problemas = []
+        estado_aquecimento = aquecimento.obter_estado()
+
+        # Banco de dados: migração que falhou no aquecimento é tentada de novo aqui
+        try:
+            if not db.esta_inicializado():
+                db.inicializar()
+            banco = db.medir_latencia()
+            banco["ok"] = banco["escrita_ms"] <= Config.HEALTH_DB_LATENCIA_MAXIMA_MS
+            if not banco["ok"]:
+                problemas.append("latência do banco acima do limite")
+        except Exception as e:
+            logger.error(f"❌ Sondagem do banco falhou: {str(e)}")
+            banco = {"ok": False, "erro": str(e)}
+            problemas.append("banco indisponível" if db.esta_inicializado() else "migrações do banco não aplicadas")
+
+        # Scheduler (não tira a instância de rotação, apenas reporta)
+        scheduler = {"ativo": cleanup_service.verificar_status()}
+
+        # Groq: sinais passivos das chamadas reais, sondagem ativa só sem tráfego recente
+        groq = roteador.obter_sinais_groq()
+        groq["alcancavel"] = self._groq_alcancavel_agora(groq)
+        if not groq["alcancavel"]:
+            problemas.append("Groq inacessível")
+        elif groq["todos_circuitos_abertos"]:
+            problemas.append("todos os circuitos do Groq abertos")
+
+        # Fila de gravação do histórico
+        backlog = db.total_historico_pendente()
+        fila = {"historico_pendente": backlog}
+        if backlog > Config.HEALTH_BACKLOG_MAXIMO:
+            problemas.append("fila de gravação acima do limite")
+
+        # Sobrecarga: com a fila de adiadas cheia a instância só descarta mensagens
+        admissao = controle_admissao.obter_estatisticas()
+        fila["adiadas"] = admissao["adiadas_na_fila"]
+        fila["em_andamento"] = admissao["em_andamento"]
+        if admissao["adiadas_na_fila"] >= Config.ADMISSAO_MAX_ADIADAS:
+            problemas.append("instância sobrecarregada")
+
+        return {
+            "pronto": not problemas,
+            "problemas": problemas,
+            "banco": banco,
+            "scheduler": scheduler,
+            "groq": groq,
+            "fila": fila,
+            "aquecimento": estado_aquecimento
+        }
+
+    def _groq_alcancavel_agora(self, sinais):
+        ultimo_sucesso = sinais["ultimo_sucesso_ha_segundos"]
+        if ultimo_sucesso is not None and ultimo_sucesso < Config.HEALTH_GROQ_PROBE_SEGUNDOS:
+            return True
+
+        agora = time.monotonic()
+        if self._groq_alcancavel is None or agora - self._groq_sondado_em >= Config.HEALTH_GROQ_PROBE_SEGUNDOS:
+            self._groq_alcancavel = self._sondar_groq()
+            self._groq_sondado_em = agora
+        return self._groq_alcancavel
+
+    def _sondar_groq(self):
+        """Lista os modelos do Groq (não consome tokens) para verificar conectividade e chave"""
+        if not Config.GROQ_API_KEY:
+            return False
+        try:
+            response = requests.get(
+                Config.GROQ_MODELS_URL,
+                headers={"Authorization": f"Bearer {Config.GROQ_API_KEY}"},
+                timeout=3
+            )
+            return response.status_code == 200
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"⚠️ Sondagem do Groq falhou: {str(e)}")
+            return False
+
+# Instância global do serviço de health check
+health_service = HealthService()
+
+def verificar_prontidao():
+    """Função para verificar se a instância está pronta para receber tráfego"""
+    return health_service.verificar_prontidao()
@@ -0,0 +1,118 @@
+import logging
+import re
+import threading
+import unicodedata
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+APRESENTACAO = "Olá, sou Lídia, assistente virtual da UNIALFA."
+
+# Padrões por intenção, aplicados à mensagem normalizada (minúsculas, sem acentos e pontuação)
+PADROES_INTENCOES = {
+    'saudacao': (
+        r"(?:oi+e?|ola+|opa|hey|hello|salve|e ai|eai|bom dia|boa tarde|boa noite)"
+        r"(?: (?:lidia|unialfa|tudo bem|tudo bom|td bem|como vai|bom dia|boa tarde|boa noite))*"
+    ),
+    'agradecimento': (
+        r"(?:(?:muito )?obrigad[oa]|obg|brigad[oa]|valeu|vlw|grat[oa]|agradeco)"
+        r"(?: (?:lidia|mesmo|viu|pela ajuda|demais|muito))*"
+    ),
+    # Só o marcador exato: documento com nome de arquivo segue para o Groq
+    'midia': (
+        r"\[(?:audio|imagem|video|localizacao|contato|mensagem nao suportada)\]"
+        r"|\[documento\](?: documento sem nome)?"
+    ),
+}
+
+# Respostas seguem o prompt do sistema: apresentação só na primeira interação, sem emojis
+RESPOSTAS_PADRAO = {
+    'saudacao': "Como posso te ajudar?",
+    'agradecimento': "Por nada, precisando estou à disposição!",
+    'midia': "No momento consigo responder apenas mensagens de texto. Pode escrever sua dúvida?",
+}
+
+def normalizar_mensagem(mensagem):
+    """
+    Normaliza a mensagem para comparação com os padrões locais
+
+    Args:
+        mensagem: Texto recebido do aluno
+
+    Returns:
+        str: Texto em minúsculas, sem acentos, pontuação ou espaços repetidos
+    """
+    texto = unicodedata.normalize('NFKD', mensagem or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    if texto.lstrip().startswith('['):
+        # Mantém os colchetes dos marcadores de mídia gerados por extrair_conteudo_mensagem
+        return ' '.join(texto.split())
+    texto = re.sub(r"[^\w\s]", ' ', texto)
+    return ' '.join(texto.split())
+
+class ClassificadorIntencoes:
+    """Responde localmente mensagens que não precisam do Groq (saudações, agradecimentos e mídia)"""
+
+    def __init__(self, intencoes=None, respostas=None):
+        intencoes = intencoes if intencoes is not None else Config.FAST_PATH_INTENCOES
+        self.respostas = dict(RESPOSTAS_PADRAO, **(respostas or {}))
+        # Um único autômato com grupos nomeados, compilado uma vez
+        alternativas = [
+            f"(?P<{nome}>{padrao})" for nome, padrao in PADROES_INTENCOES.items() if nome in intencoes
+        ]
+        self.padrao = re.compile(f"^(?:{'|'.join(alternativas)})$") if alternativas else None
+        self.contagem = {nome: 0 for nome in PADROES_INTENCOES}
+        self._lock = threading.Lock()
+
+    def classificar(self, mensagem):
+        """Retorna o nome da intenção reconhecida ou None"""
+        if self.padrao is None:
+            return None
+        correspondencia = self.padrao.match(normalizar_mensagem(mensagem))
+        return correspondencia.lastgroup if correspondencia else None
+
+    def responder(self, mensagem, primeira_interacao):
+        """
+        Gera a resposta local para a mensagem, se houver intenção reconhecida
+
+        Args:
+            mensagem: Mensagem atual do aluno
+            primeira_interacao: True se o bot ainda não respondeu nesta conversa
+
+        Returns:
+            str: Resposta pronta ou None se a mensagem deve ir para o Groq
+        """
+        if not Config.FAST_PATH_ATIVO:
+            return None
+
+        intencao = self.classificar(mensagem)
+        if intencao is None:
+            return None
+
+        resposta = self.respostas[intencao]
+        if primeira_interacao:
+            resposta = f"{APRESENTACAO} {resposta}"
+
+        with self._lock:
+            self.contagem[intencao] += 1
+        logger.info(f"⚡ Resposta local para intenção '{intencao}' (chamada ao Groq evitada)")
+        return resposta
+
+    def obter_estatisticas(self):
+        """Retorna quantas chamadas ao Groq foram evitadas por intenção"""
+        with self._lock:
+            return {
+                "chamadas_groq_economizadas": sum(self.contagem.values()),
+                "por_intencao": dict(self.contagem)
+            }
+
+# Instância global do classificador de intenções
+classificador = ClassificadorIntencoes()
+
+def responder_intencao_local(mensagem, primeira_interacao):
+    """Função para responder localmente mensagens simples"""
+    return classificador.responder(mensagem, primeira_interacao)
+
+def obter_estatisticas_intencoes():
+    """Função para obter as chamadas ao Groq economizadas"""
+    return classificador.obter_estatisticas()
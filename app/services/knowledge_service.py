@@ -0,0 +1,474 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from config import Config
+from db_manager import db, TENANT_PADRAO
+from app.services.intent_service import normalizar_mensagem
+
+logger = logging.getLogger(__name__)
+
+PADRAO_TITULO = re.compile(r'^\s{0,3}#{1,6}\s+(.*)$')
+
+PALAVRAS_VAZIAS = {
+    'a', 'o', 'as', 'os', 'um', 'uma', 'de', 'da', 'do', 'das', 'dos', 'e', 'em', 'no', 'na', 'nos', 'nas',
+    'para', 'por', 'com', 'que', 'se', 'ao', 'aos', 'eu', 'voce', 'me', 'meu', 'minha', 'ou', 'ser', 'sao',
+}
+
+# Parâmetros do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenizar(texto):
+    """Extrai os termos indexáveis do texto (normalizado, sem palavras vazias)"""
+    return [termo for termo in normalizar_mensagem(texto).split() if len(termo) > 1 and termo not in PALAVRAS_VAZIAS]
+
+def calcular_hash_secao(titulo, conteudo):
+    return hashlib.sha256(f"{titulo}\n{conteudo}".encode('utf-8')).hexdigest()
+
+def iterar_secoes(linhas):
+    """
+    Divide um documento markdown/texto em seções, lendo linha a linha
+
+    Cada título markdown abre uma nova seção, que guarda as linhas originais
+    (inclusive a do título); textos longos sem título são quebrados em uma
+    linha em branco depois de KB_SECAO_MAX_CARACTERES.
+
+    Args:
+        linhas: Iterável de linhas do arquivo
+
+    Yields:
+        tuple: (titulo, conteudo) com a linha do título como escrita ('' antes do primeiro título)
+    """
+    titulo = ''
+    buffer = []
+    tamanho = 0
+
+    for linha in linhas:
+        linha = linha.rstrip('\r\n')
+        titulo_encontrado = PADRAO_TITULO.match(linha)
+
+        if titulo_encontrado or (tamanho >= Config.KB_SECAO_MAX_CARACTERES and not linha.strip()):
+            conteudo = '\n'.join(buffer).strip('\n')
+            if conteudo.strip():
+                yield titulo, conteudo
+            buffer = []
+            tamanho = 0
+            if titulo_encontrado:
+                titulo = linha.strip()
+                buffer.append(linha)
+                tamanho += len(linha)
+            continue
+
+        buffer.append(linha)
+        tamanho += len(linha)
+
+    conteudo = '\n'.join(buffer).strip('\n')
+    if conteudo.strip():
+        yield titulo, conteudo
+
+def registrar_linhas(linhas, destino):
+    """Repassa as linhas (sem a quebra) guardando-as em destino, para manter o texto original"""
+    for linha in linhas:
+        linha = linha.rstrip('\r\n')
+        destino.append(linha)
+        yield linha
+
+def com_titulo(titulo, texto):
+    """Prefixa o título da seção ao texto que ainda não começa por ele"""
+    if not titulo or texto.startswith(titulo):
+        return texto
+    return f"{titulo}\n{texto}"
+
+def dividir_em_trechos(titulo, conteudo):
+    """Divide o conteúdo da seção em trechos de até KB_TRECHO_CARACTERES, respeitando parágrafos"""
+    limite = Config.KB_TRECHO_CARACTERES
+    trechos = []
+    atual = ''
+    for paragrafo in re.split(r'\n\s*\n', conteudo):
+        paragrafo = paragrafo.strip()
+        while len(paragrafo) > limite:
+            if atual:
+                trechos.append(atual)
+                atual = ''
+            trechos.append(paragrafo[:limite])
+            paragrafo = paragrafo[limite:]
+        if atual and len(atual) + len(paragrafo) + 2 > limite:
+            trechos.append(atual)
+            atual = ''
+        if paragrafo:
+            atual = f"{atual}\n\n{paragrafo}" if atual else paragrafo
+    if atual:
+        trechos.append(atual)
+    # Trechos do meio da seção levam o título para não perder o assunto na busca
+    return [com_titulo(titulo, trecho) for trecho in trechos]
+
+class VersaoBase:
+    """Versão publicada (imutável) da base: ordem das seções e conjunto ativo"""
+
+    def __init__(self, versao_id, hashes, texto=None):
+        self.id = versao_id
+        self.hashes = hashes
+        self.ativos = frozenset(hashes)
+        self.texto = texto  # documentos como foram enviados (None em versões antigas)
+        self.tamanho = 0
+        self.texto_completo = texto  # sem o texto original, montado sob demanda pelas seções
+
+class BaseConhecimento:
+    """
+    Base de conhecimento com ingestão incremental e busca por trechos
+
+    As seções são identificadas pelo hash do conteúdo. Em uma nova ingestão só
+    as seções novas passam por divisão em trechos e indexação; a nova versão é
+    publicada de uma vez (banco em uma transação e troca da referência em
+    memória), e as seções que saíram são removidas do índice em seguida.
+    """
+
+    def __init__(self, tenant_id=TENANT_PADRAO):
+        self.tenant_id = tenant_id
+        self._versao = VersaoBase(None, [])
+        self._secoes = {}          # hash -> (titulo, conteudo)
+        self._trechos = {}         # hash -> lista de ids de trecho
+        self._textos = {}          # id do trecho -> texto
+        self._termos_trecho = {}   # id do trecho -> Counter de termos
+        self._comprimentos = {}    # id do trecho -> quantidade de termos
+        self._indice = {}          # termo -> {id do trecho: frequência}
+        self._soma_comprimentos = 0
+        self._cache_buscas = {}    # (versao, consulta) -> resultado, limpo a cada publicação
+        self._lock = threading.RLock()
+        self._ingestao_lock = threading.RLock()
+        self._carregada = False
+        self._verificada_em = 0.0  # time.monotonic() da última conferência da versão ativa no banco
+
+    # ===== ÍNDICE =====
+
+    def _indexar_secao(self, hash_secao, titulo, conteudo):
+        self._secoes[hash_secao] = (titulo, conteudo)
+        ids = []
+        for posicao, texto in enumerate(dividir_em_trechos(titulo, conteudo)):
+            id_trecho = f"{hash_secao}:{posicao}"
+            termos = Counter(tokenizar(texto))
+            self._textos[id_trecho] = texto
+            self._termos_trecho[id_trecho] = termos
+            self._comprimentos[id_trecho] = sum(termos.values())
+            self._soma_comprimentos += self._comprimentos[id_trecho]
+            for termo, frequencia in termos.items():
+                self._indice.setdefault(termo, {})[id_trecho] = frequencia
+            ids.append(id_trecho)
+        self._trechos[hash_secao] = ids
+
+    def _remover_secao(self, hash_secao):
+        self._secoes.pop(hash_secao, None)
+        for id_trecho in self._trechos.pop(hash_secao, []):
+            self._textos.pop(id_trecho, None)
+            termos = self._termos_trecho.pop(id_trecho, Counter())
+            self._soma_comprimentos -= self._comprimentos.pop(id_trecho, 0)
+            for termo in termos:
+                postagens = self._indice.get(termo)
+                if postagens is not None:
+                    postagens.pop(id_trecho, None)
+                    if not postagens:
+                        del self._indice[termo]
+
+    def _publicar_em_memoria(self, versao):
+        with self._lock:
+            if versao.texto is not None:
+                versao.tamanho = len(versao.texto)
+            else:
+                versao.tamanho = sum(len(com_titulo(*self._secoes[h])) + 2 for h in versao.hashes)
+            removidas = self._versao.ativos - versao.ativos
+            self._versao = versao
+            self._carregada = True
+            self._cache_buscas.clear()
+            for hash_secao in removidas:
+                self._remover_secao(hash_secao)
+        return len(removidas)
+
+    # ===== INGESTÃO =====
+
+    def ingerir(self, arquivos):
+        """
+        Ingere documentos e publica a nova versão da base
+
+        Args:
+            arquivos: Iterável de tuplas (nome_arquivo, iteravel_de_linhas)
+
+        Returns:
+            dict: Resumo da ingestão ou None em caso de erro
+        """
+        with self._ingestao_lock:
+            inicio = time.perf_counter()
+            ordem = []
+            novas = {}
+            documentos = []
+            for nome_arquivo, linhas in arquivos:
+                originais = []
+                documentos.append(originais)
+                for titulo, conteudo in iterar_secoes(registrar_linhas(linhas, originais)):
+                    hash_secao = calcular_hash_secao(titulo, conteudo)
+                    ordem.append((hash_secao, nome_arquivo))
+                    # Seções já indexadas não guardam conteúdo em memória durante a leitura
+                    if hash_secao not in self._secoes and hash_secao not in novas:
+                        novas[hash_secao] = (titulo, conteudo)
+            # Texto original da versão: enviado inteiro (bases pequenas) e devolvido em GET /contexto
+            texto = '\n\n'.join('\n'.join(originais) for originais in documentos)
+            leitura_ms = (time.perf_counter() - inicio) * 1000
+
+            if not novas and [hash_secao for hash_secao, _ in ordem] == self._versao.hashes and texto == self._versao.texto:
+                logger.info("📚 Base de conhecimento sem alterações; versão atual mantida")
+                return {
+                    "versao": self._versao.id,
+                    "total_secoes": len(ordem),
+                    "secoes_novas": 0,
+                    "secoes_removidas": 0,
+                    "secoes_reaproveitadas": len(ordem),
+                    "leitura_ms": round(leitura_ms, 2),
+                    "reindexacao_ms": 0.0
+                }
+
+            inicio = time.perf_counter()
+            with self._lock:
+                for hash_secao, (titulo, conteudo) in novas.items():
+                    self._indexar_secao(hash_secao, titulo, conteudo)
+            reindexacao_ms = (time.perf_counter() - inicio) * 1000
+
+            versao_id = db.publicar_versao_base(ordem, novas, Config.KB_VERSOES_MANTIDAS, self.tenant_id, texto)
+            if versao_id is None:
+                # Desfaz a indexação das seções que não chegaram a ser publicadas
+                with self._lock:
+                    for hash_secao in novas:
+                        if hash_secao not in self._versao.ativos:
+                            self._remover_secao(hash_secao)
+                return None
+
+            removidas = self._publicar_em_memoria(VersaoBase(versao_id, [hash_secao for hash_secao, _ in ordem], texto))
+
+            resumo = {
+                "versao": versao_id,
+                "total_secoes": len(ordem),
+                "secoes_novas": len(novas),
+                "secoes_removidas": removidas,
+                "secoes_reaproveitadas": len(ordem) - len(novas),
+                "leitura_ms": round(leitura_ms, 2),
+                "reindexacao_ms": round(reindexacao_ms, 2)
+            }
+            logger.info(f"📚 Base de conhecimento atualizada: {resumo}")
+            return resumo
+
+    def ingerir_texto(self, texto, nome_arquivo='contexto'):
+        """Ingere um texto único (atualização de contexto pela API ou pelo WhatsApp)"""
+        return self.ingerir([(nome_arquivo, texto.splitlines())])
+
+    def montar(self, versao_id, secoes, texto=None):
+        """
+        Monta o índice de uma versão já lida do banco, sem acessar o banco
+
+        Args:
+            versao_id: id da versão
+            secoes: Lista de (hash, arquivo, titulo, conteudo) na ordem dos documentos
+            texto: Texto original da versão (None em versões antigas)
+        """
+        with self._lock:
+            for hash_secao, _, titulo, conteudo in secoes:
+                if hash_secao not in self._secoes:
+                    self._indexar_secao(hash_secao, titulo, conteudo)
+        self._publicar_em_memoria(VersaoBase(versao_id, [secao[0] for secao in secoes], texto))
+
+    def carregar(self):
+        """
+        Carrega a versão ativa do banco e monta o índice
+
+        Sem base publicada, importa a documentação da tabela contexto.
+        """
+        versao_id, secoes, texto = db.obter_versao_base_ativa(self.tenant_id)
+        if versao_id is None:
+            documentacoes = db.obter_contexto(self.tenant_id)
+            if documentacoes:
+                logger.info("📚 Importando documentação da tabela contexto para a base de conhecimento")
+                self.ingerir_texto(documentacoes[0])
+            self._carregada = True
+            return
+
+        self.montar(versao_id, secoes, texto)
+        logger.info(f"📚 Base de conhecimento carregada: versão {versao_id} com {len(secoes)} seções (tenant {self.tenant_id})")
+
+    # ===== CONSULTA =====
+
+    def garantir_carregada(self):
+        """
+        Carrega a base na primeira consulta e a recarrega quando outro processo publica uma versão
+
+        A versão ativa no banco é conferida no máximo a cada KB_VERIFICACAO_VERSAO_SEGUNDOS.
+        """
+        if not self._carregada:
+            with self._ingestao_lock:
+                if not self._carregada:
+                    self.carregar()
+                    self._verificada_em = time.monotonic()
+            return
+
+        agora = time.monotonic()
+        if agora - self._verificada_em < Config.KB_VERIFICACAO_VERSAO_SEGUNDOS:
+            return
+        self._verificada_em = agora
+        versao_id = db.obter_id_versao_base_ativa(self.tenant_id)
+        if versao_id is None or versao_id == self._versao.id:
+            return
+        with self._ingestao_lock:
+            if versao_id != self._versao.id:
+                logger.info(f"📚 Versão {versao_id} da base publicada por outro processo; recarregando (tenant {self.tenant_id})")
+                self.carregar()
+
+    def tem_conteudo(self):
+        return bool(self._versao.hashes)
+
+    def texto_completo(self):
+        """Retorna a base inteira como foi enviada (versões antigas: as seções na ordem, com repetições)"""
+        with self._lock:
+            versao = self._versao
+            if versao.texto_completo is None:
+                versao.texto_completo = '\n\n'.join(com_titulo(*self._secoes[hash_secao]) for hash_secao in versao.hashes)
+            return versao.texto_completo
+
+    def buscar(self, consulta, k=None):
+        """
+        Busca os trechos mais relevantes para a consulta (BM25)
+
+        Args:
+            consulta: Texto da pergunta
+            k: Quantidade de trechos
+
+        Returns:
+            tuple: (lista de textos, score de 0 a 1 = fração dos termos da consulta no melhor trecho)
+        """
+        k = k or Config.KB_TRECHOS_POR_CONSULTA
+        termos = set(tokenizar(consulta))
+        with self._lock:
+            versao = self._versao
+            chave = (versao.id, frozenset(termos), k)
+            if chave in self._cache_buscas:
+                return self._cache_buscas[chave]
+
+            total_trechos = len(self._textos) or 1
+            media_comprimento = self._soma_comprimentos / total_trechos
+            pontuacoes = Counter()
+            for termo in termos:
+                postagens = self._indice.get(termo)
+                if not postagens:
+                    continue
+                idf = math.log(1 + (total_trechos - len(postagens) + 0.5) / (len(postagens) + 0.5))
+                for id_trecho, frequencia in postagens.items():
+                    if id_trecho.split(':', 1)[0] not in versao.ativos:
+                        continue
+                    comprimento = self._comprimentos[id_trecho]
+                    pontuacoes[id_trecho] += idf * frequencia * (BM25_K1 + 1) / (
+                        frequencia + BM25_K1 * (1 - BM25_B + BM25_B * comprimento / (media_comprimento or 1))
+                    )
+
+            melhores = [id_trecho for id_trecho, _ in pontuacoes.most_common(k)]
+            score = None
+            if melhores and termos:
+                score = len(termos & set(self._termos_trecho[melhores[0]])) / len(termos)
+            resultado = ([self._textos[id_trecho] for id_trecho in melhores], score)
+
+            if len(self._cache_buscas) >= 1024:
+                self._cache_buscas.clear()
+            self._cache_buscas[chave] = resultado
+            return resultado
+
+    def obter_documentacao(self, mensagem):
+        """
+        Retorna a documentação a enviar no prompt para a mensagem
+
+        Returns:
+            tuple: (documentacao, score_recuperacao ou None)
+        """
+        self.garantir_carregada()
+        documentacao = self.documentacao_indexada(mensagem)
+        if documentacao is None:
+            documentacoes = db.obter_contexto(self.tenant_id)
+            return (documentacoes[0] if documentacoes else "Documentação não disponível"), None
+        return documentacao
+
+    def documentacao_indexada(self, mensagem):
+        """
+        Retorna a documentação da base já em memória, sem acessar o banco
+
+        Returns:
+            tuple: (documentacao, score_recuperacao ou None) ou None se a base estiver vazia
+        """
+        if not self.tem_conteudo():
+            return None
+
+        if self._versao.tamanho <= Config.KB_LIMITE_DOCUMENTO_COMPLETO:
+            return self.texto_completo(), None
+
+        trechos, score = self.buscar(mensagem)
+        if not trechos:
+            return "Documentação não disponível", 0.0
+        return '\n\n---\n\n'.join(trechos), score
+
+    def __getstate__(self):
+        # Locks não são serializáveis: a cópia enviada a outro processo cria os seus
+        estado = self.__dict__.copy()
+        del estado['_lock'], estado['_ingestao_lock']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.RLock()
+        self._ingestao_lock = threading.RLock()
+
+    def obter_estatisticas(self):
+        with self._lock:
+            return {
+                "versao": self._versao.id,
+                "secoes": len(self._versao.ativos),
+                "trechos": len(self._textos),
+                "termos": len(self._indice)
+            }
+
+# Instância global da base de conhecimento (tenant padrão)
+base_conhecimento = BaseConhecimento()
+
+# Uma base (índice e cache de buscas próprios) por tenant
+bases_conhecimento = {TENANT_PADRAO: base_conhecimento}
+_bases_lock = threading.Lock()
+
+def obter_base(tenant_id=TENANT_PADRAO):
+    """Retorna a base de conhecimento do tenant, criando-a no primeiro uso"""
+    base = bases_conhecimento.get(tenant_id)
+    if base is None:
+        with _bases_lock:
+            base = bases_conhecimento.get(tenant_id)
+            if base is None:
+                base = bases_conhecimento[tenant_id] = BaseConhecimento(tenant_id)
+    return base
+
+def obter_documentacao_atual(tenant_id=TENANT_PADRAO):
+    """
+    Retorna a documentação em vigor do tenant, a mesma de onde saem os prompts
+
+    A base publicada (por /atualizar-contexto, pelo upload de arquivos ou pelo
+    comando admin) tem precedência; sem base, vale a tabela contexto.
+
+    Returns:
+        str: Documentação ou None se o tenant não tiver nenhuma
+    """
+    base = obter_base(tenant_id)
+    base.garantir_carregada()
+    if base.tem_conteudo():
+        return base.texto_completo()
+    documentacoes = db.obter_contexto(tenant_id)
+    return documentacoes[0] if documentacoes else None
+
+def obter_documentacao_para_prompt(mensagem, tenant_id=TENANT_PADRAO):
+    """Função para obter a documentação do prompt (completa ou recuperada)"""
+    return obter_base(tenant_id).obter_documentacao(mensagem)
+
+def obter_estatisticas_bases():
+    """Função para obter as estatísticas da base de cada tenant"""
+    return {tenant_id: base.obter_estatisticas() for tenant_id, base in list(bases_conhecimento.items())}
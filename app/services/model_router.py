@@ -0,0 +1,344 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Palavras que indicam pergunta, pedido de explicação ou de ajuda (mensagem já em minúsculas)
+PADRAO_PERGUNTA = re.compile(
+    r'\?|\b(como|por que|porque|quando|onde|qual|quais|quanto|explique|explica|passo|procedimento|diferença|ajuda|ajudar|dúvida|duvida)\b'
+)
+
+# Durações dos headers de reset do Groq ("7.66s", "2m59.56s", "120ms")
+PADRAO_DURACAO = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+SEGUNDOS_POR_UNIDADE = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+def ler_duracao(valor):
+    """Converte um header de reset ou retry-after em segundos (None se ausente ou inválido)"""
+    if valor is None:
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        pass
+    partes = PADRAO_DURACAO.findall(str(valor))
+    if not partes:
+        return None
+    return sum(float(numero) * SEGUNDOS_POR_UNIDADE[unidade] for numero, unidade in partes)
+
+class EstadoModelo:
+    """
+    Sinais observados de um modelo: latência, orçamento de rate limit e circuito
+
+    Um modelo evitado não recebe chamadas, então os sinais que o excluíram não
+    seriam atualizados: o orçamento vale até o reset informado pelo Groq e a
+    latência até ROTEADOR_VALIDADE_SINAIS_SEGUNDOS sem novas medições. Enquanto
+    isso, uma única sonda por intervalo testa o modelo; no circuito semiaberto
+    só a sonda passa.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.requisicoes = 0
+        self.falhas = 0
+        self.latencia_total_ms = 0.0
+        self.latencia_ewma_ms = None
+        self.latencia_medida_em = 0.0
+        self.latencias_recentes = deque(maxlen=200)
+        self.falhas_consecutivas = 0
+        self.circuito_aberto_ate = 0.0
+        self.orcamento_restante = None  # fração (0 a 1) do rate limit ainda disponível
+        self.orcamento_valido_ate = 0.0
+        self.sonda_ate = 0.0            # sonda em andamento até este instante (0 = nenhuma)
+        self.proxima_sonda = 0.0
+
+    def circuito(self, agora):
+        """Retorna 'fechado', 'aberto' ou 'semiaberto'"""
+        if self.falhas_consecutivas < Config.CIRCUITO_FALHAS_CONSECUTIVAS and self.circuito_aberto_ate <= agora:
+            return 'fechado'
+        if self.circuito_aberto_ate > agora:
+            return 'aberto'
+        return 'semiaberto'
+
+    def expirar_sinais(self, agora):
+        """Descarta o orçamento após o reset e a latência sem medições recentes"""
+        if self.orcamento_restante is not None and agora >= self.orcamento_valido_ate:
+            self.orcamento_restante = None
+        if self.latencia_ewma_ms is not None and \
+                agora - self.latencia_medida_em >= Config.ROTEADOR_VALIDADE_SINAIS_SEGUNDOS:
+            self.latencia_ewma_ms = None
+
+    def motivo_indisponivel(self, agora):
+        """Retorna o motivo pelo qual o modelo não deve ser usado agora ou None"""
+        self.expirar_sinais(agora)
+        if self.circuito(agora) == 'aberto':
+            return 'circuito'
+        if self.orcamento_restante is not None and self.orcamento_restante < Config.ROTEADOR_ORCAMENTO_MINIMO:
+            return 'orcamento'
+        if self.latencia_ewma_ms is not None and self.latencia_ewma_ms > Config.ROTEADOR_LATENCIA_MAXIMA_MS:
+            return 'latencia'
+        return None
+
+    def avaliar(self, agora):
+        """
+        Decide se o modelo pode receber a próxima chamada
+
+        Returns:
+            tuple: (motivo da indisponibilidade ou None, True se a chamada é uma sonda)
+        """
+        motivo = self.motivo_indisponivel(agora)
+        sonda_livre = self.sonda_ate <= agora
+        if motivo == 'circuito':
+            return motivo, False
+        if self.circuito(agora) == 'semiaberto':
+            return (None, True) if sonda_livre else ('circuito', False)
+        if motivo is None:
+            return None, False
+        if sonda_livre and agora >= self.proxima_sonda:
+            return None, True
+        return motivo, False
+
+    def iniciar_sonda(self, agora):
+        # A sonda sem resultado (processo interrompido) libera a vaga após a espera do circuito
+        self.sonda_ate = agora + Config.CIRCUITO_ESPERA_SEGUNDOS
+        self.proxima_sonda = agora + Config.ROTEADOR_SONDA_INTERVALO_SEGUNDOS
+
+    def estatisticas(self, agora):
+        latencias = sorted(self.latencias_recentes)
+        p95 = latencias[int(len(latencias) * 0.95) - 1] if latencias else None
+        sucessos = self.requisicoes - self.falhas
+        return {
+            "requisicoes": self.requisicoes,
+            "falhas": self.falhas,
+            "latencia_media_ms": round(self.latencia_total_ms / sucessos, 1) if sucessos else None,
+            "latencia_ewma_ms": round(self.latencia_ewma_ms, 1) if self.latencia_ewma_ms is not None else None,
+            "latencia_p95_ms": round(p95, 1) if p95 is not None else None,
+            "circuito": self.circuito(agora),
+            "orcamento_restante": self.orcamento_restante,
+            "sonda_em_andamento": self.sonda_ate > agora
+        }
+
+class RoteadorModelos:
+    """
+    Escolhe o modelo do Groq para cada mensagem
+
+    Combina uma heurística local de complexidade (tamanho da mensagem,
+    profundidade do histórico e score da recuperação) com sinais ao vivo de
+    cada modelo: latência observada, orçamento de rate limit e estado do circuito.
+    """
+
+    def __init__(self, modelos=None, limiares=None):
+        self.modelos = list(modelos or Config.GROQ_MODELS) or [Config.GROQ_MODEL]
+        self.limiares = sorted(limiares if limiares is not None else Config.ROTEADOR_LIMIARES)
+        self.estados = {modelo: EstadoModelo(modelo) for modelo in self.modelos}
+        self.decisoes = {}
+        self.ultimo_sucesso = None  # time.monotonic() da última resposta válida
+        self.ultima_latencia_ms = None
+        self._latencias_janela = deque(maxlen=1000)  # (time.monotonic(), latencia_ms) das respostas válidas
+        self._lock = threading.Lock()
+
+    def calcular_complexidade(self, mensagem, profundidade_historico=0, score_recuperacao=None):
+        """
+        Estima a complexidade da mensagem entre 0 (trivial) e 1 (complexa)
+
+        Args:
+            mensagem: Mensagem atual do aluno
+            profundidade_historico: Quantidade de mensagens anteriores na conversa
+            score_recuperacao: Score (0 a 1) do melhor trecho da documentação, se houver
+
+        Returns:
+            float: Complexidade estimada
+        """
+        texto = (mensagem or '').strip().lower()
+        complexidade = min(len(texto) / 200, 1.0) * 0.5
+        if PADRAO_PERGUNTA.search(texto):
+            # Sozinha, uma pergunta já alcança o limiar padrão: perguntas curtas também vão para o modelo maior
+            complexidade += 0.35
+        complexidade += min(profundidade_historico / 10, 1.0) * 0.15
+        if score_recuperacao is not None:
+            # Trecho bem casado com a pergunta indica consulta factual simples
+            complexidade += (1 - max(0.0, min(score_recuperacao, 1.0))) * 0.1
+        return min(complexidade, 1.0)
+
+    def escolher_modelo(self, mensagem, profundidade_historico=0, score_recuperacao=None, modelos=None):
+        """
+        Escolhe o modelo para a mensagem atual
+
+        Args:
+            modelos: Modelos permitidos (do menor para o maior), como os de um tenant;
+                padrão os do roteador. Os sinais de cada modelo são compartilhados.
+
+        Returns:
+            str: Nome do modelo escolhido
+        """
+        modelos = list(modelos or self.modelos)
+        if not Config.ROTEADOR_ATIVO or len(modelos) == 1:
+            return self._registrar_decisao(modelos[-1], 'fixo')
+
+        complexidade = self.calcular_complexidade(mensagem, profundidade_historico, score_recuperacao)
+        faixa = min(sum(1 for limiar in self.limiares if complexidade >= limiar), len(modelos) - 1)
+
+        # Prefere a faixa calculada; se indisponível, desce para modelos menores e depois sobe
+        candidatos = [faixa] + list(range(faixa - 1, -1, -1)) + list(range(faixa + 1, len(modelos)))
+        agora = time.monotonic()
+        sonda = False
+        with self._lock:
+            motivo_desvio = None
+            for indice in candidatos:
+                estado = self.estados.get(modelos[indice])
+                if estado is None:
+                    estado = self.estados[modelos[indice]] = EstadoModelo(modelos[indice])
+                motivo, sonda = estado.avaliar(agora)
+                if motivo is None:
+                    modelo = modelos[indice]
+                    if sonda:
+                        estado.iniciar_sonda(agora)
+                    break
+                motivo_desvio = motivo_desvio or motivo
+            else:
+                # Nenhum modelo saudável: mantém a faixa preferida e deixa o circuito testar
+                modelo = modelos[faixa]
+
+        if sonda:
+            motivo_decisao = 'sonda'
+        else:
+            motivo_decisao = 'complexidade' if modelo == modelos[faixa] else motivo_desvio
+        logger.debug(f"Roteador: complexidade {complexidade:.2f} -> {modelo} ({motivo_decisao})")
+        return self._registrar_decisao(modelo, motivo_decisao)
+
+    def registrar_resultado(self, modelo, sucesso, latencia_ms=None, headers=None, status_code=None):
+        """
+        Atualiza os sinais ao vivo do modelo após uma chamada
+
+        Args:
+            modelo: Modelo utilizado
+            sucesso: True se a chamada retornou resposta válida
+            latencia_ms: Latência observada da chamada
+            headers: Headers da resposta (lidos os de rate limit do Groq)
+            status_code: Status HTTP da resposta, se houver
+        """
+        with self._lock:
+            estado = self.estados.get(modelo)
+            if estado is None:
+                estado = self.estados[modelo] = EstadoModelo(modelo)
+
+            estado.requisicoes += 1
+            agora = time.monotonic()
+            era_sonda = estado.sonda_ate > agora
+            estado.sonda_ate = 0.0
+            # Sinal recém-medido: a próxima sonda só depois do intervalo
+            estado.proxima_sonda = agora + Config.ROTEADOR_SONDA_INTERVALO_SEGUNDOS
+
+            if sucesso:
+                self.ultimo_sucesso = agora
+                self.ultima_latencia_ms = latencia_ms
+                if latencia_ms is not None:
+                    self._latencias_janela.append((agora, latencia_ms))
+                estado.falhas_consecutivas = 0
+                estado.circuito_aberto_ate = 0.0
+                if latencia_ms is not None:
+                    estado.latencia_total_ms += latencia_ms
+                    estado.latencias_recentes.append(latencia_ms)
+                    estado.latencia_medida_em = agora
+                    # A sonda recomeça a média: o modelo foi evitado pela latência antiga
+                    if estado.latencia_ewma_ms is None or era_sonda:
+                        estado.latencia_ewma_ms = latencia_ms
+                    else:
+                        estado.latencia_ewma_ms = 0.8 * estado.latencia_ewma_ms + 0.2 * latencia_ms
+            else:
+                estado.falhas += 1
+                estado.falhas_consecutivas += 1
+                if estado.falhas_consecutivas >= Config.CIRCUITO_FALHAS_CONSECUTIVAS:
+                    estado.circuito_aberto_ate = agora + Config.CIRCUITO_ESPERA_SEGUNDOS
+                    logger.warning(f"⚠️ Circuito aberto para o modelo {modelo}")
+
+            if headers:
+                orcamento, validade = self._ler_orcamento(headers)
+                if orcamento is not None:
+                    estado.orcamento_restante = orcamento
+                    estado.orcamento_valido_ate = agora + validade
+
+            if status_code == 429:
+                espera = ler_duracao(headers.get('retry-after')) if headers else None
+                if espera is None:
+                    espera = Config.CIRCUITO_ESPERA_SEGUNDOS
+                estado.circuito_aberto_ate = agora + espera
+                estado.orcamento_restante = 0.0
+                estado.orcamento_valido_ate = agora + espera
+
+    def _ler_orcamento(self, headers):
+        """
+        Calcula a menor fração restante entre os limites de requisições e de tokens
+
+        Returns:
+            tuple: (fração ou None, segundos até o reset desse limite)
+        """
+        menor = None
+        for tipo in ('requests', 'tokens'):
+            try:
+                restante = float(headers.get(f'x-ratelimit-remaining-{tipo}'))
+                limite = float(headers.get(f'x-ratelimit-limit-{tipo}'))
+            except (TypeError, ValueError):
+                continue
+            if limite > 0 and (menor is None or restante / limite < menor[0]):
+                reset = ler_duracao(headers.get(f'x-ratelimit-reset-{tipo}'))
+                menor = (restante / limite, reset if reset is not None else Config.ROTEADOR_VALIDADE_SINAIS_SEGUNDOS)
+        return menor if menor else (None, None)
+
+    def _registrar_decisao(self, modelo, motivo):
+        with self._lock:
+            chave = f"{modelo}:{motivo}"
+            self.decisoes[chave] = self.decisoes.get(chave, 0) + 1
+        return modelo
+
+    def obter_sinais_groq(self):
+        """Retorna os sinais passivos de saúde do Groq, sem fazer requisições"""
+        agora = time.monotonic()
+        with self._lock:
+            circuitos = [estado.circuito(agora) for estado in self.estados.values()]
+            return {
+                "ultimo_sucesso_ha_segundos": round(agora - self.ultimo_sucesso, 1) if self.ultimo_sucesso else None,
+                "ultima_latencia_ms": round(self.ultima_latencia_ms, 1) if self.ultima_latencia_ms is not None else None,
+                "circuitos_abertos": circuitos.count('aberto'),
+                "todos_circuitos_abertos": bool(circuitos) and all(c == 'aberto' for c in circuitos)
+            }
+    
+    def latencia_recente_ms(self, janela_segundos, fracao=0.9):
+        """
+        Percentil da latência das respostas do Groq nos últimos janela_segundos
+
+        Args:
+            janela_segundos: Idade máxima das medições consideradas
+            fracao: Percentil (0.9 = p90)
+
+        Returns:
+            float: Latência em ms, ou 0 sem respostas na janela
+        """
+        agora = time.monotonic()
+        with self._lock:
+            while self._latencias_janela and agora - self._latencias_janela[0][0] > janela_segundos:
+                self._latencias_janela.popleft()
+            latencias = sorted(latencia for _, latencia in self._latencias_janela)
+        if not latencias:
+            return 0.0
+        return latencias[min(int(fracao * len(latencias)), len(latencias) - 1)]
+
+    def obter_estatisticas(self):
+        """Retorna contagens, latências e estado de cada modelo para ajuste dos limiares"""
+        agora = time.monotonic()
+        with self._lock:
+            return {
+                "limiares": self.limiares,
+                "modelos": {nome: estado.estatisticas(agora) for nome, estado in self.estados.items()},
+                "decisoes": dict(self.decisoes)
+            }
+
+# Instância global do roteador de modelos
+roteador = RoteadorModelos()
+
+def obter_estatisticas_roteador():
+    """Função para obter as estatísticas do roteador de modelos"""
+    return roteador.obter_estatisticas()
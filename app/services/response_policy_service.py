@@ -0,0 +1,196 @@
+import logging
+import re
+import threading
+from config import Config
+from app.services.intent_service import PADROES_INTENCOES, normalizar_mensagem
+
+logger = logging.getLogger(__name__)
+
+# Tipos de pedido, do mais curto ao mais longo
+TIPO_SAUDACAO = 'saudacao'
+TIPO_FATO = 'fato_simples'
+TIPO_PASSOS = 'passo_a_passo'
+
+# Pedidos de instrução ("como faço", "quais documentos", ...), na mensagem normalizada
+PADRAO_PASSOS = re.compile(
+    r"\b(?:"
+    r"como (?:(?:eu|que|se) )?(?:faco|fazer|faz|solicito|solicitar|consigo|posso|realizo|realizar|emito|emitir|"
+    r"peco|pedir|acesso|acessar|tranco|trancar|cancelo|cancelar|renovo|renovar|transfiro|transferir|envio|enviar|"
+    r"cadastro|cadastrar|altero|alterar|pago|pagar|funciona)"
+    r"|passo a passo|passos|etapas|procedimento|tutorial|instrucoes"
+    r"|o que (?:eu )?(?:preciso|devo|tenho que) fazer|quais (?:sao )?os (?:documentos|requisitos)"
+    r")\b"
+)
+
+# Mensagens só de cumprimento ou agradecimento que chegaram ao Groq
+PADRAO_SAUDACAO = re.compile(
+    "^(?:" + "|".join(PADROES_INTENCOES[nome] for nome in ('saudacao', 'agradecimento')) + ")$"
+)
+
+# Mensagens longas costumam trazer mais de uma pergunta
+PALAVRAS_PEDIDO_LONGO = 40
+
+# Folga para a apresentação ("Olá, sou Lídia...") na primeira interação
+FOLGA_APRESENTACAO_CARACTERES = 80
+FOLGA_APRESENTACAO_TOKENS = 24
+
+# O prompt pede respostas sem emojis; o que escapar é removido localmente
+PADRAO_EMOJI = re.compile("[\U0001F000-\U0001FAFF\u2600-\u27BF\uFE0F\u200D]")
+
+# Fim de frase (pontuação seguida de espaço ou fim do texto) ou de linha
+PADRAO_FIM_TRECHO = re.compile(r"[.!?](?=\s|$)|\n")
+
+class PoliticaResposta:
+    """Orçamento de geração de um tipo de pedido"""
+
+    def __init__(self, tipo, max_tokens, limite_caracteres, stop=None):
+        self.tipo = tipo
+        self.max_tokens = max_tokens
+        self.limite_caracteres = limite_caracteres
+        self.stop = list(stop or [])
+
+def classificar_pedido(mensagem):
+    """
+    Classifica o pedido do aluno pelo tamanho de resposta esperado
+
+    Args:
+        mensagem: Mensagem atual do aluno
+
+    Returns:
+        str: TIPO_SAUDACAO, TIPO_FATO ou TIPO_PASSOS
+    """
+    texto = normalizar_mensagem(mensagem)
+    if PADRAO_SAUDACAO.match(texto):
+        return TIPO_SAUDACAO
+    if PADRAO_PASSOS.search(texto) or len(texto.split()) > PALAVRAS_PEDIDO_LONGO:
+        return TIPO_PASSOS
+    return TIPO_FATO
+
+def limitar_texto(texto, limite):
+    """
+    Remove emojis e, acima do limite, corta no último fim de frase ou de linha
+
+    Só corta no meio de uma frase (com reticências) se não houver fim de
+    frase na segunda metade do limite.
+
+    Returns:
+        tuple: (texto final, True se o texto foi cortado)
+    """
+    texto = re.sub(r"[ \t]{2,}", ' ', PADRAO_EMOJI.sub('', texto)).strip()
+    if len(texto) <= limite:
+        return texto, False
+
+    trecho = texto[:limite]
+    fins = [fim.end() for fim in PADRAO_FIM_TRECHO.finditer(trecho)]
+    if fins and fins[-1] >= limite // 2:
+        return trecho[:fins[-1]].rstrip(), True
+    espaco = trecho.rfind(' ')
+    return trecho[:espaco if espaco > 0 else limite].rstrip(' ,;:') + '…', True
+
+class PoliticaRespostas:
+    """
+    Escolhe max_tokens e sequências de parada pelo tipo de pedido
+
+    O prompt pede respostas de ~300 caracteres (simples) ou ~600 (com
+    passos), mas um max_tokens fixo alto deixa o tempo de geração limitado
+    por um orçamento várias vezes maior que o usado. Cada tipo recebe um
+    orçamento com folga sobre o seu limite, que é aplicado localmente depois
+    da geração. Tokens solicitados x usados e respostas cortadas pelo modelo
+    (finish_reason 'length') ficam nas estatísticas para ajustar os valores.
+    """
+
+    def __init__(self):
+        # Sem sequências que apareçam em respostas legítimas: apenas o início de um novo turno
+        parada_turno = ["\nAluno:", "\nUsuário:"]
+        self.politicas = {
+            TIPO_SAUDACAO: PoliticaResposta(
+                TIPO_SAUDACAO, Config.RESPOSTA_MAX_TOKENS_SAUDACAO, Config.RESPOSTA_CARACTERES_SAUDACAO,
+                parada_turno + ["\n\n"]
+            ),
+            TIPO_FATO: PoliticaResposta(
+                TIPO_FATO, Config.RESPOSTA_MAX_TOKENS_FATO, Config.RESPOSTA_CARACTERES_FATO,
+                parada_turno + ["\n\n\n"]
+            ),
+            TIPO_PASSOS: PoliticaResposta(
+                TIPO_PASSOS, Config.RESPOSTA_MAX_TOKENS_PASSOS, Config.RESPOSTA_CARACTERES_PASSOS,
+                parada_turno
+            ),
+        }
+        self.contagem = {
+            tipo: {"requisicoes": 0, "max_tokens": 0, "completion_tokens": 0, "truncadas": 0, "cortadas_localmente": 0}
+            for tipo in self.politicas
+        }
+        self._lock = threading.Lock()
+
+    def escolher(self, mensagem, primeira_interacao=False, tenant=None):
+        """
+        Retorna a política para a mensagem
+
+        Args:
+            mensagem: Mensagem atual do aluno
+            primeira_interacao: True se a resposta inclui a apresentação
+            tenant: Tenant da conversa; o max_tokens dele é o teto
+
+        Returns:
+            PoliticaResposta: Orçamento da resposta (None com a política desativada)
+        """
+        if not Config.RESPOSTA_POLITICA_ATIVA:
+            return None
+        base = self.politicas[classificar_pedido(mensagem)]
+        max_tokens = base.max_tokens + (FOLGA_APRESENTACAO_TOKENS if primeira_interacao else 0)
+        if tenant and tenant.max_tokens:
+            max_tokens = min(max_tokens, tenant.max_tokens)
+        return PoliticaResposta(
+            base.tipo,
+            max_tokens,
+            base.limite_caracteres + (FOLGA_APRESENTACAO_CARACTERES if primeira_interacao else 0),
+            base.stop
+        )
+
+    def aplicar(self, resposta, politica, completion_tokens=0, truncada=False):
+        """
+        Aplica o limite de caracteres à resposta gerada e contabiliza o uso
+
+        Args:
+            resposta: Texto gerado pelo Groq
+            politica: Política usada na requisição
+            completion_tokens: Tokens gerados (usage.completion_tokens)
+            truncada: True se o modelo parou por max_tokens
+
+        Returns:
+            str: Resposta dentro do limite
+        """
+        limite = int(politica.limite_caracteres * Config.RESPOSTA_TOLERANCIA)
+        resposta_final, cortada = limitar_texto(resposta, limite)
+        with self._lock:
+            contagem = self.contagem[politica.tipo]
+            contagem["requisicoes"] += 1
+            contagem["max_tokens"] += politica.max_tokens
+            contagem["completion_tokens"] += completion_tokens
+            contagem["truncadas"] += int(truncada)
+            contagem["cortadas_localmente"] += int(cortada)
+        if truncada:
+            logger.warning(f"⚠️ Resposta '{politica.tipo}' atingiu max_tokens ({politica.max_tokens}); considere aumentar o orçamento")
+        if cortada:
+            logger.info(f"✂️ Resposta '{politica.tipo}' cortada de {len(resposta)} para {len(resposta_final)} caracteres")
+        return resposta_final
+
+    def obter_estatisticas(self):
+        """Retorna, por tipo, tokens solicitados x usados e respostas cortadas"""
+        with self._lock:
+            estatisticas = {}
+            for tipo, contagem in self.contagem.items():
+                estatisticas[tipo] = dict(
+                    contagem,
+                    max_tokens_configurado=self.politicas[tipo].max_tokens,
+                    uso_do_orcamento=round(contagem["completion_tokens"] / contagem["max_tokens"], 3)
+                    if contagem["max_tokens"] else None
+                )
+            return {"ativa": Config.RESPOSTA_POLITICA_ATIVA, "por_tipo": estatisticas}
+
+# Instância global da política de respostas
+politica_respostas = PoliticaRespostas()
+
+def obter_estatisticas_politica():
+    """Função para obter as estatísticas da política de respostas"""
+    return politica_respostas.obter_estatisticas()
@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from config import Config
+from db_manager import TENANT_PADRAO
+
+logger = logging.getLogger(__name__)
+
+# Faixas de prioridade (a menor é atendida primeiro)
+PRIORIDADE_ALTA = 0     # comandos administrativos e primeiro contato
+PRIORIDADE_NORMAL = 1   # mensagens de continuação da conversa
+PRIORIDADE_ADIADA = 2   # trabalho adiado pelo controle de admissão
+
+NOMES_FAIXAS = {PRIORIDADE_ALTA: 'alta', PRIORIDADE_NORMAL: 'normal', PRIORIDADE_ADIADA: 'adiada'}
+
+# Caracteres de texto que equivalem a uma unidade de custo no deficit round robin
+CARACTERES_POR_CUSTO = 2000
+
+def estimar_custo(texto):
+    """Estima o custo da tarefa pelo tamanho do texto (mensagens comuns custam 1)"""
+    return 1 + len(texto or '') // CARACTERES_POR_CUSTO
+
+def percentil(valores, p):
+    """Retorna o percentil p (0 a 100) de uma lista já ordenada ou None se vazia"""
+    if not valores:
+        return None
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+class Tarefa:
+    """Trabalho de uma conversa (tenant, número) aguardando na fila do agendador"""
+
+    __slots__ = ('chave', 'numero', 'funcao', 'args', 'custo', 'futuro', 'enfileirada_em')
+
+    def __init__(self, chave, numero, funcao, args, custo):
+        self.chave = chave  # (tenant_id, numero): o mesmo número em dois tenants são duas conversas
+        self.numero = numero
+        self.funcao = funcao
+        self.args = args
+        self.custo = custo
+        self.futuro = Future()
+        self.enfileirada_em = time.monotonic()
+
+class FaixaJusta:
+    """
+    Fila de uma faixa de prioridade com deficit round robin entre conversas
+
+    Cada conversa (tenant, número) tem sua própria fila; a cada visita ela
+    recebe um quantum de crédito e só executa a próxima tarefa se o crédito
+    cobrir o custo dela. Uma conversa com muitas mensagens (ou tarefas caras)
+    anda uma tarefa por rodada, como qualquer outra.
+    """
+
+    def __init__(self, quantum):
+        self.quantum = quantum
+        self.filas = {}        # (tenant_id, numero) -> deque de Tarefa
+        self.deficit = {}      # (tenant_id, numero) -> crédito acumulado
+        self.ativos = deque()  # ordem de visita do round robin
+        self.pendentes = 0
+
+    def adicionar(self, tarefa):
+        fila = self.filas.get(tarefa.chave)
+        if fila is None:
+            fila = self.filas[tarefa.chave] = deque()
+            self.deficit[tarefa.chave] = 0
+            self.ativos.append(tarefa.chave)
+        fila.append(tarefa)
+        self.pendentes += 1
+
+    def retirar(self, ocupados):
+        """
+        Retira a próxima tarefa na ordem justa
+
+        Args:
+            ocupados: Conversas com tarefa em execução (puladas para manter a ordem da conversa)
+
+        Returns:
+            Tarefa: Próxima tarefa ou None se só houver conversas ocupadas
+        """
+        while any(chave not in ocupados for chave in self.ativos):
+            for _ in range(len(self.ativos)):
+                chave = self.ativos[0]
+                if chave in ocupados:
+                    self.ativos.rotate(-1)
+                    continue
+
+                fila = self.filas[chave]
+                if self.deficit[chave] < fila[0].custo:
+                    self.deficit[chave] += self.quantum
+                    if self.deficit[chave] < fila[0].custo:
+                        self.ativos.rotate(-1)
+                        continue
+
+                tarefa = fila.popleft()
+                self.deficit[chave] -= tarefa.custo
+                self.pendentes -= 1
+                if fila:
+                    self.ativos.rotate(-1)
+                else:
+                    # Conversa sem mais trabalho sai da rodada e perde o crédito restante
+                    self.ativos.popleft()
+                    del self.filas[chave]
+                    del self.deficit[chave]
+                return tarefa
+        return None
+
+class AgendadorJusto:
+    """
+    Agendador das tarefas do webhook com faixas de prioridade
+
+    As faixas são atendidas em prioridade estrita, exceto pela parcela
+    mínima da faixa adiada: depois de AGENDADOR_PARCELA_ADIADA tarefas das
+    faixas acima com adiadas esperando, a próxima é uma adiada, então sob
+    carga normal constante uma mensagem adiada ainda é respondida. Dentro
+    de cada faixa as conversas (tenant, número) se revezam por deficit round
+    robin. Cada conversa tem no máximo uma tarefa em execução (as respostas
+    saem na ordem da conversa) e no máximo AGENDADOR_MAX_POR_NUMERO tarefas
+    na fila, então um aluno enviando dezenas de mensagens não aumenta a
+    espera dos demais, e o mesmo número em dois tenants não divide a fila.
+    """
+
+    def __init__(self, workers=None, max_por_numero=None, quantum=None, parcela_adiada=None):
+        self.num_workers = workers or Config.AGENDADOR_WORKERS
+        self.max_por_numero = max_por_numero or Config.AGENDADOR_MAX_POR_NUMERO
+        self.parcela_adiada = parcela_adiada if parcela_adiada is not None else Config.AGENDADOR_PARCELA_ADIADA
+        self.passadas_a_frente = 0  # tarefas de faixas acima executadas com adiadas esperando
+        self.faixas = {
+            prioridade: FaixaJusta(quantum or Config.AGENDADOR_QUANTUM)
+            for prioridade in sorted(NOMES_FAIXAS)
+        }
+        self.pendentes_por_conversa = {}  # (tenant_id, numero) -> tarefas na fila
+        self.ocupados = set()
+        self.executadas = {prioridade: 0 for prioridade in NOMES_FAIXAS}
+        self.rejeitadas = 0
+        self.esperas_ms = {prioridade: deque(maxlen=1000) for prioridade in NOMES_FAIXAS}
+        self._condicao = threading.Condition()
+        self._workers = []
+
+    def submeter(self, numero, funcao, *args, prioridade=PRIORIDADE_NORMAL, custo=1, tenant_id=TENANT_PADRAO):
+        """
+        Enfileira uma tarefa para a conversa do número no tenant
+
+        Args:
+            numero: Número do telefone
+            funcao: Função executada pelo worker com *args
+            prioridade: PRIORIDADE_ALTA, PRIORIDADE_NORMAL ou PRIORIDADE_ADIADA
+            custo: Peso da tarefa no deficit round robin
+            tenant_id: Tenant da conversa; (tenant_id, numero) é a chave de justiça entre alunos
+
+        Returns:
+            Future: Resultado da função ou None se a fila da conversa estiver cheia
+        """
+        chave = (tenant_id, numero)
+        tarefa = Tarefa(chave, numero, funcao, args, max(1, custo))
+        with self._condicao:
+            if self.pendentes_por_conversa.get(chave, 0) >= self.max_por_numero:
+                self.rejeitadas += 1
+                logger.warning(f"⚠️ Fila do número {numero} cheia (tenant {tenant_id}), tarefa rejeitada")
+                return None
+            self.pendentes_por_conversa[chave] = self.pendentes_por_conversa.get(chave, 0) + 1
+            self.faixas[prioridade].adicionar(tarefa)
+            self._condicao.notify()
+        return tarefa.futuro
+
+    def _proxima(self):
+        adiada = self.faixas[PRIORIDADE_ADIADA]
+        if self.parcela_adiada and adiada.pendentes and self.passadas_a_frente >= self.parcela_adiada:
+            tarefa = adiada.retirar(self.ocupados)
+            if tarefa:
+                self.passadas_a_frente = 0
+                return PRIORIDADE_ADIADA, tarefa
+        
+        for prioridade, faixa in self.faixas.items():
+            if faixa.pendentes:
+                tarefa = faixa.retirar(self.ocupados)
+                if tarefa:
+                    if prioridade == PRIORIDADE_ADIADA:
+                        self.passadas_a_frente = 0
+                    elif adiada.pendentes:
+                        self.passadas_a_frente += 1
+                    return prioridade, tarefa
+        return None, None
+
+    def iniciar(self):
+        """Inicia os workers (chamadas repetidas não criam workers extras)"""
+        with self._condicao:
+            while len(self._workers) < self.num_workers:
+                worker = threading.Thread(target=self._executar, name=f'agendador-{len(self._workers)}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                prioridade, tarefa = self._proxima()
+                while tarefa is None:
+                    self._condicao.wait()
+                    prioridade, tarefa = self._proxima()
+
+                self.ocupados.add(tarefa.chave)
+                restantes = self.pendentes_por_conversa[tarefa.chave] - 1
+                if restantes:
+                    self.pendentes_por_conversa[tarefa.chave] = restantes
+                else:
+                    del self.pendentes_por_conversa[tarefa.chave]
+                self.esperas_ms[prioridade].append((time.monotonic() - tarefa.enfileirada_em) * 1000)
+
+            try:
+                if tarefa.futuro.set_running_or_notify_cancel():
+                    tarefa.futuro.set_result(tarefa.funcao(*tarefa.args))
+            except Exception as e:
+                logger.error(f"❌ Erro na tarefa agendada de {tarefa.numero}: {str(e)}")
+                tarefa.futuro.set_exception(e)
+            finally:
+                with self._condicao:
+                    self.ocupados.discard(tarefa.chave)
+                    self.executadas[prioridade] += 1
+                    # A conversa liberada pode destravar tarefas que estavam esperando
+                    self._condicao.notify_all()
+
+    def pendentes(self, prioridade=None):
+        """Retorna a quantidade de tarefas na fila (de uma faixa ou de todas)"""
+        with self._condicao:
+            if prioridade is not None:
+                return self.faixas[prioridade].pendentes
+            return sum(faixa.pendentes for faixa in self.faixas.values())
+
+    def obter_estatisticas(self):
+        """Retorna filas, execuções e espera (p50/p95/p99) por faixa"""
+        with self._condicao:
+            faixas = {}
+            for prioridade, nome in NOMES_FAIXAS.items():
+                esperas = sorted(self.esperas_ms[prioridade])
+                faixas[nome] = {
+                    "na_fila": self.faixas[prioridade].pendentes,
+                    "conversas_na_fila": len(self.faixas[prioridade].filas),
+                    "executadas": self.executadas[prioridade],
+                    "espera_p50_ms": round(percentil(esperas, 50), 1) if esperas else None,
+                    "espera_p95_ms": round(percentil(esperas, 95), 1) if esperas else None,
+                    "espera_p99_ms": round(percentil(esperas, 99), 1) if esperas else None
+                }
+            return {
+                "workers": len(self._workers),
+                "em_execucao": len(self.ocupados),
+                "rejeitadas": self.rejeitadas,
+                "faixas": faixas
+            }
+
+# Instância global do agendador
+agendador = AgendadorJusto()
+
+def obter_estatisticas_agendador():
+    """Função para obter as estatísticas do agendador"""
+    return agendador.obter_estatisticas()
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import threading
+import time
+from config import Config
+from db_manager import db, TENANT_PADRAO
+
+logger = logging.getLogger(__name__)
+
+MENSAGEM_INDISPONIVEL_PADRAO = "Serviços indisponíveis no momento, entre em contato com esse número: (62) 993977594"
+MENSAGEM_LIMITE_PADRAO = "Recebemos muitas mensagens neste canal agora. Por favor, envie sua dúvida novamente em alguns minutos."
+
+class Tenant:
+    """
+    Configuração de um campus/curso atendido por um número do WhatsApp Business
+
+    Cada tenant tem contexto, prompt, administradores, modelos, orçamento de
+    requisições ao Groq e partição de cache próprios.
+    """
+
+    def __init__(self, tenant_id, nome=None, phone_number_ids=None, admins=None, prompt=None,
+                 modelos=None, temperatura=0.7, max_tokens=800, requisicoes_por_minuto=0,
+                 mensagem_indisponivel=None, mensagem_limite=None, cache_conversas_max=None,
+                 cache_conversas_max_bytes=None):
+        self.id = tenant_id
+        self.nome = nome or tenant_id
+        self.phone_number_ids = [str(phone_number_id) for phone_number_id in (phone_number_ids or [])]
+        self.admins = set(admins or [])
+        self.prompt = prompt  # None usa o prompt padrão do groq_service
+        self.modelos = list(modelos) if modelos else None  # None usa os modelos do roteador
+        self.temperatura = temperatura
+        self.max_tokens = max_tokens
+        self.requisicoes_por_minuto = requisicoes_por_minuto  # 0 = sem limite
+        self.mensagem_indisponivel = mensagem_indisponivel or MENSAGEM_INDISPONIVEL_PADRAO
+        self.mensagem_limite = mensagem_limite or MENSAGEM_LIMITE_PADRAO
+        self.cache_conversas_max = cache_conversas_max
+        self.cache_conversas_max_bytes = cache_conversas_max_bytes
+        self._fichas = float(requisicoes_por_minuto)
+        self._reabastecido_em = time.monotonic()
+        self._lock = threading.Lock()
+        self.requisicoes_acima_orcamento = 0
+        self.requisicoes_retidas = 0
+
+    def eh_admin(self, numero):
+        return numero in self.admins
+
+    def reservar_orcamento(self, espera_maxima=0):
+        """
+        Reserva uma requisição do orçamento do tenant (balde de fichas por minuto)
+
+        Sem ficha disponível, reserva a próxima que o balde vai gerar se ela
+        sair em até espera_maxima segundos (o saldo fica negativo até lá), então
+        o tenant nunca passa de requisicoes_por_minuto.
+
+        Args:
+            espera_maxima: Segundos que a mensagem pode esperar pela ficha
+
+        Returns:
+            float: Segundos até a ficha reservada (0 = agora) ou None se estiver acima do orçamento
+        """
+        if not self.requisicoes_por_minuto:
+            return 0.0
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(
+                self.requisicoes_por_minuto,
+                self._fichas + (agora - self._reabastecido_em) * self.requisicoes_por_minuto / 60
+            )
+            self._reabastecido_em = agora
+            espera = max(0.0, (1 - self._fichas) * 60 / self.requisicoes_por_minuto)
+            if espera > espera_maxima:
+                self.requisicoes_acima_orcamento += 1
+                return None
+            self._fichas -= 1
+            if espera > 0:
+                self.requisicoes_retidas += 1
+            return espera
+
+    def obter_estatisticas(self):
+        with self._lock:
+            return {
+                "nome": self.nome,
+                "phone_number_ids": self.phone_number_ids,
+                "modelos": self.modelos,
+                "requisicoes_por_minuto": self.requisicoes_por_minuto,
+                "orcamento_restante": round(self._fichas, 1) if self.requisicoes_por_minuto else None,
+                "requisicoes_acima_orcamento": self.requisicoes_acima_orcamento,
+                "requisicoes_retidas": self.requisicoes_retidas
+            }
+
+class RegistroTenants:
+    """
+    Registro em memória dos tenants, carregado do arquivo TENANTS_ARQUIVO
+
+    A resolução pelo phone_number_id é uma consulta a um dicionário, sem
+    acesso ao banco. Números desconhecidos (ou sem arquivo de tenants) caem
+    no tenant padrão, que mantém o comportamento de instância única.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or Config.TENANTS_ARQUIVO
+        self.tenants = {}
+        self.por_phone_number_id = {}
+        self._carregado = False
+        self._lock = threading.Lock()
+
+    def carregar(self):
+        """
+        Lê o arquivo de tenants, carrega os prompts e configura as partições de cache
+
+        Formato: {"tenants": [{"id": "...", "phone_number_ids": [...], "admins": [...],
+        "prompt_arquivo": "...", "modelos": [...], "requisicoes_por_minuto": 60, ...}]}
+        Um tenant com id "padrao" sobrescreve a configuração do tenant padrão.
+        """
+        tenants = self.ler_tenants()
+
+        por_phone_number_id = {}
+        for tenant in tenants.values():
+            for phone_number_id in tenant.phone_number_ids:
+                por_phone_number_id[phone_number_id] = tenant
+            db.configurar_cache_tenant(tenant.id, tenant.cache_conversas_max, tenant.cache_conversas_max_bytes)
+
+        # Troca as referências de uma vez; leitores nunca veem um registro parcial
+        self.tenants, self.por_phone_number_id = tenants, por_phone_number_id
+        self._carregado = True
+        logger.info(f"🏫 {len(tenants)} tenant(s) carregado(s)")
+
+    def ler_tenants(self):
+        """
+        Lê o arquivo de tenants e carrega os prompts, sem acessar o banco
+
+        Returns:
+            dict: id -> Tenant, sempre com o tenant padrão
+        """
+        definicoes = []
+        if os.path.exists(self.caminho):
+            try:
+                with open(self.caminho, encoding='utf-8') as arquivo:
+                    definicoes = json.load(arquivo).get('tenants', [])
+            except Exception as e:
+                logger.error(f"❌ Erro ao ler o arquivo de tenants {self.caminho}: {str(e)}")
+
+        tenants = {TENANT_PADRAO: Tenant(TENANT_PADRAO, admins=Config.ADMIN_NUMEROS)}
+        for definicao in definicoes:
+            try:
+                tenant = self._criar_tenant(definicao)
+                tenants[tenant.id] = tenant
+            except Exception as e:
+                logger.error(f"❌ Tenant inválido em {self.caminho}: {str(e)}")
+        return tenants
+
+    def _criar_tenant(self, definicao):
+        prompt = definicao.get('prompt')
+        if definicao.get('prompt_arquivo'):
+            with open(definicao['prompt_arquivo'], encoding='utf-8') as arquivo:
+                prompt = arquivo.read()
+        return Tenant(
+            definicao['id'],
+            nome=definicao.get('nome'),
+            phone_number_ids=definicao.get('phone_number_ids'),
+            admins=definicao.get('admins', Config.ADMIN_NUMEROS if definicao['id'] == TENANT_PADRAO else []),
+            prompt=prompt,
+            modelos=definicao.get('modelos'),
+            temperatura=definicao.get('temperatura', 0.7),
+            max_tokens=definicao.get('max_tokens', 800),
+            requisicoes_por_minuto=definicao.get('requisicoes_por_minuto', 0),
+            mensagem_indisponivel=definicao.get('mensagem_indisponivel'),
+            mensagem_limite=definicao.get('mensagem_limite'),
+            cache_conversas_max=definicao.get('cache_conversas_max'),
+            cache_conversas_max_bytes=definicao.get('cache_conversas_max_bytes')
+        )
+
+    def _garantir_carregado(self):
+        if not self._carregado:
+            with self._lock:
+                if not self._carregado:
+                    self.carregar()
+
+    def resolver(self, phone_number_id):
+        """
+        Retorna o tenant do número do WhatsApp Business que recebeu a mensagem
+
+        Args:
+            phone_number_id: metadata.phone_number_id do webhook (pode ser None)
+
+        Returns:
+            Tenant: Tenant configurado ou o tenant padrão
+        """
+        self._garantir_carregado()
+        tenant = self.por_phone_number_id.get(str(phone_number_id)) if phone_number_id else None
+        return tenant or self.tenants[TENANT_PADRAO]
+
+    def obter(self, tenant_id):
+        """Retorna o tenant pelo id ou None"""
+        self._garantir_carregado()
+        return self.tenants.get(tenant_id)
+
+    def obter_estatisticas(self):
+        self._garantir_carregado()
+        return {tenant_id: tenant.obter_estatisticas() for tenant_id, tenant in self.tenants.items()}
+
+# Instância global do registro de tenants
+registro_tenants = RegistroTenants()
+
+def resolver_tenant(phone_number_id):
+    """Função para resolver o tenant pelo phone_number_id do webhook"""
+    return registro_tenants.resolver(phone_number_id)
@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+from config import Config
+from db_manager import db
+from app.services.tenant_service import registro_tenants
+from app.services.knowledge_service import obter_base
+from app.services.groq_service import aquecer_sessao, renderizar_prompt_sistema
+
+logger = logging.getLogger(__name__)
+
+class Aquecimento:
+    """
+    Fase de aquecimento executada antes de a instância ficar pronta
+
+    Importar a aplicação não faz I/O; aqui o banco é inicializado, as
+    conexões do pool são abertas, os tenants e suas bases de conhecimento
+    são carregados (índice de busca montado), os prompts são renderizados e
+    a sessão HTTP com o Groq é aberta. Assim a primeira mensagem após um
+    deploy não paga por nada disso. /readyz só fica pronto ao final.
+    """
+
+    def __init__(self):
+        self.iniciado = False
+        self.concluido = False
+        self.etapas_ms = {}
+        self.erros = {}
+        self.duracao_ms = None
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _carregar_bases(self):
+        for tenant_id in registro_tenants.tenants:
+            obter_base(tenant_id).garantir_carregada()
+
+    def _renderizar_prompts(self):
+        for tenant_id, tenant in registro_tenants.tenants.items():
+            documentacao, _ = obter_base(tenant_id).obter_documentacao('')
+            renderizar_prompt_sistema(documentacao, tenant)
+
+    def executar(self):
+        """
+        Executa todas as etapas; a falha de uma etapa é registrada e não impede as demais
+
+        Returns:
+            dict: Estado do aquecimento
+        """
+        with self._lock:
+            if self.iniciado:
+                return self.obter_estado()
+            self.iniciado = True
+
+        inicio = time.perf_counter()
+        etapas = [
+            ('banco', db.inicializar),
+            ('conexoes', lambda: db.pool.abrir(Config.DB_POOL_AQUECIDAS)),
+            ('tenants', registro_tenants.carregar),
+            ('base_conhecimento', self._carregar_bases),
+            ('prompts', self._renderizar_prompts),
+            ('sessao_groq', aquecer_sessao),
+        ]
+        for nome, etapa in etapas:
+            inicio_etapa = time.perf_counter()
+            try:
+                etapa()
+            except Exception as e:
+                logger.error(f"❌ Erro no aquecimento ({nome}): {str(e)}")
+                self.erros[nome] = str(e)
+            self.etapas_ms[nome] = round((time.perf_counter() - inicio_etapa) * 1000, 2)
+
+        self.duracao_ms = round((time.perf_counter() - inicio) * 1000, 2)
+        self.concluido = True
+        logger.info(f"🔥 Aquecimento concluído em {self.duracao_ms} ms: {self.etapas_ms}")
+        return self.obter_estado()
+
+    def iniciar_em_segundo_plano(self):
+        """
+        Executa o aquecimento em uma thread, para /healthz responder desde o início
+
+        Chamadas repetidas no mesmo processo não repetem o aquecimento. Se a
+        chamada vier de um processo criado por fork depois do início, a thread
+        não existe nele: o estado é zerado e o aquecimento roda de novo.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._thread
+            if self._pid is not None:
+                self.iniciado = self.concluido = False
+                self.etapas_ms, self.erros, self.duracao_ms = {}, {}, None
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.executar, name='aquecimento', daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def obter_estado(self):
+        return {
+            "iniciado": self.iniciado,
+            "concluido": self.concluido,
+            "duracao_ms": self.duracao_ms,
+            "etapas_ms": dict(self.etapas_ms),
+            "erros": dict(self.erros)
+        }
+
+# Instância global do aquecimento
+aquecimento = Aquecimento()
+
+def iniciar_aquecimento():
+    """Função para iniciar o aquecimento em segundo plano"""
+    return aquecimento.iniciar_em_segundo_plano()
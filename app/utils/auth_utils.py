@@ -0,0 +1,53 @@
+import hmac
+import logging
+from functools import wraps
+from flask import request, jsonify
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def verificar_token_admin(recurso):
+    """
+    Confere o token administrativo (header X-Admin-Token) da requisição atual
+
+    Sem ADMIN_TOKEN configurado os endpoints protegidos ficam desativados.
+
+    Args:
+        recurso: Nome do recurso para logs e mensagens (ex.: 'ao histórico')
+
+    Returns:
+        tuple: (resposta, status) de erro ou None se o token for válido
+    """
+    if not Config.ADMIN_TOKEN:
+        logger.warning(f"⚠️ Acesso {recurso} recusado: ADMIN_TOKEN não configurado")
+        return jsonify({
+            "status": "error",
+            "message": f"Acesso {recurso} desativado: configure ADMIN_TOKEN"
+        }), 403
+
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), Config.ADMIN_TOKEN.encode('utf-8')):
+        logger.warning(f"⚠️ Acesso {recurso} sem token válido ({request.remote_addr})")
+        return jsonify({
+            "status": "error",
+            "message": "Token administrativo ausente ou inválido"
+        }), 401
+
+    return None
+
+def exigir_token_admin(recurso):
+    """
+    Decorator que exige o token administrativo em uma rota
+
+    Args:
+        recurso: Nome do recurso para logs e mensagens (ex.: 'à base de conhecimento')
+    """
+    def decorador(funcao):
+        @wraps(funcao)
+        def rota(*args, **kwargs):
+            erro = verificar_token_admin(recurso)
+            if erro:
+                return erro
+            return funcao(*args, **kwargs)
+        return rota
+    return decorador
@@ -1,5 +1,6 @@
 import logging
-from typing import Dict, Optional, Any, List
+from datetime import datetime
+from typing import Dict, Optional, Any, List, Union
 
 logger = logging.getLogger(__name__)
 
@@ -11,7 +12,7 @@ def extrair_dados_whatsapp(data: List[Dict[str, Any]]) -> Optional[Dict[str, str
         data: Dados JSON do webhook (formato lista padrão do WhatsApp)
         
     Returns:
-        dict: Dicionário com numero, mensagem e timestamp ou None se não conseguir extrair
+        dict: Dicionário com numero, mensagem, timestamp e phone_number_id ou None se não conseguir extrair
     """
     try:
         # Verifica se data é uma lista válida
@@ -42,7 +43,9 @@ def extrair_dados_whatsapp(data: List[Dict[str, Any]]) -> Optional[Dict[str, str
         return {
             'numero': numero,
             'mensagem': mensagem,
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            # Número do WhatsApp Business que recebeu a mensagem (resolve o tenant)
+            'phone_number_id': webhook_data.get('metadata', {}).get('phone_number_id')
         }
         
     except Exception as e:
@@ -95,10 +98,24 @@ def formatar_historico_mensagens(mensagens: list) -> str:
     historico_formatado = ""
     for msg in mensagens:
         mensagem, user, horario = msg
-        historico_formatado += f"- {user}: {mensagem} (às {horario})\n"
+        historico_formatado += f"- {user}: {mensagem} (às {formatar_horario(horario)})\n"
     
     return historico_formatado
 
+def formatar_horario(horario: Union[int, str]) -> str:
+    """
+    Formata o horário do histórico para exibição
+    
+    Args:
+        horario: Epoch em milissegundos (ou texto no formato antigo)
+        
+    Returns:
+        str: Horário no formato dd/mm/aaaa hh:mm
+    """
+    if isinstance(horario, int):
+        return datetime.fromtimestamp(horario / 1000).strftime('%d/%m/%Y %H:%M')
+    return str(horario)
+
 def validar_numero_whatsapp(numero: str) -> bool:
     """
     Valida se o número está no formato correto do WhatsApp
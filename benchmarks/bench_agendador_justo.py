@@ -0,0 +1,105 @@
+"""
+Simulação de latência de cauda: fila FIFO x agendador justo
+
+Um aluno "pesado" envia uma rajada de mensagens enquanto alunos comuns
+conversam normalmente. Cada tarefa simula uma chamada ao Groq com um
+sleep. Mede a latência (fila + execução) das mensagens dos alunos comuns
+com uma fila FIFO compartilhada e com o AgendadorJusto.
+
+Uso:
+    python benchmarks/bench_agendador_justo.py [--workers 4] [--rajada 200] [--alunos 30]
+"""
+import argparse
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.scheduler_service import AgendadorJusto, percentil
+
+class FilaFIFO:
+    """Pool com uma fila única, como um ThreadPoolExecutor compartilhado"""
+
+    def __init__(self, workers):
+        self.fila = queue.Queue()
+        for _ in range(workers):
+            threading.Thread(target=self._executar, daemon=True).start()
+
+    def submeter(self, numero, funcao, *args, **kwargs):
+        futuro = Future()
+        self.fila.put((futuro, funcao, args))
+        return futuro
+
+    def _executar(self):
+        while True:
+            futuro, funcao, args = self.fila.get()
+            futuro.set_running_or_notify_cancel()
+            futuro.set_result(funcao(*args))
+
+def simular(pool, servico_ms, rajada, alunos, mensagens_por_aluno, intervalo_ms):
+    def chamada_groq():
+        time.sleep(servico_ms / 1000)
+
+    latencias = []
+    lock = threading.Lock()
+
+    def aluno(indice):
+        numero = f"55629{indice:08d}"
+        time.sleep(random.uniform(0, intervalo_ms / 1000))
+        for _ in range(mensagens_por_aluno):
+            inicio = time.perf_counter()
+            futuro = pool.submeter(numero, chamada_groq)
+            if futuro is not None:
+                futuro.result()
+                with lock:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+            time.sleep(intervalo_ms / 1000)
+
+    # O aluno pesado despeja a rajada inteira de uma vez
+    rejeitadas = sum(1 for _ in range(rajada) if pool.submeter("5562999999999", chamada_groq) is None)
+
+    threads = [threading.Thread(target=aluno, args=(i,)) for i in range(alunos)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencias), rejeitadas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--servico-ms', type=float, default=20, help='duração simulada de cada chamada ao Groq')
+    parser.add_argument('--rajada', type=int, default=200, help='mensagens enviadas de uma vez pelo aluno pesado')
+    parser.add_argument('--alunos', type=int, default=30, help='alunos comuns')
+    parser.add_argument('--mensagens', type=int, default=5, help='mensagens por aluno comum')
+    parser.add_argument('--intervalo-ms', type=float, default=200, help='intervalo entre mensagens de um aluno comum')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    random.seed(42)
+    cenarios = (
+        ('fifo', lambda: FilaFIFO(args.workers)),
+        ('justo', lambda: AgendadorJusto(workers=args.workers, max_por_numero=args.rajada)),
+        ('justo+limite', lambda: AgendadorJusto(workers=args.workers, max_por_numero=5)),
+    )
+    for nome, criar in cenarios:
+        pool = criar()
+        if isinstance(pool, AgendadorJusto):
+            pool.iniciar()
+        latencias, rejeitadas = simular(
+            pool, args.servico_ms, args.rajada, args.alunos, args.mensagens, args.intervalo_ms
+        )
+        print(
+            f"{nome:>13}: alunos comuns p50 {percentil(latencias, 50):7.1f} ms | "
+            f"p95 {percentil(latencias, 95):7.1f} ms | p99 {percentil(latencias, 99):7.1f} ms | "
+            f"máx {latencias[-1]:7.1f} ms | rajada rejeitada {rejeitadas}/{args.rajada}"
+        )
+
+if __name__ == '__main__':
+    main()
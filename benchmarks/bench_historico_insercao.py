@@ -0,0 +1,58 @@
+"""
+Benchmark de inserção sustentada no histórico
+
+Compara a gravação direta (uma transação por mensagem) com a gravação em
+lote (write-behind) usando várias threads, como o webhook sob carga.
+
+Uso:
+    python benchmarks/bench_historico_insercao.py [--threads 8] [--mensagens 500]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import Database
+
+def executar(write_behind, threads, mensagens):
+    with tempfile.TemporaryDirectory() as diretorio:
+        database = Database(os.path.join(diretorio, 'bench.db'), write_behind=write_behind)
+
+        def trabalhador(indice):
+            numero = f"55629{indice:08d}"
+            for i in range(mensagens):
+                database.inserir_historico(numero, f"mensagem {i}", user='aluno')
+
+        inicio = time.perf_counter()
+        workers = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # O tempo inclui o flush final: só conta o que está durável no disco
+        database.parar_gravacao_historico()
+        duracao = time.perf_counter() - inicio
+
+        with database.get_connection() as conn:
+            gravadas = conn.execute('SELECT COUNT(*) FROM historico').fetchone()[0]
+        return gravadas, duracao
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--mensagens', type=int, default=500, help='mensagens por thread')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    total = args.threads * args.mensagens
+    for nome, write_behind in (('direto', False), ('write-behind', True)):
+        gravadas, duracao = executar(write_behind, args.threads, args.mensagens)
+        print(f"{nome:>12}: {gravadas}/{total} linhas em {duracao:.2f}s ({gravadas / duracao:,.0f} linhas/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Escala de gravação do histórico com a quantidade de shards
+
+Várias threads, como o webhook sob carga, inserem mensagens de muitos
+números (uma transação por mensagem). O lock de escrita do SQLite é por
+arquivo, então com N shards até N transações gravam ao mesmo tempo.
+
+Uso:
+    python benchmarks/bench_historico_shards.py [--shards 1,2,4,8] [--threads 16] [--mensagens 300]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import Database
+
+def executar(shards, threads, mensagens, write_behind):
+    with tempfile.TemporaryDirectory() as diretorio:
+        database = Database(os.path.join(diretorio, 'bench.db'), write_behind=write_behind, shards=shards)
+        database.inicializar()
+
+        def trabalhador(indice):
+            for i in range(mensagens):
+                # Cada thread atende vários alunos, espalhados entre os shards
+                numero = f"55629{indice:04d}{i % 50:04d}"
+                database.inserir_historico(numero, f"mensagem {i}", user='aluno')
+
+        inicio = time.perf_counter()
+        workers = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # O tempo inclui o flush final: só conta o que está durável no disco
+        database.parar_gravacao_historico()
+        duracao = time.perf_counter() - inicio
+
+        gravadas = sum(1 for _ in database.iterar_historico())
+        database.fechar()
+        return gravadas, duracao
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', default='1,2,4,8', help='quantidades de shards a comparar')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--mensagens', type=int, default=300, help='mensagens por thread')
+    parser.add_argument('--write-behind', action='store_true', help='grava em lote (um writer por shard)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    total = args.threads * args.mensagens
+    base = None
+    for shards in (int(valor) for valor in args.shards.split(',')):
+        gravadas, duracao = executar(shards, args.threads, args.mensagens, args.write_behind)
+        vazao = gravadas / duracao
+        base = base or vazao
+        print(f"{shards:>3} shard(s): {gravadas}/{total} linhas em {duracao:.2f}s ({vazao:,.0f} linhas/s, {vazao / base:.2f}x)")
+
+if __name__ == '__main__':
+    main()
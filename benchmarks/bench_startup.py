@@ -0,0 +1,157 @@
+"""
+Tempo de inicialização e latência da primeira mensagem: frio x aquecido
+
+Cada medição roda em um processo novo, com um banco temporário já com a
+base de conhecimento publicada. Mede o tempo de importar a aplicação
+(que não deve abrir o banco), de create_app, de cada etapa do aquecimento
+e a latência do primeiro webhook com e sem aquecimento. O Groq é simulado
+na sessão HTTP: a primeira requisição da sessão paga o custo de conexão
+(--conexao-ms) e as seguintes só o tempo de resposta (--resposta-ms).
+
+Uso:
+    python benchmarks/bench_startup.py [--secoes 400] [--conexao-ms 150] [--resposta-ms 20] [--repeticoes 3]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+def preparar_banco(caminho, secoes):
+    """Cria o banco com a base de conhecimento publicada (em um processo separado)"""
+    codigo = (
+        "from db_manager import db\n"
+        "from app.services.knowledge_service import obter_base\n"
+        f"texto = '\\n'.join(f'## Seção {{i}}\\n' + f'Informação sobre o curso {{i}}, horários e matrícula. ' * 30 for i in range({secoes}))\n"
+        "obter_base().ingerir_texto(texto)\n"
+        "db.pool.fechar()\n"
+    )
+    subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, check=True, env=ambiente(caminho))
+
+def ambiente(caminho):
+    # O aquecimento é disparado pelo próprio benchmark, só no cenário aquecido
+    env = dict(os.environ, DATABASE_PATH=caminho, GROQ_API_KEY='bench', LOG_LEVEL='ERROR', PYTHONPATH=RAIZ,
+               AQUECIMENTO_AUTOMATICO='False')
+    env.pop('TENANTS_ARQUIVO', None)
+    return env
+
+def medir_filho(aquecer, conexao_ms, resposta_ms):
+    """Executado no processo filho; imprime as medições em JSON"""
+    import logging
+    logging.disable(logging.WARNING)
+
+    inicio = time.perf_counter()
+    from app import create_app
+    from db_manager import db
+    importacao_ms = (time.perf_counter() - inicio) * 1000
+    banco_aberto_na_importacao = db._inicializado
+
+    from app.services import groq_service
+
+    class RespostaSimulada:
+        status_code = 200
+        headers = {}
+        text = ''
+
+        def json(self):
+            return {"choices": [{"message": {"content": "Resposta simulada."}}],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}}
+
+    conectada = []
+
+    def requisicao_simulada(*args, **kwargs):
+        if not conectada:
+            time.sleep(conexao_ms / 1000)
+            conectada.append(True)
+        time.sleep(resposta_ms / 1000)
+        return RespostaSimulada()
+
+    groq_service.sessao.post = requisicao_simulada
+    groq_service.sessao.get = requisicao_simulada
+
+    inicio = time.perf_counter()
+    app = create_app()
+    create_app_ms = (time.perf_counter() - inicio) * 1000
+
+    aquecimento = None
+    if aquecer:
+        from app.services.warmup_service import aquecimento as servico_aquecimento
+        aquecimento = servico_aquecimento.executar()
+
+    payload = [{
+        "metadata": {"phone_number_id": "bench"},
+        "messages": [{"from": "5562900000001", "type": "text", "timestamp": str(int(time.time())),
+                      "text": {"body": "Quais são os horários da matrícula do curso 42?"}}]
+    }]
+    cliente = app.test_client()
+    inicio = time.perf_counter()
+    resposta = cliente.post('/webhook', json=payload)
+    primeira_mensagem_ms = (time.perf_counter() - inicio) * 1000
+
+    db.pool.fechar()
+    print(json.dumps({
+        "importacao_ms": importacao_ms,
+        "banco_aberto_na_importacao": banco_aberto_na_importacao,
+        "create_app_ms": create_app_ms,
+        "aquecimento": aquecimento,
+        "primeira_mensagem_ms": primeira_mensagem_ms,
+        "status_http": resposta.status_code
+    }))
+
+def executar(caminho, aquecer, args):
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--filho', 'aquecido' if aquecer else 'frio',
+         '--conexao-ms', str(args.conexao_ms), '--resposta-ms', str(args.resposta_ms)],
+        cwd=RAIZ, env=ambiente(caminho), check=True, capture_output=True, text=True
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--secoes', type=int, default=400, help='seções da base de conhecimento')
+    parser.add_argument('--conexao-ms', type=float, default=150, help='custo simulado de DNS/TCP/TLS da primeira requisição')
+    parser.add_argument('--resposta-ms', type=float, default=20, help='tempo simulado de resposta do Groq')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--filho', choices=('frio', 'aquecido'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        medir_filho(args.filho == 'aquecido', args.conexao_ms, args.resposta_ms)
+        return
+
+    diretorio = tempfile.mkdtemp(prefix='bench_startup_')
+    try:
+        modelo = os.path.join(diretorio, 'modelo.db')
+        preparar_banco(modelo, args.secoes)
+
+        resultados = {'frio': [], 'aquecido': []}
+        for repeticao in range(args.repeticoes):
+            for cenario in resultados:
+                caminho = os.path.join(diretorio, f'{cenario}_{repeticao}.db')
+                shutil.copy(modelo, caminho)
+                resultados[cenario].append(executar(caminho, cenario == 'aquecido', args))
+
+        for cenario, medicoes in resultados.items():
+            mediana = lambda chave: statistics.median(m[chave] for m in medicoes)
+            print(
+                f"{cenario:>9}: importação {mediana('importacao_ms'):7.1f} ms | "
+                f"create_app {mediana('create_app_ms'):6.1f} ms | "
+                f"primeira mensagem {mediana('primeira_mensagem_ms'):7.1f} ms | "
+                f"banco aberto na importação: {any(m['banco_aberto_na_importacao'] for m in medicoes)}"
+            )
+        etapas = [m['aquecimento']['etapas_ms'] for m in resultados['aquecido']]
+        print("aquecimento (mediana por etapa): " + ", ".join(
+            f"{nome} {statistics.median(e[nome] for e in etapas):.1f} ms" for nome in etapas[0]
+        ))
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
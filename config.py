@@ -14,10 +14,117 @@ class Config:
     # Configurações do banco de dados
     DATABASE_PATH = os.environ.get('DATABASE_PATH', 'chatbot.db')
     
+    MIGRACAO_TAMANHO_LOTE = int(os.environ.get('MIGRACAO_TAMANHO_LOTE', 5000))
+    
+    # Histórico particionado por número em N arquivos SQLite (1 = tudo no arquivo principal)
+    HISTORICO_SHARDS = int(os.environ.get('HISTORICO_SHARDS', 1))
+    
+    # Pool de conexões: máximo de conexões livres mantidas e quantas abrir no aquecimento
+    DB_POOL_TAMANHO = int(os.environ.get('DB_POOL_TAMANHO', 8))
+    DB_POOL_AQUECIDAS = int(os.environ.get('DB_POOL_AQUECIDAS', 4))
+    
+    # create_app inicia o aquecimento em segundo plano (uma vez por processo)
+    AQUECIMENTO_AUTOMATICO = os.environ.get('AQUECIMENTO_AUTOMATICO', 'True').lower() == 'true'
+    
+    # Gravação em lote do histórico (write-behind)
+    HISTORICO_WRITE_BEHIND = os.environ.get('HISTORICO_WRITE_BEHIND', 'False').lower() == 'true'
+    HISTORICO_FLUSH_INTERVALO_MS = float(os.environ.get('HISTORICO_FLUSH_INTERVALO_MS', 50))
+    HISTORICO_FLUSH_MAX_LINHAS = int(os.environ.get('HISTORICO_FLUSH_MAX_LINHAS', 500))
+    
+    # Cache write-through das conversas ativas
+    CACHE_CONVERSAS_ATIVO = os.environ.get('CACHE_CONVERSAS_ATIVO', 'True').lower() == 'true'
+    CACHE_CONVERSAS_MAX = int(os.environ.get('CACHE_CONVERSAS_MAX', 1000))
+    CACHE_CONVERSAS_MAX_MENSAGENS = int(os.environ.get('CACHE_CONVERSAS_MAX_MENSAGENS', 200))
+    CACHE_CONVERSAS_MAX_BYTES = int(os.environ.get('CACHE_CONVERSAS_MAX_BYTES', 64 * 1024 * 1024))
+    CACHE_CONVERSAS_TTL_SEGUNDOS = float(os.environ.get('CACHE_CONVERSAS_TTL_SEGUNDOS', 3600))
+    
     # Configurações da API Groq
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
     GROQ_API_URL = 'https://api.groq.com/openai/v1/chat/completions'
+    GROQ_MODELS_URL = 'https://api.groq.com/openai/v1/models'
     GROQ_MODEL = 'llama-3.3-70b-versatile'
+
+    # Configurações do roteamento de modelos (do menor para o maior)
+    GROQ_MODELS = [
+        modelo.strip()
+        for modelo in os.environ.get('GROQ_MODELS', f'llama-3.1-8b-instant,{GROQ_MODEL}').split(',')
+        if modelo.strip()
+    ]
+    ROTEADOR_ATIVO = os.environ.get('ROTEADOR_ATIVO', 'True').lower() == 'true'
+    # Limiares de complexidade (0 a 1) que separam cada faixa de modelo
+    ROTEADOR_LIMIARES = [
+        float(limiar)
+        for limiar in os.environ.get('ROTEADOR_LIMIARES', '0.35').split(',')
+        if limiar.strip()
+    ]
+    ROTEADOR_LATENCIA_MAXIMA_MS = float(os.environ.get('ROTEADOR_LATENCIA_MAXIMA_MS', 8000))
+    ROTEADOR_ORCAMENTO_MINIMO = float(os.environ.get('ROTEADOR_ORCAMENTO_MINIMO', 0.1))
+    # Validade da latência e do orçamento sem reset informado; intervalo entre sondas a um modelo evitado
+    ROTEADOR_VALIDADE_SINAIS_SEGUNDOS = float(os.environ.get('ROTEADOR_VALIDADE_SINAIS_SEGUNDOS', 60))
+    ROTEADOR_SONDA_INTERVALO_SEGUNDOS = float(os.environ.get('ROTEADOR_SONDA_INTERVALO_SEGUNDOS', 15))
+    CIRCUITO_FALHAS_CONSECUTIVAS = int(os.environ.get('CIRCUITO_FALHAS_CONSECUTIVAS', 3))
+    CIRCUITO_ESPERA_SEGUNDOS = float(os.environ.get('CIRCUITO_ESPERA_SEGUNDOS', 30))
+
+    # Configurações de tenants (campus/curso por número do WhatsApp Business)
+    TENANTS_ARQUIVO = os.environ.get('TENANTS_ARQUIVO', 'tenants.json')
+    ADMIN_NUMEROS = [
+        numero.strip()
+        for numero in os.environ.get('ADMIN_NUMEROS', '556293977594').split(',')
+        if numero.strip()
+    ]
+    # Token dos endpoints administrativos do histórico (vazio desativa esses endpoints)
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+    
+    # Configurações da base de conhecimento
+    KB_SECAO_MAX_CARACTERES = int(os.environ.get('KB_SECAO_MAX_CARACTERES', 4000))
+    KB_TRECHO_CARACTERES = int(os.environ.get('KB_TRECHO_CARACTERES', 1000))
+    KB_TRECHOS_POR_CONSULTA = int(os.environ.get('KB_TRECHOS_POR_CONSULTA', 6))
+    # Bases até este tamanho vão inteiras no prompt; acima disso, só os trechos recuperados
+    KB_LIMITE_DOCUMENTO_COMPLETO = int(os.environ.get('KB_LIMITE_DOCUMENTO_COMPLETO', 12000))
+    KB_VERSOES_MANTIDAS = int(os.environ.get('KB_VERSOES_MANTIDAS', 2))
+    # Intervalo entre as conferências da versão ativa no banco (publicações de outros processos)
+    KB_VERIFICACAO_VERSAO_SEGUNDOS = float(os.environ.get('KB_VERIFICACAO_VERSAO_SEGUNDOS', 5))
+    
+    # Configurações das respostas locais (sem chamada ao Groq)
+    FAST_PATH_ATIVO = os.environ.get('FAST_PATH_ATIVO', 'True').lower() == 'true'
+    FAST_PATH_INTENCOES = [
+        intencao.strip()
+        for intencao in os.environ.get('FAST_PATH_INTENCOES', 'saudacao,agradecimento,midia').split(',')
+        if intencao.strip()
+    ]
+    
+    # Política de resposta: orçamento de tokens e limite de caracteres por tipo de pedido
+    RESPOSTA_POLITICA_ATIVA = os.environ.get('RESPOSTA_POLITICA_ATIVA', 'True').lower() == 'true'
+    RESPOSTA_MAX_TOKENS_SAUDACAO = int(os.environ.get('RESPOSTA_MAX_TOKENS_SAUDACAO', 96))
+    RESPOSTA_MAX_TOKENS_FATO = int(os.environ.get('RESPOSTA_MAX_TOKENS_FATO', 200))
+    RESPOSTA_MAX_TOKENS_PASSOS = int(os.environ.get('RESPOSTA_MAX_TOKENS_PASSOS', 400))
+    RESPOSTA_CARACTERES_SAUDACAO = int(os.environ.get('RESPOSTA_CARACTERES_SAUDACAO', 200))
+    RESPOSTA_CARACTERES_FATO = int(os.environ.get('RESPOSTA_CARACTERES_FATO', 300))
+    RESPOSTA_CARACTERES_PASSOS = int(os.environ.get('RESPOSTA_CARACTERES_PASSOS', 600))
+    # Os limites do prompt são aproximados: só corta acima de limite * tolerância
+    RESPOSTA_TOLERANCIA = float(os.environ.get('RESPOSTA_TOLERANCIA', 1.3))
+    
+    # Configurações do controle de admissão (load shedding)
+    ADMISSAO_MAX_EM_ANDAMENTO = int(os.environ.get('ADMISSAO_MAX_EM_ANDAMENTO', 16))
+    ADMISSAO_MAX_ADIADAS = int(os.environ.get('ADMISSAO_MAX_ADIADAS', 200))
+    ADMISSAO_LATENCIA_GROQ_MS = float(os.environ.get('ADMISSAO_LATENCIA_GROQ_MS', 15000))
+    ADMISSAO_JANELA_SEGUNDOS = float(os.environ.get('ADMISSAO_JANELA_SEGUNDOS', 60))
+    # Quanto uma mensagem de tenant sem orçamento pode esperar pela próxima ficha antes de ser recusada
+    TENANT_ESPERA_ORCAMENTO_SEGUNDOS = float(os.environ.get('TENANT_ESPERA_ORCAMENTO_SEGUNDOS', 30))
+    
+    # Configurações do agendador justo (faixas de prioridade e round robin por número)
+    AGENDADOR_WORKERS = int(os.environ.get('AGENDADOR_WORKERS', 8))
+    AGENDADOR_MAX_POR_NUMERO = int(os.environ.get('AGENDADOR_MAX_POR_NUMERO', 5))
+    AGENDADOR_QUANTUM = int(os.environ.get('AGENDADOR_QUANTUM', 1))
+    # Parcela mínima da faixa adiada: uma tarefa adiada a cada N das faixas acima (0 = prioridade estrita)
+    AGENDADOR_PARCELA_ADIADA = int(os.environ.get('AGENDADOR_PARCELA_ADIADA', 10))
+    AGENDADOR_ESPERA_SEGUNDOS = float(os.environ.get('AGENDADOR_ESPERA_SEGUNDOS', 60))
+    
+    # Configurações de health check
+    HEALTH_CACHE_SEGUNDOS = float(os.environ.get('HEALTH_CACHE_SEGUNDOS', 5))
+    HEALTH_DB_LATENCIA_MAXIMA_MS = float(os.environ.get('HEALTH_DB_LATENCIA_MAXIMA_MS', 500))
+    HEALTH_GROQ_PROBE_SEGUNDOS = float(os.environ.get('HEALTH_GROQ_PROBE_SEGUNDOS', 60))
+    HEALTH_BACKLOG_MAXIMO = int(os.environ.get('HEALTH_BACKLOG_MAXIMO', 5000))
     
     # Configurações do servidor
     HOST = os.environ.get('HOST', '0.0.0.0')
@@ -30,6 +137,16 @@ class Config:
     # Configurações de limpeza automática
     CLEANUP_INTERVAL_HOURS = float(os.environ.get('CLEANUP_INTERVAL_HOURS', 1))  
     INACTIVE_USER_HOURS = float(os.environ.get('INACTIVE_USER_HOURS', 1))       
+    
+    # Configurações da manutenção do SQLite (horário de baixo movimento)
+    MANUTENCAO_HORA = int(os.environ.get('MANUTENCAO_HORA', 4))
+    MANUTENCAO_PAGINAS_POR_PASSO = int(os.environ.get('MANUTENCAO_PAGINAS_POR_PASSO', 200))
+    MANUTENCAO_MAX_PASSOS = int(os.environ.get('MANUTENCAO_MAX_PASSOS', 500))
+    MANUTENCAO_PAUSA_SEGUNDOS = float(os.environ.get('MANUTENCAO_PAUSA_SEGUNDOS', 0.05))
+    
+    # Configurações da consolidação do uso do Groq
+    ROLLUP_INTERVALO_MINUTOS = float(os.environ.get('ROLLUP_INTERVALO_MINUTOS', 5))
+    USO_GROQ_RETENCAO_HORAS = float(os.environ.get('USO_GROQ_RETENCAO_HORAS', 48))
 
 class DevelopmentConfig(Config):
     """Configurações para desenvolvimento"""
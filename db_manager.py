@@ -1,71 +1,889 @@
 import sqlite3
 import logging
-from datetime import datetime, timedelta
+import threading
+import atexit
+import os
+import queue
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Tenant das linhas anteriores ao suporte a vários números do WhatsApp Business
+TENANT_PADRAO = 'padrao'
+
+# Faixa de ids de cada shard do histórico (o shard i começa em i * ID_FAIXA_SHARD)
+ID_FAIXA_SHARD = 10 ** 12
+
+def agora_ms():
+    """Retorna o horário atual em epoch milissegundos (formato de horario_data)"""
+    return int(time.time() * 1000)
+
+def converter_para_epoch_ms(valor):
+    """
+    Converte um horário do histórico para epoch em milissegundos
+    
+    Args:
+        valor: Inteiro em ms, datetime ou texto ISO (formato antigo, horário local)
+    
+    Returns:
+        int: Horário em epoch milissegundos
+    """
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    return int(valor.timestamp() * 1000)
+
+def indice_shard(numero, total_shards):
+    """Retorna o shard do histórico de um número (crc32 é estável entre processos, ao contrário de hash())"""
+    if total_shards <= 1:
+        return 0
+    return zlib.crc32(str(numero).encode('utf-8')) % total_shards
+
+def caminho_shard_historico(db_path, total_shards, indice):
+    """
+    Retorna o arquivo do shard do histórico
+    
+    Com um único shard o histórico fica no próprio arquivo principal. Com N
+    shards os arquivos levam N no nome, então layouts diferentes convivem
+    durante o reshard.
+    """
+    if total_shards <= 1:
+        return db_path
+    raiz, extensao = os.path.splitext(db_path)
+    return f"{raiz}_historico_{total_shards}_{indice}{extensao or '.db'}"
+
+class BufferHistorico:
+    """
+    Buffer de gravação em lote (write-behind) do histórico
+
+    As linhas ficam em memória e uma única thread grava tudo com executemany
+    em uma transação a cada N ms ou M linhas, reduzindo as disputas pelo lock
+    de escrita do SQLite.
+    """
+    
+    def __init__(self, database, intervalo_ms=None, max_linhas=None, nome='historico-writer'):
+        self.database = database  # qualquer objeto com get_connection() (Database ou ShardHistorico)
+        self.nome = nome
+        self.intervalo = (intervalo_ms or Config.HISTORICO_FLUSH_INTERVALO_MS) / 1000
+        self.max_linhas = max_linhas or Config.HISTORICO_FLUSH_MAX_LINHAS
+        self._pendentes = []
+        self._em_gravacao = []
+        self._condicao = threading.Condition()
+        # Mantido durante o flush; leitores o usam para não ver uma linha em trânsito
+        self.gravacao_lock = threading.Lock()
+        self._parar = False
+        self._thread = None
+        self.linhas_gravadas = 0
+        self.flushes = 0
+    
+    def iniciar(self):
+        """Inicia a thread de gravação"""
+        if self._thread is None:
+            self._parar = False
+            self._thread = threading.Thread(target=self._executar, name=self.nome, daemon=True)
+            self._thread.start()
+            atexit.register(self.parar)
+    
+    def adicionar(self, numero, mensagem, user, horario, tenant_id=TENANT_PADRAO):
+        """Enfileira uma linha do histórico para gravação"""
+        with self._condicao:
+            self._pendentes.append((numero, mensagem, user, horario, tenant_id))
+            if len(self._pendentes) >= self.max_linhas:
+                self._condicao.notify()
+    
+    def tem_pendentes(self, numero, tenant_id=TENANT_PADRAO):
+        """Indica se há linhas ainda não gravadas para o número"""
+        with self._condicao:
+            return any(linha[0] == numero and linha[4] == tenant_id for linha in self._em_gravacao) or \
+                any(linha[0] == numero and linha[4] == tenant_id for linha in self._pendentes)
+    
+    def pendentes_do_numero(self, numero, tenant_id=TENANT_PADRAO):
+        """Retorna as linhas não gravadas do número no formato (mensagem, user, horario_data)"""
+        with self._condicao:
+            return [
+                (mensagem, user, horario)
+                for linha_numero, mensagem, user, horario, linha_tenant in self._em_gravacao + self._pendentes
+                if linha_numero == numero and linha_tenant == tenant_id
+            ]
+    
+    def total_pendentes(self):
+        with self._condicao:
+            return len(self._pendentes) + len(self._em_gravacao)
+    
+    def _executar(self):
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(
+                    lambda: self._parar or len(self._pendentes) >= self.max_linhas,
+                    timeout=self.intervalo
+                )
+                parar = self._parar
+            self.flush()
+            if parar:
+                break
+    
+    def flush(self):
+        """
+        Grava todas as linhas pendentes em uma única transação
+        
+        Returns:
+            int: Quantidade de linhas gravadas
+        """
+        with self.gravacao_lock:
+            with self._condicao:
+                lote, self._pendentes = self._pendentes, []
+                self._em_gravacao = lote
+            if not lote:
+                return 0
+            try:
+                with self.database.get_connection() as conn:
+                    conn.executemany('''
+                        INSERT INTO historico (numero, mensagem, user, horario_data, tenant_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', lote)
+                    conn.commit()
+                self.linhas_gravadas += len(lote)
+                self.flushes += 1
+                logger.debug(f"Flush do histórico: {len(lote)} linhas gravadas")
+                return len(lote)
+            except Exception as e:
+                logger.error(f"Erro no flush do histórico: {str(e)}")
+                # Devolve o lote para a próxima tentativa, preservando a ordem
+                with self._condicao:
+                    self._pendentes = lote + self._pendentes
+                return 0
+            finally:
+                with self._condicao:
+                    self._em_gravacao = []
+    
+    def parar(self):
+        """Para a thread de gravação garantindo o flush das linhas pendentes"""
+        if self._thread is not None:
+            with self._condicao:
+                self._parar = True
+                self._condicao.notify()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        if self.total_pendentes():
+            logger.error(f"❌ {self.total_pendentes()} linhas do histórico não foram gravadas no encerramento")
+
+class CacheConversas:
+    """
+    Cache LRU write-through das conversas ativas, por número
+    
+    Mantido em dia por inserir_historico e servido na leitura do histórico, de
+    forma que uma conversa ativa não precisa de SELECT a cada turno. Entradas
+    saem por tamanho (conversas e bytes), por inatividade ou pela limpeza.
+    """
+    
+    # Custo aproximado de cada linha além do texto da mensagem (tupla, user, horário)
+    CUSTO_LINHA = 120
+    
+    def __init__(self, max_conversas=None, max_mensagens=None, max_bytes=None, ttl_segundos=None):
+        self.max_conversas = max_conversas or Config.CACHE_CONVERSAS_MAX
+        self.max_mensagens = max_mensagens or Config.CACHE_CONVERSAS_MAX_MENSAGENS
+        self.max_bytes = max_bytes or Config.CACHE_CONVERSAS_MAX_BYTES
+        self.ttl = ttl_segundos or Config.CACHE_CONVERSAS_TTL_SEGUNDOS
+        self._entradas = OrderedDict()  # numero -> [mensagens, bytes, ultimo_acesso]
+        self._carregando = {}  # numero -> token da carga em andamento (None se invalidada)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+    
+    def _tamanho_linha(self, linha):
+        return sys.getsizeof(linha[0]) + self.CUSTO_LINHA
+    
+    def _remover(self, numero):
+        entrada = self._entradas.pop(numero, None)
+        if entrada:
+            self._bytes -= entrada[1]
+            self.remocoes += 1
+    
+    def obter(self, numero):
+        """Retorna a conversa em cache ou None"""
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(numero)
+            if entrada and agora - entrada[2] > self.ttl:
+                self._remover(numero)
+                entrada = None
+            if entrada is None:
+                self.falhas += 1
+                return None
+            entrada[2] = agora
+            self._entradas.move_to_end(numero)
+            self.acertos += 1
+            return list(entrada[0])
+    
+    def iniciar_carga(self, numero):
+        """Registra uma leitura do banco em andamento e retorna o token da carga"""
+        token = object()
+        with self._lock:
+            self._carregando[numero] = token
+        return token
+    
+    def concluir_carga(self, numero, token, mensagens):
+        """Guarda o resultado da leitura, se nenhuma escrita aconteceu durante ela"""
+        with self._lock:
+            atual = self._carregando.get(numero)
+            if atual is token or atual is None:
+                self._carregando.pop(numero, None)
+            if atual is not token or len(mensagens) > self.max_mensagens:
+                return
+            self._remover(numero)
+            tamanho = sum(self._tamanho_linha(linha) for linha in mensagens)
+            self._entradas[numero] = [list(mensagens), tamanho, time.monotonic()]
+            self._bytes += tamanho
+            self._remover_excedentes()
+    
+    def adicionar(self, numero, linha):
+        """Acrescenta a linha (mensagem, user, horario_data) à conversa em cache"""
+        with self._lock:
+            if numero in self._carregando:
+                # A leitura em andamento pode não ter visto esta linha
+                self._carregando[numero] = None
+            entrada = self._entradas.get(numero)
+            if entrada is None:
+                return
+            if len(entrada[0]) >= self.max_mensagens:
+                self._remover(numero)
+                return
+            tamanho = self._tamanho_linha(linha)
+            entrada[0].append(linha)
+            entrada[1] += tamanho
+            entrada[2] = time.monotonic()
+            self._bytes += tamanho
+            self._entradas.move_to_end(numero)
+            self._remover_excedentes()
+    
+    def _remover_excedentes(self):
+        while self._entradas and (len(self._entradas) > self.max_conversas or self._bytes > self.max_bytes):
+            numero = next(iter(self._entradas))
+            self._remover(numero)
+    
+    def remover_numeros(self, numeros):
+        """Descarta as conversas dos números informados"""
+        with self._lock:
+            for numero in numeros:
+                self._remover(numero)
+                if numero in self._carregando:
+                    self._carregando[numero] = None
+    
+    def remover_inativas(self):
+        """Descarta as conversas sem acesso há mais que o TTL"""
+        limite = time.monotonic() - self.ttl
+        with self._lock:
+            inativas = [numero for numero, entrada in self._entradas.items() if entrada[2] < limite]
+            for numero in inativas:
+                self._remover(numero)
+        return len(inativas)
+    
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            for numero in self._carregando:
+                self._carregando[numero] = None
+            self._bytes = 0
+    
+    def obter_estatisticas(self):
+        """Retorna taxa de acerto e uso de memória do cache"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "conversas": len(self._entradas),
+                "memoria_bytes": self._bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "remocoes": self.remocoes,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else None
+            }
+
+class PoolConexoes:
+    """
+    Pool de conexões SQLite reaproveitadas entre requisições
+    
+    Evita abrir o arquivo (e reler o schema) a cada operação. As conexões
+    livres ficam em uma pilha, então a mais recente, com o cache de páginas
+    mais quente, é a próxima a ser usada; acima de `tamanho` conexões livres
+    as devolvidas são fechadas.
+    """
+    
+    def __init__(self, db_path, tamanho=None):
+        self.db_path = db_path
+        self.tamanho = tamanho or Config.DB_POOL_TAMANHO
+        self._livres = []
+        self._lock = threading.Lock()
+        self.criadas = 0
+        self.reutilizadas = 0
+    
+    def _criar(self):
+        # A conexão passa de thread em thread, mas só uma a usa por vez
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock:
+            self.criadas += 1
+        return conn
+    
+    def adquirir(self):
+        with self._lock:
+            if self._livres:
+                self.reutilizadas += 1
+                return self._livres.pop()
+        return self._criar()
+    
+    def devolver(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._livres) < self.tamanho:
+                self._livres.append(conn)
+                return
+        conn.close()
+    
+    def abrir(self, quantidade):
+        """Abre conexões antecipadamente (aquecimento) até ter `quantidade` livres"""
+        novas = [self._criar() for _ in range(max(0, quantidade - len(self._livres)))]
+        for conn in novas:
+            # Lê o schema agora para que a primeira consulta real não pague por isso
+            conn.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+            self.devolver(conn)
+        return len(novas)
+    
+    @contextmanager
+    def conexao(self):
+        """Empresta uma conexão; commit ao final do bloco, rollback em caso de erro"""
+        conn = self.adquirir()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.devolver(conn)
+    
+    def fechar(self):
+        with self._lock:
+            livres, self._livres = self._livres, []
+        for conn in livres:
+            conn.close()
+    
+    def obter_estatisticas(self):
+        with self._lock:
+            return {"livres": len(self._livres), "criadas": self.criadas, "reutilizadas": self.reutilizadas}
+
+class ShardHistorico:
+    """
+    Partição do histórico em um arquivo SQLite próprio
+    
+    Cada shard tem seu pool de conexões e, com write-behind, sua thread de
+    gravação; como o lock de escrita do SQLite é por arquivo, shards
+    diferentes gravam em paralelo.
+    """
+    
+    def __init__(self, indice, caminho, pool=None, write_behind=False):
+        self.indice = indice
+        self.caminho = caminho
+        self.pool = pool or PoolConexoes(caminho)
+        self.buffer = BufferHistorico(self, nome=f'historico-writer-{indice}') if write_behind else None
+    
+    def get_connection(self):
+        """Empresta uma conexão do pool do shard (use com 'with')"""
+        return self.pool.conexao()
+
 class Database:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, write_behind=None, shards=None):
+        # Nenhum acesso ao disco aqui: as migrações rodam em inicializar()
         self.db_path = db_path or Config.DATABASE_PATH
-        self.init_database()
+        self.pool = PoolConexoes(self.db_path)
+        self._inicializado = False
+        self._inicializacao_lock = threading.Lock()
+        
+        # Cache write-through das conversas ativas, uma partição por tenant
+        self.caches_conversas = {}
+        self._caches_lock = threading.Lock()
+        
+        # Histórico particionado por número; com um shard ele fica no arquivo
+        # principal e usa o mesmo pool. Cada shard tem o seu buffer opcional
+        # de gravação em lote.
+        if write_behind is None:
+            write_behind = Config.HISTORICO_WRITE_BEHIND
+        total_shards = max(1, shards or Config.HISTORICO_SHARDS)
+        self.shards = [
+            ShardHistorico(
+                indice,
+                caminho_shard_historico(self.db_path, total_shards, indice),
+                pool=self.pool if total_shards == 1 else None,
+                write_behind=write_behind
+            )
+            for indice in range(total_shards)
+        ]
+    
+    def inicializar(self):
+        """
+        Aplica as migrações pendentes e inicia o buffer de gravação em lote
+        
+        Chamado no aquecimento da aplicação ou, na falta dele, no primeiro
+        acesso ao banco. Chamadas repetidas não fazem nada. Se uma migração
+        falhar, o erro é propagado e o banco segue não inicializado: nenhum
+        acesso usa o schema pela metade e a próxima chamada tenta de novo.
+        """
+        if self._inicializado:
+            return
+        with self._inicializacao_lock:
+            if self._inicializado:
+                return
+            self.init_database()
+            for shard in self.shards:
+                self.init_shard(shard)
+                if shard.buffer:
+                    shard.buffer.iniciar()
+            if self.shards[0].buffer:
+                logger.info("Gravação em lote do histórico ativada")
+            self._inicializado = True
+    
+    def esta_inicializado(self):
+        """True depois que todas as migrações foram aplicadas"""
+        return self._inicializado
     
     def get_connection(self):
-        """Cria uma conexão com o banco de dados"""
-        return sqlite3.connect(self.db_path)
+        """
+        Empresta uma conexão do pool, inicializando o banco no primeiro uso
+        
+        Use com 'with': a conexão volta ao pool ao final do bloco.
+        """
+        if not self._inicializado:
+            self.inicializar()
+        return self.pool.conexao()
+    
+    def shard_do_numero(self, numero):
+        """Retorna o shard do histórico do número, inicializando o banco no primeiro uso"""
+        if not self._inicializado:
+            self.inicializar()
+        return self.shards[indice_shard(numero, len(self.shards))]
+    
+    def executar_nos_shards(self, funcao):
+        """
+        Executa funcao(shard) em todos os shards, em paralelo quando há mais de um
+        
+        Returns:
+            list: Resultados na ordem dos shards
+        """
+        if not self._inicializado:
+            self.inicializar()
+        if len(self.shards) == 1:
+            return [funcao(self.shards[0])]
+        with ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix='shard') as executor:
+            return list(executor.map(funcao, self.shards))
+    
+    def total_historico_pendente(self):
+        """Retorna as linhas do histórico ainda nos buffers de gravação em lote"""
+        return sum(shard.buffer.total_pendentes() for shard in self.shards if shard.buffer)
+    
+    def parar_gravacao_historico(self):
+        """Para as threads de gravação em lote garantindo o flush das linhas pendentes"""
+        for shard in self.shards:
+            if shard.buffer:
+                shard.buffer.parar()
+    
+    def fechar(self):
+        """Grava o histórico pendente e fecha as conexões livres de todos os arquivos"""
+        self.parar_gravacao_historico()
+        for shard in self.shards:
+            if shard.pool is not self.pool:
+                shard.pool.fechar()
+        self.pool.fechar()
+    
+    def configurar_cache_tenant(self, tenant_id, max_conversas=None, max_bytes=None):
+        """
+        Cria (ou recria) a partição do cache de conversas do tenant
+        
+        Cada tenant tem limites próprios, então um tenant grande não remove
+        as conversas em cache de um tenant pequeno.
+        """
+        if not Config.CACHE_CONVERSAS_ATIVO:
+            return None
+        with self._caches_lock:
+            cache = CacheConversas(max_conversas=max_conversas, max_bytes=max_bytes)
+            self.caches_conversas[tenant_id] = cache
+            return cache
+    
+    def cache_do_tenant(self, tenant_id):
+        """Retorna a partição do cache do tenant (criada com os limites padrão se não configurada)"""
+        cache = self.caches_conversas.get(tenant_id)
+        if cache is None and Config.CACHE_CONVERSAS_ATIVO:
+            with self._caches_lock:
+                cache = self.caches_conversas.get(tenant_id)
+                if cache is None:
+                    cache = self.caches_conversas[tenant_id] = CacheConversas()
+        return cache
+    
+    def _preparar_arquivo(self, conn):
+        # WAL: leitores (exportação, consultas) não bloqueiam a escrita do webhook
+        conn.execute('PRAGMA journal_mode=WAL')
+        
+        # Controle de versão do schema
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_versao (
+                escopo TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL,
+                atualizado_em INTEGER NOT NULL
+            )
+        ''')
+        conn.commit()
     
     def init_database(self):
-        """Inicializa o banco de dados criando as tabelas e views"""
+        """Inicializa o banco de dados aplicando as migrações pendentes"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Verificar se a tabela historico já existe
-                cursor.execute("PRAGMA table_info(historico)")
-                columns = [column[1] for column in cursor.fetchall()]
-                
-                # Se a tabela não existe
-                if not columns:
-                    cursor.execute('''
-                        CREATE TABLE historico (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            numero TEXT NOT NULL,
-                            mensagem TEXT NOT NULL,
-                            user TEXT NOT NULL DEFAULT 'aluno',
-                            horario_data DATETIME DEFAULT CURRENT_TIMESTAMP
-                        )
-                    ''')
-                    logger.info("Tabela historico criada com campo user")
-
+            with self.pool.conexao() as conn:
+                self._preparar_arquivo(conn)
+                self.aplicar_migracoes(conn, 'principal', self.MIGRACOES)
                 
-                # Criar tabela contexto
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS contexto (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        documentacao TEXT NOT NULL
-                    )
-                ''')
-                
-                # Cria view para buscar mensagens por número (ordem cronológica)
-                cursor.execute('DROP VIEW IF EXISTS mensagens_por_numero')
-                cursor.execute('''
-                    CREATE VIEW mensagens_por_numero AS
-                    SELECT 
-                        numero,
-                        mensagem,
-                        user,
-                        horario_data
-                    FROM historico
-                    ORDER BY horario_data ASC
-                ''')
-                
-                conn.commit()
                 logger.info("Banco de dados inicializado com sucesso")
                 
         except Exception as e:
             logger.error(f"Erro ao inicializar banco de dados: {str(e)}")
+            raise
+    
+    def init_shard(self, shard):
+        """
+        Inicializa um shard do histórico aplicando as migrações do escopo 'historico'
+        
+        No arquivo principal (um único shard) o histórico já foi criado pelas
+        migrações 'principal' e a migração do escopo não altera nada.
+        """
+        try:
+            with shard.get_connection() as conn:
+                if shard.caminho != self.db_path:
+                    # Só tem efeito em arquivo novo, antes da primeira tabela
+                    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                self._preparar_arquivo(conn)
+                self.aplicar_migracoes(conn, 'historico', self.MIGRACOES_HISTORICO)
+                
+                # Cada shard numera os ids na sua faixa: ids continuam únicos entre arquivos
+                if shard.indice and not conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'historico'").fetchone():
+                    conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES ('historico', ?)",
+                        (shard.indice * ID_FAIXA_SHARD,)
+                    )
+                    conn.commit()
+            
+            # Com vários shards, linhas que ficaram no arquivo principal não são lidas
+            if shard.indice == 0 and shard.caminho != self.db_path:
+                with self.pool.conexao() as conn:
+                    if conn.execute('SELECT 1 FROM historico LIMIT 1').fetchone():
+                        logger.warning(f"⚠️ Há histórico no arquivo principal fora dos {len(self.shards)} shards; execute scripts/reshard.py")
+        except Exception as e:
+            logger.error(f"Erro ao inicializar o shard {shard.indice} do histórico: {str(e)}")
+            raise
+    
+    # ===== MIGRAÇÕES =====
+    
+    def aplicar_migracoes(self, conn, escopo, migracoes):
+        """
+        Aplica, em ordem, as migrações ainda não registradas para o escopo
+        
+        Args:
+            conn: Conexão com o banco
+            escopo: Nome do conjunto de migrações em schema_versao
+            migracoes: Lista de tuplas (versao, descricao, nome_do_metodo)
+        
+        Returns:
+            int: Versão do schema após as migrações
+        """
+        linha = conn.execute('SELECT versao FROM schema_versao WHERE escopo = ?', (escopo,)).fetchone()
+        versao_atual = linha[0] if linha else 0
+        
+        for versao, descricao, metodo in migracoes:
+            if versao <= versao_atual:
+                continue
+            logger.info(f"🔄 Aplicando migração {escopo} {versao}: {descricao}")
+            getattr(self, metodo)(conn)
+            conn.execute('''
+                INSERT INTO schema_versao (escopo, versao, atualizado_em) VALUES (?, ?, ?)
+                ON CONFLICT(escopo) DO UPDATE SET versao = excluded.versao, atualizado_em = excluded.atualizado_em
+            ''', (escopo, versao, agora_ms()))
+            conn.commit()
+            versao_atual = versao
+        
+        return versao_atual
+    
+    def _migracao_001_tabelas(self, conn):
+        cursor = conn.cursor()
+        
+        # Verificar se a tabela historico já existe
+        cursor.execute("PRAGMA table_info(historico)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        # Se a tabela não existe
+        if not columns:
+            cursor.execute('''
+                CREATE TABLE historico (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    numero TEXT NOT NULL,
+                    mensagem TEXT NOT NULL,
+                    user TEXT NOT NULL DEFAULT 'aluno',
+                    horario_data DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            logger.info("Tabela historico criada com campo user")
+        
+        # Criar tabela contexto
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS contexto (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                documentacao TEXT NOT NULL
+            )
+        ''')
+    
+    def _migracao_002_horario_epoch_ms(self, conn):
+        """Converte horario_data de texto ISO para epoch em milissegundos, em lotes curtos"""
+        ultimo_id = 0
+        convertidas = 0
+        while True:
+            linhas = conn.execute('''
+                SELECT id, horario_data FROM historico
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (ultimo_id, Config.MIGRACAO_TAMANHO_LOTE)).fetchall()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1][0]
+            
+            atualizacoes = [
+                (converter_para_epoch_ms(horario), id_linha)
+                for id_linha, horario in linhas
+                if not isinstance(horario, int)
+            ]
+            if atualizacoes:
+                conn.executemany('UPDATE historico SET horario_data = ? WHERE id = ?', atualizacoes)
+            # Cada lote é uma transação própria para não segurar o lock de escrita
+            conn.commit()
+            convertidas += len(atualizacoes)
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_numero_horario ON historico (numero, horario_data)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_horario ON historico (horario_data)')
+        logger.info(f"Migração de horario_data concluída: {convertidas} linhas convertidas")
+    
+    def _migracao_003_uso_groq(self, conn):
+        cursor = conn.cursor()
+        
+        # Uso bruto por requisição ao Groq
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS uso_groq (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                numero TEXT NOT NULL DEFAULT '',
+                modelo TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                queue_time_ms REAL NOT NULL DEFAULT 0,
+                total_time_ms REAL NOT NULL DEFAULT 0,
+                latencia_ms REAL NOT NULL DEFAULT 0,
+                criado_em INTEGER NOT NULL
+            )
+        ''')
+        
+        # Consolidações incrementais: por hora e modelo, por dia, número e modelo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS uso_groq_horario (
+                hora INTEGER NOT NULL,
+                modelo TEXT NOT NULL,
+                requisicoes INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                queue_time_total_ms REAL NOT NULL,
+                latencia_total_ms REAL NOT NULL,
+                PRIMARY KEY (hora, modelo)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS uso_groq_diario (
+                dia INTEGER NOT NULL,
+                numero TEXT NOT NULL,
+                modelo TEXT NOT NULL,
+                requisicoes INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                latencia_total_ms REAL NOT NULL,
+                PRIMARY KEY (dia, numero, modelo)
+            )
+        ''')
+        
+        # Último id de uso_groq já consolidado
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_estado (
+                nome TEXT PRIMARY KEY,
+                ultimo_id INTEGER NOT NULL
+            )
+        ''')
+    
+    def _migracao_004_auto_vacuum_incremental(self, conn):
+        """
+        Ativa auto_vacuum=INCREMENTAL; o VACUUM único reorganiza o arquivo para o novo modo
+        
+        O VACUUM reescreve o arquivo e bloqueia o banco enquanto dura: em
+        arquivos grandes, aplique antes com scripts/migrar.py e a aplicação parada.
+        """
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return
+        conn.commit()
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+    
+    def _migracao_005_base_conhecimento(self, conn):
+        cursor = conn.cursor()
+        
+        # Seções endereçadas pelo hash do conteúdo (reaproveitadas entre versões)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS kb_secoes (
+                hash TEXT PRIMARY KEY,
+                titulo TEXT NOT NULL,
+                conteudo TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS kb_versoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                criada_em INTEGER NOT NULL,
+                total_secoes INTEGER NOT NULL,
+                ativa INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS kb_versao_secoes (
+                versao_id INTEGER NOT NULL,
+                ordem INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                arquivo TEXT NOT NULL,
+                PRIMARY KEY (versao_id, ordem)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_kb_versao_secoes_hash ON kb_versao_secoes (hash)')
+    
+    def _migracao_006_tenants(self, conn):
+        """Adiciona tenant_id (ADD COLUMN com valor padrão não reescreve as tabelas)"""
+        for tabela in ('historico', 'contexto', 'uso_groq', 'kb_versoes'):
+            colunas = [coluna[1] for coluna in conn.execute(f'PRAGMA table_info({tabela})').fetchall()]
+            if 'tenant_id' not in colunas:
+                conn.execute(f"ALTER TABLE {tabela} ADD COLUMN tenant_id TEXT NOT NULL DEFAULT '{TENANT_PADRAO}'")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_kb_versoes_tenant ON kb_versoes (tenant_id, ativa)')
+    
+    def _migracao_007_view_mensagens_por_numero(self, conn):
+        """Cria a view de mensagens por número (antes recriada a cada inicialização)"""
+        conn.execute('DROP VIEW IF EXISTS mensagens_por_numero')
+        conn.execute('''
+            CREATE VIEW mensagens_por_numero AS
+            SELECT 
+                id,
+                tenant_id,
+                numero,
+                mensagem,
+                user,
+                horario_data
+            FROM historico
+            ORDER BY horario_data ASC, id ASC
+        ''')
+    
+    def _migracao_008_politica_resposta(self, conn):
+        """Registra tokens solicitados, tipo de resposta e cortes por max_tokens no uso do Groq"""
+        colunas = [coluna[1] for coluna in conn.execute('PRAGMA table_info(uso_groq)').fetchall()]
+        if 'max_tokens' not in colunas:
+            conn.execute('ALTER TABLE uso_groq ADD COLUMN max_tokens INTEGER NOT NULL DEFAULT 0')
+        if 'tipo_resposta' not in colunas:
+            conn.execute("ALTER TABLE uso_groq ADD COLUMN tipo_resposta TEXT NOT NULL DEFAULT ''")
+        if 'truncada' not in colunas:
+            conn.execute('ALTER TABLE uso_groq ADD COLUMN truncada INTEGER NOT NULL DEFAULT 0')
+        
+        # Consolidação por hora e tipo de resposta: tokens solicitados x usados
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS uso_groq_tipo_horario (
+                hora INTEGER NOT NULL,
+                tipo_resposta TEXT NOT NULL,
+                requisicoes INTEGER NOT NULL,
+                max_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                truncadas INTEGER NOT NULL,
+                PRIMARY KEY (hora, tipo_resposta)
+            )
+        ''')
+    
+    def _migracao_009_texto_base_conhecimento(self, conn):
+        """Guarda o texto enviado em cada versão (NULL nas versões antigas, remontadas pelas seções)"""
+        colunas = [coluna[1] for coluna in conn.execute('PRAGMA table_info(kb_versoes)').fetchall()]
+        if 'texto' not in colunas:
+            conn.execute('ALTER TABLE kb_versoes ADD COLUMN texto TEXT')
     
-    def inserir_historico(self, numero, mensagem, user='aluno'):
+    MIGRACOES = [
+        (1, 'Cria as tabelas historico e contexto', '_migracao_001_tabelas'),
+        (2, 'Converte horario_data para epoch em milissegundos', '_migracao_002_horario_epoch_ms'),
+        (3, 'Cria as tabelas de uso do Groq e consolidações', '_migracao_003_uso_groq'),
+        (4, 'Ativa auto_vacuum incremental', '_migracao_004_auto_vacuum_incremental'),
+        (5, 'Cria as tabelas da base de conhecimento', '_migracao_005_base_conhecimento'),
+        (6, 'Adiciona tenant_id ao histórico, contexto, uso do Groq e base de conhecimento', '_migracao_006_tenants'),
+        (7, 'Cria a view mensagens_por_numero', '_migracao_007_view_mensagens_por_numero'),
+        (8, 'Registra tokens solicitados e tipo de resposta no uso do Groq', '_migracao_008_politica_resposta'),
+        (9, 'Guarda o texto original de cada versão da base de conhecimento', '_migracao_009_texto_base_conhecimento'),
+    ]
+    
+    # ===== MIGRAÇÕES DOS SHARDS DO HISTÓRICO =====
+    
+    def _migracao_historico_001_tabela(self, conn):
+        """Cria o histórico já no formato atual (IF NOT EXISTS: no arquivo principal não altera nada)"""
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS historico (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                numero TEXT NOT NULL,
+                mensagem TEXT NOT NULL,
+                user TEXT NOT NULL DEFAULT 'aluno',
+                horario_data INTEGER NOT NULL,
+                tenant_id TEXT NOT NULL DEFAULT '{TENANT_PADRAO}'
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_numero_horario ON historico (numero, horario_data)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_historico_horario ON historico (horario_data)')
+        conn.execute('''
+            CREATE VIEW IF NOT EXISTS mensagens_por_numero AS
+            SELECT 
+                id,
+                tenant_id,
+                numero,
+                mensagem,
+                user,
+                horario_data
+            FROM historico
+            ORDER BY horario_data ASC, id ASC
+        ''')
+    
+    def _migracao_historico_002_view_desempate_id(self, conn):
+        """Recria a view com o id: mensagens gravadas no mesmo milissegundo saem na ordem de inserção"""
+        conn.execute('DROP VIEW IF EXISTS mensagens_por_numero')
+        conn.execute('''
+            CREATE VIEW mensagens_por_numero AS
+            SELECT 
+                id,
+                tenant_id,
+                numero,
+                mensagem,
+                user,
+                horario_data
+            FROM historico
+            ORDER BY horario_data ASC, id ASC
+        ''')
+    
+    MIGRACOES_HISTORICO = [
+        (1, 'Cria a tabela historico e a view mensagens_por_numero', '_migracao_historico_001_tabela'),
+        (2, 'Desempata a view mensagens_por_numero pelo id', '_migracao_historico_002_view_desempate_id'),
+    ]
+    
+    def inserir_historico(self, numero, mensagem, user='aluno', tenant_id=TENANT_PADRAO):
         """
         Insere uma nova entrada no histórico
         
@@ -73,30 +891,47 @@ class Database:
             numero: Número do telefone
             mensagem: Conteúdo da mensagem
             user: 'aluno' ou 'Bot UNIALFA'
+            tenant_id: Tenant (número do WhatsApp Business) da conversa
+        
+        Returns:
+            int: id inserido, 0 se a linha ficou no buffer de gravação em lote ou None em caso de erro
         """
         try:
-            with self.get_connection() as conn:
+            horario = agora_ms()
+            cache = self.cache_do_tenant(tenant_id)
+            shard = self.shard_do_numero(numero)
+            
+            if shard.buffer:
+                shard.buffer.adicionar(numero, mensagem, user, horario, tenant_id)
+                if cache:
+                    cache.adicionar(numero, (mensagem, user, horario))
+                logger.info(f"Histórico enfileirado para número {numero} - User: {user}")
+                return 0
+            
+            with shard.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO historico (numero, mensagem, user, horario_data)
-                    VALUES (?, ?, ?, ?)
-                ''', (numero, mensagem, user, datetime.now()))
+                    INSERT INTO historico (numero, mensagem, user, horario_data, tenant_id)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (numero, mensagem, user, horario, tenant_id))
                 conn.commit()
+                if cache:
+                    cache.adicionar(numero, (mensagem, user, horario))
                 logger.info(f"Histórico inserido para número {numero} - User: {user}")
                 return cursor.lastrowid
         except Exception as e:
             logger.error(f"Erro ao inserir histórico: {str(e)}")
             return None
     
-    def inserir_contexto(self, documentacao):
-        """Insere nova documentação no contexto"""
+    def inserir_contexto(self, documentacao, tenant_id=TENANT_PADRAO):
+        """Insere nova documentação no contexto do tenant"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO contexto (documentacao)
-                    VALUES (?)
-                ''', (documentacao,))
+                    INSERT INTO contexto (documentacao, tenant_id)
+                    VALUES (?, ?)
+                ''', (documentacao, tenant_id))
                 conn.commit()
                 logger.info("Contexto inserido com sucesso")
                 return cursor.lastrowid
@@ -105,22 +940,28 @@ class Database:
             return None
     
     def limpar_historico(self):
-        """Limpa toda a tabela de histórico"""
+        """Limpa toda a tabela de histórico (em todos os shards)"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM historico')
-                conn.commit()
-                logger.info("Histórico limpo com sucesso")
+            self.executar_nos_shards(self._limpar_shard)
+            for cache in list(self.caches_conversas.values()):
+                cache.limpar()
+            logger.info("Histórico limpo com sucesso")
         except Exception as e:
             logger.error(f"Erro ao limpar histórico: {str(e)}")
     
-    def limpar_contexto(self):
-        """Limpa toda a tabela de contexto"""
+    def _limpar_shard(self, shard):
+        if shard.buffer:
+            shard.buffer.flush()
+        with shard.get_connection() as conn:
+            conn.execute('DELETE FROM historico')
+            conn.commit()
+    
+    def limpar_contexto(self, tenant_id=TENANT_PADRAO):
+        """Limpa o contexto do tenant"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('DELETE FROM contexto')
+                cursor.execute('DELETE FROM contexto WHERE tenant_id = ?', (tenant_id,))
                 conn.commit()
                 logger.info("Contexto limpo com sucesso")
         except Exception as e:
@@ -130,58 +971,667 @@ class Database:
         """
         Remove mensagens do histórico de usuários inativos
         
+        Os shards são limpos em paralelo, cada um com a sua transação.
+        
         Args:
             horas_inativo: Número de horas para considerar usuário inativo
         """
+        try:
+            limite_tempo = agora_ms() - int(horas_inativo * 3600 * 1000)
+            resultados = self.executar_nos_shards(lambda shard: self._limpar_shard_inativo(shard, limite_tempo))
+            
+            mensagens_removidas = 0
+            numeros_afetados = {}
+            for removidas, afetados in resultados:
+                mensagens_removidas += removidas
+                for tenant_id, numeros in afetados.items():
+                    numeros_afetados.setdefault(tenant_id, []).extend(numeros)
+            
+            for tenant_id, cache in list(self.caches_conversas.items()):
+                cache.remover_numeros(numeros_afetados.get(tenant_id, []))
+                cache.remover_inativas()
+            
+            logger.info(f"Limpeza concluída: {mensagens_removidas} mensagens removidas de usuários inativos há mais de {horas_inativo}h")
+            return mensagens_removidas
+                
+        except Exception as e:
+            logger.error(f"Erro ao limpar histórico inativo: {str(e)}")
+            return 0
+    
+    def _limpar_shard_inativo(self, shard, limite_tempo):
+        """
+        Remove do shard as mensagens anteriores ao limite
+        
+        Returns:
+            tuple: (mensagens removidas, {tenant_id: [números afetados]})
+        """
+        if shard.buffer:
+            shard.buffer.flush()
+        with shard.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Números afetados, para descartar suas conversas do cache
+            cursor.execute('''
+                SELECT DISTINCT tenant_id, numero FROM historico
+                WHERE horario_data < ?
+            ''', (limite_tempo,))
+            numeros_afetados = {}
+            for tenant_id, numero in cursor.fetchall():
+                numeros_afetados.setdefault(tenant_id, []).append(numero)
+            
+            cursor.execute('''
+                DELETE FROM historico 
+                WHERE horario_data < ?
+            ''', (limite_tempo,))
+            
+            mensagens_removidas = cursor.rowcount
+            conn.commit()
+            return mensagens_removidas, numeros_afetados
+    
+    def arquivos_banco(self):
+        """Retorna os arquivos SQLite da instância: o principal e os shards do histórico (sem repetição)"""
+        arquivos = [self.db_path]
+        arquivos.extend(shard.caminho for shard in self.shards if shard.caminho != self.db_path)
+        return arquivos
+    
+    def medir_latencia(self, timeout=2):
+        """
+        Mede a latência de leitura e de escrita do banco sem gravar dados
+        
+        A escrita é medida adquirindo o lock de escrita (BEGIN IMMEDIATE) e
+        desfazendo em seguida, o que reflete a disputa com o webhook. Com
+        shards, retorna a latência do arquivo mais lento.
+        
+        Returns:
+            dict: Latências em ms de leitura e escrita
+        """
+        medicoes = [self._medir_latencia_arquivo(caminho, timeout) for caminho in self.arquivos_banco()]
+        return {
+            "leitura_ms": max(medicao["leitura_ms"] for medicao in medicoes),
+            "escrita_ms": max(medicao["escrita_ms"] for medicao in medicoes)
+        }
+    
+    def _medir_latencia_arquivo(self, caminho, timeout):
+        conn = sqlite3.connect(caminho, timeout=timeout, isolation_level=None)
+        try:
+            inicio = time.perf_counter()
+            conn.execute('SELECT id FROM historico LIMIT 1').fetchall()
+            leitura_ms = (time.perf_counter() - inicio) * 1000
+            
+            inicio = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('ROLLBACK')
+            escrita_ms = (time.perf_counter() - inicio) * 1000
+            
+            return {"leitura_ms": round(leitura_ms, 2), "escrita_ms": round(escrita_ms, 2)}
+        finally:
+            conn.close()
+    
+    # ===== MANUTENÇÃO =====
+    
+    def executar_manutencao(self, paginas_por_passo=None, max_passos=None, pausa_segundos=None):
+        """
+        Executa a manutenção do SQLite em passos curtos
+        
+        Faz o checkpoint do WAL, devolve páginas livres ao sistema com
+        incremental_vacuum em lotes (com pausa entre eles para o webhook gravar)
+        e atualiza as estatísticas do planejador com PRAGMA optimize. Os
+        shards do histórico são mantidos um após o outro, depois do arquivo
+        principal, para não somar a carga de I/O de todos ao mesmo tempo.
+        
+        Returns:
+            dict: Resultado de cada etapa (e de cada shard em 'shards')
+        """
+        paginas_por_passo = paginas_por_passo or Config.MANUTENCAO_PAGINAS_POR_PASSO
+        max_passos = max_passos or Config.MANUTENCAO_MAX_PASSOS
+        pausa_segundos = Config.MANUTENCAO_PAUSA_SEGUNDOS if pausa_segundos is None else pausa_segundos
+        
+        arquivos = self.arquivos_banco()
+        resultado = self._manter_arquivo(arquivos[0], paginas_por_passo, max_passos, pausa_segundos)
+        if len(arquivos) > 1:
+            resultado["shards"] = [
+                self._manter_arquivo(caminho, paginas_por_passo, max_passos, pausa_segundos)
+                for caminho in arquivos[1:]
+            ]
+        return resultado
+    
+    def _manter_arquivo(self, caminho, paginas_por_passo, max_passos, pausa_segundos):
+        resultado = {}
+        # Autocommit: cada PRAGMA é sua própria transação curta
+        conn = sqlite3.connect(caminho, timeout=5, isolation_level=None)
+        try:
+            inicio = time.perf_counter()
+            ocupado, paginas_wal, paginas_copiadas = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+            resultado["checkpoint"] = {
+                "ocupado": bool(ocupado),
+                "paginas_wal": paginas_wal,
+                "paginas_copiadas": paginas_copiadas,
+                "duracao_ms": round((time.perf_counter() - inicio) * 1000, 2)
+            }
+            
+            paginas_livres_antes = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            passos = 0
+            maior_passo_ms = 0.0
+            while passos < max_passos and conn.execute('PRAGMA freelist_count').fetchone()[0] > 0:
+                inicio = time.perf_counter()
+                # executescript executa o PRAGMA até o fim (execute libera só uma página)
+                conn.executescript(f'PRAGMA incremental_vacuum({int(paginas_por_passo)});')
+                maior_passo_ms = max(maior_passo_ms, (time.perf_counter() - inicio) * 1000)
+                passos += 1
+                time.sleep(pausa_segundos)
+            resultado["incremental_vacuum"] = {
+                "passos": passos,
+                "paginas_liberadas": paginas_livres_antes - conn.execute('PRAGMA freelist_count').fetchone()[0],
+                "maior_passo_ms": round(maior_passo_ms, 2)
+            }
+            
+            inicio = time.perf_counter()
+            # analysis_limit limita o ANALYZE feito pelo optimize a uma amostra por índice
+            conn.execute('PRAGMA analysis_limit=1000')
+            conn.execute('PRAGMA optimize')
+            resultado["optimize_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+            
+            logger.info(f"Manutenção do banco concluída ({caminho}): {resultado}")
+            return resultado
+        except Exception as e:
+            logger.error(f"Erro na manutenção do banco: {str(e)}")
+            resultado["erro"] = str(e)
+            return resultado
+        finally:
+            conn.close()
+    
+    def obter_metricas_banco(self):
+        """Retorna tamanho do banco, páginas livres e tamanho do WAL (e de cada shard em 'shards')"""
         try:
+            with self.get_connection() as conn:
+                metricas = self._metricas_arquivo(conn, self.db_path)
+            if len(self.shards) > 1:
+                metricas["shards"] = []
+                for shard in self.shards:
+                    with shard.get_connection() as conn:
+                        metricas["shards"].append(self._metricas_arquivo(conn, shard.caminho))
+            return metricas
+        except Exception as e:
+            logger.error(f"Erro ao obter métricas do banco: {str(e)}")
+            return None
+    
+    def _metricas_arquivo(self, conn, caminho):
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        caminho_wal = f"{caminho}-wal"
+        return {
+            "tamanho_bytes": page_size * page_count,
+            "paginas": page_count,
+            "paginas_livres": freelist_count,
+            "wal_bytes": os.path.getsize(caminho_wal) if os.path.exists(caminho_wal) else 0
+        }
+    
+    # ===== USO DO GROQ =====
+    
+    def registrar_uso_groq(self, numero, modelo, uso, latencia_ms, tenant_id=TENANT_PADRAO,
+                           max_tokens=0, tipo_resposta='', truncada=False):
+        """
+        Registra o uso de tokens de uma requisição ao Groq
+        
+        Args:
+            numero: Número da conversa
+            modelo: Modelo utilizado
+            uso: Objeto 'usage' da resposta do Groq (tempos em segundos)
+            latencia_ms: Latência observada pela aplicação
+            tenant_id: Tenant da conversa
+            max_tokens: Tokens solicitados na requisição
+            tipo_resposta: Tipo de pedido da política de respostas ('' sem política)
+            truncada: True se o modelo parou por max_tokens
+        """
+        try:
+            uso = uso or {}
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                limite_tempo = datetime.now() - timedelta(hours=horas_inativo)
-                
                 cursor.execute('''
-                    DELETE FROM historico 
-                    WHERE horario_data < ?
-                ''', (limite_tempo,))
-                
-                mensagens_removidas = cursor.rowcount
+                    INSERT INTO uso_groq (
+                        numero, modelo, prompt_tokens, completion_tokens,
+                        queue_time_ms, total_time_ms, latencia_ms, criado_em, tenant_id,
+                        max_tokens, tipo_resposta, truncada
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    numero or '',
+                    modelo,
+                    uso.get('prompt_tokens') or 0,
+                    uso.get('completion_tokens') or 0,
+                    (uso.get('queue_time') or 0) * 1000,
+                    (uso.get('total_time') or 0) * 1000,
+                    latencia_ms or 0,
+                    agora_ms(),
+                    tenant_id,
+                    max_tokens or 0,
+                    tipo_resposta or '',
+                    int(bool(truncada))
+                ))
                 conn.commit()
+                return cursor.lastrowid
+        except Exception as e:
+            logger.error(f"Erro ao registrar uso do Groq: {str(e)}")
+            return None
+    
+    def consolidar_uso_groq(self, retencao_horas=48):
+        """
+        Consolida de forma incremental o uso bruto nas tabelas por hora e por dia
+        
+        Só processa as linhas após o último id consolidado e remove as linhas
+        brutas já consolidadas mais antigas que a retenção.
+        
+        Args:
+            retencao_horas: Horas de uso bruto mantidas após a consolidação
+        
+        Returns:
+            int: Quantidade de linhas brutas consolidadas
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT ultimo_id FROM rollup_estado WHERE nome = 'uso_groq'")
+                linha = cursor.fetchone()
+                ultimo_id = linha[0] if linha else 0
+                
+                cursor.execute('SELECT MAX(id) FROM uso_groq')
+                maximo_id = cursor.fetchone()[0] or 0
+                
+                consolidadas = 0
+                if maximo_id > ultimo_id:
+                    cursor.execute('''
+                        INSERT INTO uso_groq_horario (
+                            hora, modelo, requisicoes, prompt_tokens, completion_tokens,
+                            queue_time_total_ms, latencia_total_ms
+                        )
+                        SELECT (criado_em / 3600000) * 3600000, modelo, COUNT(*),
+                               SUM(prompt_tokens), SUM(completion_tokens),
+                               SUM(queue_time_ms), SUM(latencia_ms)
+                        FROM uso_groq
+                        WHERE id > ? AND id <= ?
+                        GROUP BY 1, 2
+                        ON CONFLICT(hora, modelo) DO UPDATE SET
+                            requisicoes = requisicoes + excluded.requisicoes,
+                            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                            completion_tokens = completion_tokens + excluded.completion_tokens,
+                            queue_time_total_ms = queue_time_total_ms + excluded.queue_time_total_ms,
+                            latencia_total_ms = latencia_total_ms + excluded.latencia_total_ms
+                    ''', (ultimo_id, maximo_id))
+                    
+                    cursor.execute('''
+                        INSERT INTO uso_groq_diario (
+                            dia, numero, modelo, requisicoes, prompt_tokens,
+                            completion_tokens, latencia_total_ms
+                        )
+                        SELECT (criado_em / 86400000) * 86400000, numero, modelo, COUNT(*),
+                               SUM(prompt_tokens), SUM(completion_tokens), SUM(latencia_ms)
+                        FROM uso_groq
+                        WHERE id > ? AND id <= ?
+                        GROUP BY 1, 2, 3
+                        ON CONFLICT(dia, numero, modelo) DO UPDATE SET
+                            requisicoes = requisicoes + excluded.requisicoes,
+                            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                            completion_tokens = completion_tokens + excluded.completion_tokens,
+                            latencia_total_ms = latencia_total_ms + excluded.latencia_total_ms
+                    ''', (ultimo_id, maximo_id))
+                    
+                    cursor.execute('''
+                        INSERT INTO uso_groq_tipo_horario (
+                            hora, tipo_resposta, requisicoes, max_tokens, completion_tokens, truncadas
+                        )
+                        SELECT (criado_em / 3600000) * 3600000, tipo_resposta, COUNT(*),
+                               SUM(max_tokens), SUM(completion_tokens), SUM(truncada)
+                        FROM uso_groq
+                        WHERE id > ? AND id <= ?
+                        GROUP BY 1, 2
+                        ON CONFLICT(hora, tipo_resposta) DO UPDATE SET
+                            requisicoes = requisicoes + excluded.requisicoes,
+                            max_tokens = max_tokens + excluded.max_tokens,
+                            completion_tokens = completion_tokens + excluded.completion_tokens,
+                            truncadas = truncadas + excluded.truncadas
+                    ''', (ultimo_id, maximo_id))
+                    
+                    consolidadas = maximo_id - ultimo_id
+                    cursor.execute('''
+                        INSERT INTO rollup_estado (nome, ultimo_id) VALUES ('uso_groq', ?)
+                        ON CONFLICT(nome) DO UPDATE SET ultimo_id = excluded.ultimo_id
+                    ''', (maximo_id,))
                 
-                logger.info(f"Limpeza concluída: {mensagens_removidas} mensagens removidas de usuários inativos há mais de {horas_inativo}h")
-                return mensagens_removidas
+                # Remove o uso bruto já consolidado e fora da retenção
+                cursor.execute('''
+                    DELETE FROM uso_groq
+                    WHERE id <= ? AND criado_em < ?
+                ''', (maximo_id, agora_ms() - int(retencao_horas * 3600 * 1000)))
+                removidas = cursor.rowcount
                 
+                conn.commit()
+                logger.info(f"Consolidação de uso do Groq: {consolidadas} requisições consolidadas, {removidas} linhas brutas removidas")
+                return consolidadas
         except Exception as e:
-            logger.error(f"Erro ao limpar histórico inativo: {str(e)}")
+            logger.error(f"Erro ao consolidar uso do Groq: {str(e)}")
             return 0
     
-    # ===== MÉTODOS DE VIEW =====
+    def obter_uso_por_modelo(self, desde_ms):
+        """Obtém o uso consolidado por modelo a partir da hora informada"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT modelo, SUM(requisicoes), SUM(prompt_tokens), SUM(completion_tokens),
+                           SUM(latencia_total_ms), SUM(queue_time_total_ms)
+                    FROM uso_groq_horario
+                    WHERE hora >= ?
+                    GROUP BY modelo
+                    ORDER BY modelo
+                ''', (desde_ms,))
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao obter uso por modelo: {str(e)}")
+            return []
     
-    def obter_mensagens_por_numero(self, numero):
-        """Obtém todas as mensagens de um número específico usando a view (ordem cronológica)"""
+    def obter_uso_por_tipo_resposta(self, desde_ms):
+        """Obtém, por tipo de resposta, os tokens solicitados x usados a partir da hora informada"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    SELECT mensagem, user, horario_data
-                    FROM mensagens_por_numero
-                    WHERE numero = ?
-                    ORDER BY horario_data ASC
-                ''', (numero,))
+                    SELECT tipo_resposta, SUM(requisicoes), SUM(max_tokens), SUM(completion_tokens), SUM(truncadas)
+                    FROM uso_groq_tipo_horario
+                    WHERE hora >= ?
+                    GROUP BY tipo_resposta
+                    ORDER BY tipo_resposta
+                ''', (desde_ms,))
                 return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao obter uso por tipo de resposta: {str(e)}")
+            return []
+    
+    def obter_conversas_mais_caras(self, desde_ms, limite=10):
+        """Obtém os números com mais tokens consumidos a partir do dia informado"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT numero, SUM(requisicoes), SUM(prompt_tokens), SUM(completion_tokens)
+                    FROM uso_groq_diario
+                    WHERE dia >= ?
+                    GROUP BY numero
+                    ORDER BY SUM(prompt_tokens) + SUM(completion_tokens) DESC
+                    LIMIT ?
+                ''', (desde_ms, limite))
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao obter conversas mais caras: {str(e)}")
+            return []
+    
+    # ===== BASE DE CONHECIMENTO =====
+    
+    def publicar_versao_base(self, ordem, secoes_novas, versoes_mantidas=2, tenant_id=TENANT_PADRAO, texto=None):
+        """
+        Publica uma nova versão da base de conhecimento do tenant em uma única transação
+        
+        Args:
+            ordem: Lista de tuplas (hash, arquivo) na ordem dos documentos
+            secoes_novas: Dicionário hash -> (titulo, conteudo) das seções ainda não gravadas
+            versoes_mantidas: Quantidade de versões antigas preservadas
+            tenant_id: Tenant dono da base
+            texto: Texto original dos documentos da versão
+        
+        Returns:
+            int: id da versão publicada ou None em caso de erro
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO kb_secoes (hash, titulo, conteudo)
+                    VALUES (?, ?, ?)
+                ''', ((hash_secao, titulo, conteudo) for hash_secao, (titulo, conteudo) in secoes_novas.items()))
+                
+                cursor.execute('''
+                    INSERT INTO kb_versoes (criada_em, total_secoes, ativa, tenant_id, texto)
+                    VALUES (?, ?, 0, ?, ?)
+                ''', (agora_ms(), len(ordem), tenant_id, texto))
+                versao_id = cursor.lastrowid
+                
+                cursor.executemany('''
+                    INSERT INTO kb_versao_secoes (versao_id, ordem, hash, arquivo)
+                    VALUES (?, ?, ?, ?)
+                ''', ((versao_id, posicao, hash_secao, arquivo) for posicao, (hash_secao, arquivo) in enumerate(ordem)))
+                
+                cursor.execute('UPDATE kb_versoes SET ativa = (id = ?) WHERE tenant_id = ?', (versao_id, tenant_id))
+                
+                # Remove versões antigas do tenant e seções que nenhuma versão (de nenhum tenant) usa mais
+                cursor.execute('''
+                    DELETE FROM kb_versao_secoes WHERE versao_id IN (
+                        SELECT id FROM kb_versoes WHERE tenant_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (tenant_id, versoes_mantidas))
+                cursor.execute('''
+                    DELETE FROM kb_versoes WHERE id IN (
+                        SELECT id FROM kb_versoes WHERE tenant_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (tenant_id, versoes_mantidas))
+                cursor.execute('''
+                    DELETE FROM kb_secoes
+                    WHERE hash NOT IN (SELECT hash FROM kb_versao_secoes)
+                ''')
+                
+                conn.commit()
+                logger.info(f"Base de conhecimento publicada: versão {versao_id} com {len(ordem)} seções (tenant {tenant_id})")
+                return versao_id
+        except Exception as e:
+            logger.error(f"Erro ao publicar base de conhecimento: {str(e)}")
+            return None
+    
+    def obter_versao_base_ativa(self, tenant_id=TENANT_PADRAO):
+        """
+        Obtém a versão ativa da base de conhecimento do tenant
+        
+        Returns:
+            tuple: (versao_id, lista de (hash, arquivo, titulo, conteudo), texto original ou None)
+            ou (None, [], None)
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT id, texto FROM kb_versoes WHERE tenant_id = ? AND ativa = 1', (tenant_id,))
+                linha = cursor.fetchone()
+                if not linha:
+                    return None, [], None
+                cursor.execute('''
+                    SELECT vs.hash, vs.arquivo, s.titulo, s.conteudo
+                    FROM kb_versao_secoes vs
+                    JOIN kb_secoes s ON s.hash = vs.hash
+                    WHERE vs.versao_id = ?
+                    ORDER BY vs.ordem
+                ''', (linha[0],))
+                return linha[0], cursor.fetchall(), linha[1]
+        except Exception as e:
+            logger.error(f"Erro ao obter base de conhecimento: {str(e)}")
+            return None, [], None
+    
+    def obter_id_versao_base_ativa(self, tenant_id=TENANT_PADRAO):
+        """Obtém só o id da versão ativa da base do tenant (detecta publicações de outros processos)"""
+        try:
+            with self.get_connection() as conn:
+                linha = conn.execute('SELECT id FROM kb_versoes WHERE tenant_id = ? AND ativa = 1', (tenant_id,)).fetchone()
+                return linha[0] if linha else None
+        except Exception as e:
+            logger.error(f"Erro ao obter a versão ativa da base de conhecimento: {str(e)}")
+            return None
+    
+    # ===== MÉTODOS DE VIEW =====
+    
+    def obter_mensagens_por_numero(self, numero, tenant_id=TENANT_PADRAO):
+        """Obtém todas as mensagens de um número no tenant usando a view (ordem cronológica)"""
+        try:
+            cache = self.cache_do_tenant(tenant_id)
+            if not cache:
+                return self._ler_mensagens_por_numero(numero, tenant_id)
+            
+            mensagens = cache.obter(numero)
+            if mensagens is not None:
+                return mensagens
+            
+            token = cache.iniciar_carga(numero)
+            mensagens = self._ler_mensagens_por_numero(numero, tenant_id)
+            cache.concluir_carga(numero, token, mensagens)
+            return mensagens
         except Exception as e:
             logger.error(f"Erro ao obter mensagens por número: {str(e)}")
             return []
     
 
-    def obter_contexto(self):
-        """Obtém toda a documentação do contexto"""
+    def _ler_mensagens_por_numero(self, numero, tenant_id):
+        """Lê as mensagens do shard do número, incluindo as ainda no buffer de gravação em lote"""
+        shard = self.shard_do_numero(numero)
+        if shard.buffer and shard.buffer.tem_pendentes(numero, tenant_id):
+            # Impede o flush durante a leitura para que nenhuma linha apareça duas vezes ou suma
+            with shard.buffer.gravacao_lock:
+                return self._consultar_mensagens_por_numero(shard, numero, tenant_id) + \
+                    shard.buffer.pendentes_do_numero(numero, tenant_id)
+        return self._consultar_mensagens_por_numero(shard, numero, tenant_id)
+    
+    def _consultar_mensagens_por_numero(self, shard, numero, tenant_id):
+        with shard.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT mensagem, user, horario_data
+                FROM mensagens_por_numero
+                WHERE numero = ? AND tenant_id = ?
+                ORDER BY horario_data ASC, id ASC
+            ''', (numero, tenant_id))
+            return cursor.fetchall()
+    
+    def obter_estatisticas_cache(self):
+        """Retorna as estatísticas de cada partição (tenant) do cache de conversas ativas"""
+        if not Config.CACHE_CONVERSAS_ATIVO:
+            return None
+        return {tenant_id: cache.obter_estatisticas() for tenant_id, cache in list(self.caches_conversas.items())}
+    
+    def obter_pagina_historico(self, numero, apos_id=0, limite=50, tenant_id=TENANT_PADRAO):
+        """
+        Obtém uma página do histórico de um número usando paginação por chave (id)
+        
+        Args:
+            numero: Número do telefone
+            apos_id: Retorna apenas mensagens com id maior que este cursor
+            limite: Quantidade máxima de mensagens
+            tenant_id: Tenant da conversa
+        
+        Returns:
+            list: Tuplas (id, mensagem, user, horario_data) em ordem cronológica
+        """
+        try:
+            with self.shard_do_numero(numero).get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, mensagem, user, horario_data
+                    FROM historico
+                    WHERE numero = ? AND tenant_id = ? AND id > ?
+                    ORDER BY id ASC
+                    LIMIT ?
+                ''', (numero, tenant_id, apos_id, limite))
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Erro ao obter página do histórico: {str(e)}")
+            return []
+    
+    def iterar_historico(self, tamanho_lote=1000):
+        """
+        Percorre todo o histórico em lotes, com memória constante
+        
+        Cada lote é uma consulta curta por chave (id > último id), então nenhuma
+        transação de leitura fica aberta entre lotes e a escrita do webhook não é
+        bloqueada nem o checkpoint do WAL é impedido durante a exportação. Com
+        vários shards, uma thread por shard lê os lotes para uma fila limitada
+        e as linhas saem agrupadas por lote, na ordem em que ficam prontas.
+        
+        Yields:
+            tuple: (id, tenant_id, numero, mensagem, user, horario_data)
+        """
+        if not self._inicializado:
+            self.inicializar()
+        if len(self.shards) == 1:
+            for lote in self._iterar_lotes_shard(self.shards[0], tamanho_lote):
+                yield from lote
+            return
+        
+        lotes = queue.Queue(maxsize=len(self.shards) * 2)
+        cancelado = threading.Event()
+        fim = object()
+        
+        def ler_shard(shard):
+            try:
+                for lote in self._iterar_lotes_shard(shard, tamanho_lote):
+                    # Espera com timeout para encerrar se o consumidor desistir
+                    while not cancelado.is_set():
+                        try:
+                            lotes.put(lote, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+                    if cancelado.is_set():
+                        return
+            except Exception as e:
+                logger.error(f"Erro ao exportar o shard {shard.indice} do histórico: {str(e)}")
+            finally:
+                if not cancelado.is_set():
+                    lotes.put(fim)
+        
+        leitores = [
+            threading.Thread(target=ler_shard, args=(shard,), name=f'exportacao-{shard.indice}', daemon=True)
+            for shard in self.shards
+        ]
+        for leitor in leitores:
+            leitor.start()
+        try:
+            ativos = len(leitores)
+            while ativos:
+                lote = lotes.get()
+                if lote is fim:
+                    ativos -= 1
+                    continue
+                yield from lote
+        finally:
+            cancelado.set()
+            # Libera leitores bloqueados na fila cheia
+            while any(leitor.is_alive() for leitor in leitores):
+                try:
+                    lotes.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+    
+    def _iterar_lotes_shard(self, shard, tamanho_lote):
+        ultimo_id = 0
+        with shard.get_connection() as conn:
+            while True:
+                cursor = conn.execute('''
+                    SELECT id, tenant_id, numero, mensagem, user, horario_data
+                    FROM historico
+                    WHERE id > ?
+                    ORDER BY id ASC
+                    LIMIT ?
+                ''', (ultimo_id, tamanho_lote))
+                linhas = cursor.fetchall()
+                if not linhas:
+                    break
+                ultimo_id = linhas[-1][0]
+                yield linhas
+    
+    def obter_contexto(self, tenant_id=TENANT_PADRAO):
+        """Obtém toda a documentação do contexto do tenant"""
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT documentacao FROM contexto')
+                cursor.execute('SELECT documentacao FROM contexto WHERE tenant_id = ?', (tenant_id,))
                 return [row[0] for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Erro ao obter contexto: {str(e)}")
             return []
 
-# Instância global do banco de dados unificado
+# Instância global do banco de dados unificado (sem I/O até o primeiro uso)
 db = Database()
@@ -2,13 +2,18 @@ from app import create_app
 from app.services.cleanup_service import iniciar_cleanup_service
 from config import Config
 import logging
+import signal
+import sys
 
 logger = logging.getLogger(__name__)
 
 def main():
     """Função principal para iniciar a aplicação"""
     try:
-        # Cria a aplicação Flask
+        # Encerra com SIGTERM passando pelos handlers de atexit (flush do histórico, scheduler)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        
+        # Cria a aplicação Flask (inicia o aquecimento de banco, bases e conexão com o Groq)
         app = create_app()
         
         # Inicia o serviço de limpeza
@@ -0,0 +1,53 @@
+"""
+Aplica as migrações pendentes do banco com a aplicação parada
+
+As migrações rodam sozinhas no aquecimento, mas algumas são demoradas em
+arquivos grandes: a 4 (auto_vacuum=INCREMENTAL) executa um VACUUM que
+reescreve o arquivo inteiro e bloqueia todo acesso ao banco enquanto dura,
+e a 2 converte horario_data de todas as linhas. Em produção, rode este
+script antes do deploy, fora do horário de pico; a aplicação encontra o
+schema já na versão atual e o aquecimento não espera por elas. O VACUUM
+precisa de espaço livre em disco do tamanho do arquivo.
+
+Uso:
+    python scripts/migrar.py [--banco chatbot.db] [--shards 1]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from db_manager import Database
+
+def versoes(database):
+    with database.get_connection() as conn:
+        return dict(conn.execute('SELECT escopo, versao FROM schema_versao').fetchall())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', default=Config.DATABASE_PATH, help='arquivo principal do banco (padrão: DATABASE_PATH)')
+    parser.add_argument('--shards', type=int, default=Config.HISTORICO_SHARDS, help='shards do histórico (padrão: HISTORICO_SHARDS)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    tamanho_mb = os.path.getsize(args.banco) / 1024 / 1024 if os.path.exists(args.banco) else 0
+    print(f"Banco {args.banco} ({tamanho_mb:.1f} MB), {args.shards} shard(s) do histórico")
+
+    database = Database(args.banco, write_behind=False, shards=args.shards)
+    inicio = time.perf_counter()
+    try:
+        database.inicializar()
+    except Exception as e:
+        print(f"❌ migração falhou: {str(e)}; o banco fica na última versão aplicada e a próxima execução continua dela")
+        return 1
+
+    print(f"✅ migrações aplicadas em {time.perf_counter() - inicio:.1f}s; versões: {versoes(database)}")
+    database.fechar()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,510 @@
+"""
+Perfil de custo dos prompts sobre as conversas gravadas (offline)
+
+Percorre o histórico em fluxo e, para cada mensagem do aluno que iria ao
+Groq (as respondidas localmente pelo fast path ficam de fora), remonta o
+array de mensagens que enviar_para_groq enviaria naquele turno: prompt do
+tenant, documentação da base de conhecimento (ou da tabela contexto) e o
+histórico até a mensagem, incluindo-a. Relata a distribuição dos tokens de
+prompt por parte (sistema, documentação e histórico), quanto do gasto vem de
+conversas longas e a economia estimada com outras configurações, uma por vez:
+janela de histórico, k da recuperação e resumo do histórico acima de um
+limiar (o custo de gerar o resumo não entra na conta).
+
+Tokens são estimados por caracteres (--caracteres-por-token), mais uma folga
+fixa por mensagem para o papel e a formatação do chat. A documentação vem da
+base publicada hoje, não da que estava ativa quando a conversa aconteceu; o
+processo principal lê a base e a tabela contexto uma vez, monta o índice de
+trechos em memória e o repassa aos processos do pool. O banco nunca é gravado.
+
+O trabalho é dividido em faixas de números de cada shard, processadas por um
+pool de processos. Cada faixa é lida em ordem (número, horário) com uma
+consulta somente leitura, então cada processo mantém em memória apenas a
+conversa atual e histogramas de tamanho fixo. Em bancos grandes, rode sobre
+uma cópia ou fora do horário de pico.
+
+Uso:
+    python scripts/perfil_prompts.py [--banco chatbot.db] [--shards 1] [--processos 4] [--tenant padrao]
+        [--janelas 4,8,16] [--k 2,4] [--resumos 10:150,20:150] [--conversa-longa 20] [--json saida.json]
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from db_manager import caminho_shard_historico
+from app.services.groq_service import montar_mensagens, renderizar_prompt_sistema
+from app.services.intent_service import responder_intencao_local
+from app.services.knowledge_service import BaseConhecimento, calcular_hash_secao, iterar_secoes
+from app.services.tenant_service import RegistroTenants
+from app.utils.whatsapp_utils import formatar_historico_mensagens
+
+# Folga por mensagem para o papel e os separadores do template de chat
+TOKENS_POR_MENSAGEM = 4
+
+# Largura relativa das faixas dos histogramas (percentis com erro de até ~5%)
+RAZAO_FAIXAS = 1.05
+
+# Faixas de tamanho das conversas, em turnos enviados ao Groq
+FAIXAS_CONVERSA = [(1, 5), (6, 10), (11, 20), (21, 50), (51, None)]
+
+PARTES = ('sistema', 'documentacao', 'historico', 'total')
+
+# Parâmetros, tenants e bases de conhecimento de cada processo do pool
+_parametros = None
+_tenants = {}
+_bases = {}
+
+class Histograma:
+    """Contagem em faixas logarítmicas: memória fixa e junção entre processos"""
+
+    def __init__(self):
+        self.faixas = Counter()
+        self.contagem = 0
+        self.soma = 0
+        self.maximo = 0
+
+    def adicionar(self, valor):
+        self.faixas[int(math.log(valor + 1, RAZAO_FAIXAS))] += 1
+        self.contagem += 1
+        self.soma += valor
+        self.maximo = max(self.maximo, valor)
+
+    def juntar(self, outro):
+        self.faixas.update(outro.faixas)
+        self.contagem += outro.contagem
+        self.soma += outro.soma
+        self.maximo = max(self.maximo, outro.maximo)
+
+    def media(self):
+        return self.soma / self.contagem if self.contagem else 0
+
+    def percentil(self, fracao):
+        """Retorna o limite superior da faixa que contém o percentil"""
+        if not self.contagem:
+            return 0
+        alvo = fracao * self.contagem
+        acumulado = 0
+        for faixa in sorted(self.faixas):
+            acumulado += self.faixas[faixa]
+            if acumulado >= alvo:
+                return min(int(RAZAO_FAIXAS ** (faixa + 1)) - 1, self.maximo)
+        return self.maximo
+
+class Conversa:
+    """Estado de uma conversa (tenant, número) enquanto suas linhas são lidas"""
+
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.acumulado = [0]  # tokens do histórico até cada linha (soma de prefixos)
+        self.bot_respondeu = False
+        self.turnos = 0
+        self.tokens = 0
+
+class Perfil:
+    """Agregados de uma faixa do histórico; perfis de faixas diferentes são somados no final"""
+
+    def __init__(self, alternativas):
+        self.histogramas = {parte: Histograma() for parte in PARTES}
+        self.turnos_locais = 0
+        self.conversas = Histograma()
+        self.por_faixa_conversa = {faixa: [0, 0] for faixa in FAIXAS_CONVERSA}  # [conversas, tokens]
+        self.conversas_longas = [0, 0]
+        self.por_tenant = Counter()
+        self.alternativas = {nome: 0 for nome in alternativas}
+
+    def juntar(self, outro):
+        for parte in PARTES:
+            self.histogramas[parte].juntar(outro.histogramas[parte])
+        self.turnos_locais += outro.turnos_locais
+        self.conversas.juntar(outro.conversas)
+        for faixa, (conversas, tokens) in outro.por_faixa_conversa.items():
+            self.por_faixa_conversa[faixa][0] += conversas
+            self.por_faixa_conversa[faixa][1] += tokens
+        self.conversas_longas[0] += outro.conversas_longas[0]
+        self.conversas_longas[1] += outro.conversas_longas[1]
+        self.por_tenant.update(outro.por_tenant)
+        for nome, tokens in outro.alternativas.items():
+            self.alternativas[nome] += tokens
+
+    def encerrar_conversa(self, conversa, conversa_longa):
+        if not conversa.turnos:
+            return
+        self.conversas.adicionar(conversa.turnos)
+        for faixa in FAIXAS_CONVERSA:
+            minimo, maximo = faixa
+            if conversa.turnos >= minimo and (maximo is None or conversa.turnos <= maximo):
+                self.por_faixa_conversa[faixa][0] += 1
+                self.por_faixa_conversa[faixa][1] += conversa.tokens
+                break
+        if conversa.turnos > conversa_longa:
+            self.conversas_longas[0] += 1
+            self.conversas_longas[1] += conversa.tokens
+
+def estimar_tokens(texto):
+    return math.ceil(len(texto) / _parametros['caracteres_por_token'])
+
+def nomes_alternativas(parametros):
+    nomes = [f"janela de {janela} mensagens" for janela in parametros['janelas']]
+    nomes += [f"k = {k} trechos" for k in parametros['k']]
+    nomes += [f"resumo acima de {limiar} mensagens ({tokens} tokens)" for limiar, tokens in parametros['resumos']]
+    return nomes
+
+def inicializar_processo(parametros, bases):
+    """Inicializador do pool: sem logs da aplicação, bases já indexadas pelo processo principal"""
+    global _parametros, _tenants, _bases
+    _parametros = parametros
+    _bases = bases
+    logging.disable(logging.WARNING)
+    # Só o arquivo de tenants (prompts); o registro global configuraria o cache do banco
+    _tenants = RegistroTenants().ler_tenants()
+
+def ler_bases(banco, tenant=None):
+    """
+    Monta em memória a base de conhecimento de cada tenant, lendo o arquivo principal
+
+    Usa uma conexão somente leitura, como o histórico. Sem base publicada, a
+    aplicação importa a tabela contexto no primeiro uso; aqui essa importação
+    é só simulada em memória.
+
+    Args:
+        banco: Arquivo principal do banco
+        tenant: Lê só a base deste tenant (None lê todas)
+
+    Returns:
+        dict: tenant_id -> BaseConhecimento (tenants sem documentação ficam de fora)
+    """
+    conn = sqlite3.connect(f"file:{banco}?mode=ro", uri=True)
+    try:
+        contextos = {}
+        for tenant_id, documentacao in conn.execute('SELECT tenant_id, documentacao FROM contexto ORDER BY id'):
+            contextos.setdefault(tenant_id, documentacao)
+        versoes = {tenant_id: (versao_id, texto) for tenant_id, versao_id, texto
+                   in conn.execute('SELECT tenant_id, id, texto FROM kb_versoes WHERE ativa = 1')}
+
+        bases = {}
+        for tenant_id in set(contextos) | set(versoes):
+            if tenant and tenant_id != tenant:
+                continue
+            if tenant_id in versoes:
+                versao_id, texto = versoes[tenant_id]
+                secoes = conn.execute('''
+                    SELECT vs.hash, vs.arquivo, s.titulo, s.conteudo
+                    FROM kb_versao_secoes vs
+                    JOIN kb_secoes s ON s.hash = vs.hash
+                    WHERE vs.versao_id = ?
+                    ORDER BY vs.ordem
+                ''', (versao_id,)).fetchall()
+            else:
+                versao_id, linhas = None, contextos[tenant_id].splitlines()
+                texto = '\n'.join(linhas)
+                secoes = [(calcular_hash_secao(titulo, conteudo), 'contexto', titulo, conteudo)
+                          for titulo, conteudo in iterar_secoes(linhas)]
+            base = BaseConhecimento(tenant_id)
+            base.montar(versao_id, secoes, texto)
+            bases[tenant_id] = base
+    finally:
+        conn.close()
+    return bases
+
+def documentacao_do_turno(tenant_id, mensagem):
+    """Documentação que obter_documentacao enviaria, a partir da base em memória"""
+    base = _bases.get(tenant_id)
+    documentacao = base.documentacao_indexada(mensagem) if base else None
+    return documentacao or ("Documentação não disponível", None)
+
+def tokens_linha(mensagem, user, horario_data):
+    """Tokens de uma linha do histórico no array, interpretada como em montar_mensagens"""
+    # O parser de montar_mensagens trata cada linha do histórico formatado de
+    # forma independente, então somar as linhas equivale a remontar o array inteiro
+    mensagens = montar_mensagens(formatar_historico_mensagens([(mensagem, user, horario_data)]), '', '')[1:-1]
+    return sum(estimar_tokens(m['content']) + TOKENS_POR_MENSAGEM for m in mensagens)
+
+def documentacao_com_k(tenant_id, mensagem, documentacao, score, k):
+    """Documentação que seria enviada com k trechos (só muda quando a base é enviada em trechos)"""
+    if score is None:
+        # Base inteira no prompt (ou nenhuma documentação): k não se aplica
+        return documentacao
+    trechos, _ = _bases[tenant_id].buscar(mensagem, k)
+    return '\n\n---\n\n'.join(trechos) if trechos else "Documentação não disponível"
+
+def processar_turno(perfil, conversa, mensagem):
+    """Remonta o prompt do turno e soma as partes e as alternativas"""
+    if responder_intencao_local(mensagem, not conversa.bot_respondeu):
+        perfil.turnos_locais += 1
+        return
+
+    # Tenant que saiu da configuração usa o prompt padrão
+    tenant = _tenants.get(conversa.tenant_id)
+    documentacao, score = documentacao_do_turno(conversa.tenant_id, mensagem)
+
+    # Sistema e mensagem atual vêm do próprio montar_mensagens; o histórico, da soma das linhas
+    sistema, atual = montar_mensagens("Nenhuma mensagem anterior", documentacao, mensagem, tenant)
+    tokens_sistema = estimar_tokens(sistema['content']) + TOKENS_POR_MENSAGEM
+    tokens_sistema_sem_documentacao = estimar_tokens(renderizar_prompt_sistema('', tenant)) + TOKENS_POR_MENSAGEM
+    tokens_documentacao = tokens_sistema - tokens_sistema_sem_documentacao
+    tokens_atual = estimar_tokens(atual['content']) + TOKENS_POR_MENSAGEM
+    acumulado = conversa.acumulado
+    linhas = len(acumulado) - 1
+    tokens_historico = acumulado[-1] + tokens_atual
+    total = tokens_sistema + tokens_historico
+
+    for parte, valor in (('sistema', tokens_sistema_sem_documentacao), ('documentacao', tokens_documentacao),
+                         ('historico', tokens_historico), ('total', total)):
+        perfil.histogramas[parte].adicionar(valor)
+    perfil.por_tenant[conversa.tenant_id] += total
+    conversa.turnos += 1
+    conversa.tokens += total
+
+    alternativas = perfil.alternativas
+    for janela in _parametros['janelas']:
+        historico = acumulado[-1] - acumulado[max(linhas - janela, 0)] + tokens_atual
+        alternativas[f"janela de {janela} mensagens"] += total - tokens_historico + historico
+    for k in _parametros['k']:
+        alternativa = renderizar_prompt_sistema(documentacao_com_k(conversa.tenant_id, mensagem, documentacao, score, k), tenant)
+        alternativas[f"k = {k} trechos"] += total - tokens_sistema + estimar_tokens(alternativa) + TOKENS_POR_MENSAGEM
+    for limiar, tokens_resumo in _parametros['resumos']:
+        historico = tokens_historico
+        if linhas > limiar:
+            historico = tokens_resumo + TOKENS_POR_MENSAGEM + acumulado[-1] - acumulado[linhas - limiar] + tokens_atual
+        alternativas[f"resumo acima de {limiar} mensagens ({tokens_resumo} tokens)"] += total - tokens_historico + historico
+
+def perfilar_faixa(tarefa):
+    """
+    Processa uma faixa de números de um shard
+
+    Args:
+        tarefa: (arquivo do shard, primeiro número ou None, número final exclusivo ou None)
+
+    Returns:
+        Perfil: Agregados da faixa
+    """
+    caminho, inicio, fim = tarefa
+    perfil = Perfil(nomes_alternativas(_parametros))
+    condicoes, valores = [], []
+    if inicio is not None:
+        condicoes.append('numero >= ?')
+        valores.append(inicio)
+    if fim is not None:
+        condicoes.append('numero < ?')
+        valores.append(fim)
+    if _parametros['tenant']:
+        condicoes.append('tenant_id = ?')
+        valores.append(_parametros['tenant'])
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ''
+
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        # Mesma ordem de obter_mensagens_por_numero, agrupada por número (índice numero, horario_data)
+        cursor = conn.execute(f'''
+            SELECT tenant_id, numero, mensagem, user, horario_data
+            FROM historico {where}
+            ORDER BY numero, horario_data, id
+        ''', valores)
+        numero_atual = None
+        conversas = {}
+        while True:
+            linhas = cursor.fetchmany(_parametros['lote'])
+            if not linhas:
+                break
+            for tenant_id, numero, mensagem, user, horario_data in linhas:
+                if numero != numero_atual:
+                    for conversa in conversas.values():
+                        perfil.encerrar_conversa(conversa, _parametros['conversa_longa'])
+                    numero_atual, conversas = numero, {}
+                conversa = conversas.get(tenant_id)
+                if conversa is None:
+                    conversa = conversas[tenant_id] = Conversa(tenant_id)
+
+                # O webhook grava a mensagem antes de ler o histórico: ela entra no próprio turno
+                conversa.acumulado.append(conversa.acumulado[-1] + tokens_linha(mensagem, user, horario_data))
+                if user == 'Bot UNIALFA':
+                    conversa.bot_respondeu = True
+                elif user == 'aluno':
+                    processar_turno(perfil, conversa, mensagem)
+        for conversa in conversas.values():
+            perfil.encerrar_conversa(conversa, _parametros['conversa_longa'])
+    finally:
+        conn.close()
+    return perfil
+
+def dividir_em_faixas(caminho, particoes):
+    """Divide o shard em faixas de números com quantidades de linhas parecidas"""
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        total = conn.execute('SELECT COUNT(*) FROM historico').fetchone()[0]
+        if not total:
+            return []
+        limites = []
+        for i in range(1, particoes):
+            linha = conn.execute(
+                'SELECT numero FROM historico ORDER BY numero LIMIT 1 OFFSET ?', (total * i // particoes,)
+            ).fetchone()
+            if linha and (not limites or linha[0] > limites[-1]):
+                limites.append(linha[0])
+    finally:
+        conn.close()
+    bordas = [None] + limites + [None]
+    return [(caminho, bordas[i], bordas[i + 1]) for i in range(len(bordas) - 1)]
+
+def lista_inteiros(valor):
+    return [int(item) for item in valor.split(',') if item.strip()]
+
+def lista_resumos(valor):
+    resumos = []
+    for item in valor.split(','):
+        if item.strip():
+            limiar, tokens = item.split(':')
+            resumos.append((int(limiar), int(tokens)))
+    return resumos
+
+def porcentagem(parte, total):
+    return 100 * parte / total if total else 0
+
+def imprimir_relatorio(perfil, parametros):
+    total = perfil.histogramas['total']
+    print(f"\nTurnos enviados ao Groq: {total.contagem} em {perfil.conversas.contagem} conversas "
+          f"({perfil.turnos_locais} respondidos localmente, fora da conta)")
+    print(f"Tokens de prompt por turno (estimados, {parametros['caracteres_por_token']} caracteres por token):")
+    print(f"  {'parte':<13}{'média':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'máx':>8}{'% do total':>12}")
+    for parte in PARTES:
+        histograma = perfil.histogramas[parte]
+        print(f"  {parte:<13}{histograma.media():>8.0f}{histograma.percentil(0.5):>8}{histograma.percentil(0.9):>8}"
+              f"{histograma.percentil(0.99):>8}{histograma.maximo:>8}{porcentagem(histograma.soma, total.soma):>11.1f}%")
+
+    print(f"\nConversas por quantidade de turnos (p50 {perfil.conversas.percentil(0.5)}, p99 {perfil.conversas.percentil(0.99)}):")
+    for (minimo, maximo), (conversas, tokens) in perfil.por_faixa_conversa.items():
+        faixa = f"{minimo}-{maximo}" if maximo else f"{minimo}+"
+        print(f"  {faixa:>6} turnos: {porcentagem(conversas, perfil.conversas.contagem):5.1f}% das conversas, "
+              f"{porcentagem(tokens, total.soma):5.1f}% dos tokens")
+    conversas, tokens = perfil.conversas_longas
+    print(f"  acima de {parametros['conversa_longa']} turnos: {porcentagem(conversas, perfil.conversas.contagem):.1f}% "
+          f"das conversas respondem por {porcentagem(tokens, total.soma):.1f}% dos tokens")
+
+    if len(perfil.por_tenant) > 1:
+        print("\nTokens por tenant:")
+        for tenant_id, tokens in perfil.por_tenant.most_common():
+            print(f"  {tenant_id:<20}{tokens:>14,}  {porcentagem(tokens, total.soma):5.1f}%")
+
+    if perfil.alternativas:
+        print(f"\nAlternativas (uma configuração por vez; atual: {total.soma:,} tokens):")
+        for nome, tokens in perfil.alternativas.items():
+            print(f"  {nome:<42}{tokens:>14,} tokens  economia {porcentagem(total.soma - tokens, total.soma):5.1f}%")
+
+def relatorio_json(perfil, parametros):
+    total = perfil.histogramas['total']
+    return {
+        "turnos": total.contagem,
+        "turnos_locais": perfil.turnos_locais,
+        "conversas": perfil.conversas.contagem,
+        "caracteres_por_token": parametros['caracteres_por_token'],
+        "partes": {
+            parte: {
+                "soma": histograma.soma,
+                "media": round(histograma.media(), 1),
+                "p50": histograma.percentil(0.5),
+                "p90": histograma.percentil(0.9),
+                "p99": histograma.percentil(0.99),
+                "max": histograma.maximo
+            } for parte, histograma in perfil.histogramas.items()
+        },
+        "por_tamanho_conversa": [
+            {"min_turnos": minimo, "max_turnos": maximo, "conversas": conversas, "tokens": tokens}
+            for (minimo, maximo), (conversas, tokens) in perfil.por_faixa_conversa.items()
+        ],
+        "conversas_longas": {
+            "acima_de_turnos": parametros['conversa_longa'],
+            "conversas": perfil.conversas_longas[0],
+            "tokens": perfil.conversas_longas[1]
+        },
+        "por_tenant": dict(perfil.por_tenant),
+        "alternativas": {
+            nome: {"tokens": tokens, "economia": round(1 - tokens / total.soma, 4) if total.soma else None}
+            for nome, tokens in perfil.alternativas.items()
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--banco', help='arquivo principal do banco (padrão: DATABASE_PATH)')
+    parser.add_argument('--shards', type=int, help='quantidade de shards do histórico (padrão: HISTORICO_SHARDS)')
+    parser.add_argument('--tenant', help='analisa só as conversas deste tenant')
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--faixas-por-processo', type=int, default=4, help='faixas de números por processo')
+    parser.add_argument('--lote', type=int, default=5000, help='linhas lidas por vez')
+    parser.add_argument('--caracteres-por-token', type=float, default=4.0)
+    parser.add_argument('--janelas', type=lista_inteiros, default=[4, 8, 16], help='janelas de histórico a simular')
+    parser.add_argument('--k', type=lista_inteiros, default=[2, 4], help='trechos por consulta a simular')
+    parser.add_argument('--resumos', type=lista_resumos, default=[(10, 150), (20, 150)],
+                        help='limiar:tokens do resumo do histórico a simular')
+    parser.add_argument('--conversa-longa', type=int, default=20, help='turnos a partir dos quais a conversa é longa')
+    parser.add_argument('--json', help='grava o relatório também neste arquivo')
+    args = parser.parse_args()
+
+    banco = args.banco or Config.DATABASE_PATH
+    shards = args.shards or Config.HISTORICO_SHARDS
+    if not os.path.exists(banco):
+        parser.error(f'banco {banco} não encontrado')
+    if args.processos < 1 or shards < 1:
+        parser.error('--processos e --shards devem ser pelo menos 1')
+
+    parametros = {
+        'tenant': args.tenant,
+        'lote': args.lote,
+        'caracteres_por_token': args.caracteres_por_token,
+        'janelas': args.janelas,
+        'k': args.k,
+        'resumos': args.resumos,
+        'conversa_longa': args.conversa_longa
+    }
+
+    inicio = time.perf_counter()
+    arquivos = [caminho_shard_historico(banco, shards, indice) for indice in range(shards)]
+    faltando = [arquivo for arquivo in arquivos if not os.path.exists(arquivo)]
+    if faltando:
+        parser.error(f"shards não encontrados: {', '.join(faltando)}")
+
+    # Faixas proporcionais ao tamanho de cada shard, para os processos terminarem juntos
+    particoes = args.processos * args.faixas_por_processo
+    linhas_por_shard = []
+    for arquivo in arquivos:
+        with sqlite3.connect(f"file:{arquivo}?mode=ro", uri=True) as conn:
+            linhas_por_shard.append(conn.execute('SELECT COUNT(*) FROM historico').fetchone()[0])
+    total_linhas = sum(linhas_por_shard) or 1
+    tarefas = []
+    for arquivo, linhas in zip(arquivos, linhas_por_shard):
+        if linhas:
+            tarefas += dividir_em_faixas(arquivo, max(1, round(particoes * linhas / total_linhas)))
+    bases = ler_bases(banco, args.tenant)
+    print(f"{sum(linhas_por_shard)} linhas em {shards} shard(s), {len(tarefas)} faixas, {args.processos} processo(s), "
+          f"{len(bases)} base(s) de conhecimento")
+
+    perfil = Perfil(nomes_alternativas(parametros))
+    if args.processos == 1:
+        inicializar_processo(parametros, bases)
+        for resultado in map(perfilar_faixa, tarefas):
+            perfil.juntar(resultado)
+    else:
+        with multiprocessing.Pool(args.processos, initializer=inicializar_processo, initargs=(parametros, bases)) as pool:
+            for concluidas, resultado in enumerate(pool.imap_unordered(perfilar_faixa, tarefas), 1):
+                perfil.juntar(resultado)
+                print(f"  {concluidas}/{len(tarefas)} faixas", end='\r', flush=True)
+
+    imprimir_relatorio(perfil, parametros)
+    print(f"\nconcluído em {time.perf_counter() - inicio:.1f}s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio_json(perfil, parametros), arquivo, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Redistribui o histórico entre uma nova quantidade de shards
+
+Lê todas as linhas do layout atual (--de shards) e grava no layout novo
+(--para shards). Os arquivos de cada layout levam a quantidade de shards no
+nome, então o layout atual não é alterado durante a cópia. Rode com a
+aplicação parada; ao final, ajuste HISTORICO_SHARDS para o novo valor e
+reinicie. Com --remover-origem o layout antigo é apagado depois que as
+contagens de linhas conferem (com um único shard de origem, as linhas são
+removidas da tabela historico do arquivo principal).
+
+Uso:
+    python scripts/reshard.py --para 4 [--de 1] [--banco chatbot.db] [--lote 5000] [--remover-origem]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from db_manager import Database, indice_shard
+
+def contar_linhas(database):
+    total = 0
+    for shard in database.shards:
+        with shard.get_connection() as conn:
+            total += conn.execute('SELECT COUNT(*) FROM historico').fetchone()[0]
+    return total
+
+def copiar(origem, destino, tamanho_lote):
+    """
+    Copia as linhas shard a shard, na ordem dos ids (cronológica por número)
+
+    Os ids não são preservados: cada shard de destino numera as linhas na sua faixa.
+
+    Returns:
+        int: Linhas copiadas
+    """
+    copiadas = 0
+    for shard in origem.shards:
+        for lote in origem._iterar_lotes_shard(shard, tamanho_lote):
+            por_destino = {}
+            for _, tenant_id, numero, mensagem, user, horario_data in lote:
+                por_destino.setdefault(indice_shard(numero, len(destino.shards)), []).append(
+                    (numero, mensagem, user, horario_data, tenant_id)
+                )
+            for indice, linhas in por_destino.items():
+                with destino.shards[indice].get_connection() as conn:
+                    conn.executemany('''
+                        INSERT INTO historico (numero, mensagem, user, horario_data, tenant_id)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', linhas)
+            copiadas += len(lote)
+        print(f"shard {shard.indice} de origem copiado ({copiadas} linhas até agora)")
+    return copiadas
+
+def remover_origem(origem):
+    if len(origem.shards) == 1:
+        with origem.get_connection() as conn:
+            conn.execute('DELETE FROM historico')
+        print("histórico removido do arquivo principal (o espaço volta na manutenção diária)")
+        return
+    origem.fechar()
+    for shard in origem.shards:
+        for sufixo in ('', '-wal', '-shm'):
+            if os.path.exists(shard.caminho + sufixo):
+                os.remove(shard.caminho + sufixo)
+        print(f"removido {shard.caminho}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--para', type=int, required=True, help='nova quantidade de shards')
+    parser.add_argument('--de', type=int, default=Config.HISTORICO_SHARDS, help='quantidade atual de shards')
+    parser.add_argument('--banco', default=Config.DATABASE_PATH, help='arquivo principal do banco')
+    parser.add_argument('--lote', type=int, default=5000, help='linhas lidas por consulta')
+    parser.add_argument('--remover-origem', action='store_true', help='apaga o layout antigo após a verificação')
+    args = parser.parse_args()
+
+    if args.para < 1 or args.de < 1:
+        parser.error('a quantidade de shards deve ser pelo menos 1')
+    if args.para == args.de:
+        parser.error('--para é igual a --de; nada a fazer')
+    if not os.path.exists(args.banco):
+        parser.error(f'banco {args.banco} não encontrado')
+
+    logging.basicConfig(level=logging.WARNING)
+    origem = Database(args.banco, write_behind=False, shards=args.de)
+    destino = Database(args.banco, write_behind=False, shards=args.para)
+    origem.inicializar()
+    destino.inicializar()
+
+    ja_no_destino = contar_linhas(destino)
+    if ja_no_destino:
+        print(f"o layout de destino já tem {ja_no_destino} linhas; remova-o antes de redistribuir")
+        return 1
+
+    inicio = time.perf_counter()
+    total_origem = contar_linhas(origem)
+    copiadas = copiar(origem, destino, args.lote)
+    total_destino = contar_linhas(destino)
+    print(f"{copiadas} linhas redistribuídas de {args.de} para {args.para} shards em {time.perf_counter() - inicio:.1f}s")
+
+    if total_destino != total_origem:
+        print(f"❌ contagens divergentes: origem {total_origem}, destino {total_destino}; layout antigo mantido")
+        return 1
+
+    if args.remover_origem:
+        remover_origem(origem)
+    print(f"✅ defina HISTORICO_SHARDS={args.para} e reinicie a aplicação")
+    destino.fechar()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Confere a faixa de modelo escolhida pelo roteador para mensagens de referência
+
+Calcula a complexidade de cada mensagem com a heurística do roteador e a
+compara com os limiares (ROTEADOR_LIMIARES ou --limiares). Perguntas reais,
+mesmo curtas, devem ir para o modelo maior; confirmações e respostas curtas,
+para o menor. Rode depois de mudar a heurística ou os limiares; sai com
+código 1 se alguma mensagem cair na faixa errada.
+
+Uso:
+    python scripts/verificar_roteador.py [--limiares 0.35]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app.services.model_router import RoteadorModelos
+
+# (mensagem, mensagens anteriores na conversa, score da recuperação, vai para o modelo maior)
+REFERENCIAS = [
+    ("qual o valor da mensalidade?", 0, 0.87, True),
+    ("quando abre a secretaria?", 0, None, True),
+    ("onde pego o boleto", 2, 1.0, True),
+    ("Como faço para trancar a matrícula e pedir o reembolso da mensalidade que já paguei?", 3, 0.4, True),
+    ("Preciso de ajuda com a rematrícula do próximo semestre, meu acesso ao portal do aluno está bloqueado desde ontem", 1, 0.5, True),
+    ("ok", 0, None, False),
+    ("sim", 4, 0.5, False),
+    ("entendi, valeu", 2, None, False),
+    ("meu RA é 123456", 1, 0.9, False),
+]
+
+def lista_limiares(valor):
+    return [float(limiar) for limiar in valor.split(',') if limiar.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limiares', type=lista_limiares, help='limiares a conferir (padrão: ROTEADOR_LIMIARES)')
+    args = parser.parse_args()
+
+    limiares = args.limiares if args.limiares is not None else Config.ROTEADOR_LIMIARES
+    roteador = RoteadorModelos(modelos=['menor', 'maior'], limiares=limiares)
+    erros = 0
+    print(f"Limiares: {', '.join(str(limiar) for limiar in roteador.limiares)}")
+    for mensagem, profundidade, score, maior in REFERENCIAS:
+        complexidade = roteador.calcular_complexidade(mensagem, profundidade, score)
+        faixa = sum(1 for limiar in roteador.limiares if complexidade >= limiar)
+        ok = (faixa > 0) == maior
+        erros += not ok
+        print(f"  {'✅' if ok else '❌'} {complexidade:.3f} faixa {faixa} "
+              f"(esperado: modelo {'maior' if maior else 'menor'})  {mensagem[:60]}")
+
+    if erros:
+        print(f"❌ {erros} mensagem(ns) na faixa errada")
+        return 1
+    print("✅ todas as mensagens na faixa esperada")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())